@@ -0,0 +1,421 @@
+"""
+pdf_objects.py  –  PDF object syntax and random access to raw objects.
+
+Shared by the compressor (pdf_scan.py, pdf_lossless.py, pdf_profile.py) and
+the splitter (pdf_raw.py). Objects are parsed into plain Python values and
+serialized back without loss; stream bodies are never decoded except for
+object streams, or when stream_data() is asked for.
+
+The file is memory-mapped and objects are read lazily through the xref, in
+the order pypdf uses: an object listed in an object stream is read from
+there, anything else from its byte offset. Parts of the mapping that were
+read are released again right away, so memory use stays flat however large
+the file is. The xref itself is located with pypdf.
+
+Example
+-------
+    with PdfFile("report.pdf") as pdf:
+        pdf.read_xref()
+        obj = pdf.get(1)
+        print(obj.value, obj.is_stream)
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pypdf import PdfReader
+
+# madvise() is not available on Windows
+_MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+
+class PdfSyntaxError(ValueError):
+    """An object is malformed, or stored in a way that cannot be read here."""
+
+
+# ---------------------------------------------------------------------------
+# Object model
+# ---------------------------------------------------------------------------
+
+
+class Name(str):
+    """A PDF name such as /Font, stored without the leading slash."""
+
+
+class String(bytes):
+    """A PDF literal string (...), stored as its raw, still-escaped body."""
+
+
+class HexString(bytes):
+    """A PDF hexadecimal string <...>, stored decoded."""
+
+
+class Keyword(bytes):
+    """A bare token that is no value, such as an operator."""
+
+
+class Real(float):
+    """A PDF real number that remembers its original spelling."""
+
+    def __new__(cls, token: bytes):
+        value = super().__new__(cls, token)
+        value.token = bytes(token)
+        return value
+
+
+class Ref(NamedTuple):
+    """An indirect reference ``num gen R``."""
+
+    num: int
+    gen: int
+
+
+class PdfObject(NamedTuple):
+    """One indirect object: its parsed value and where it is in the file."""
+
+    num: int
+    value: Any
+    offset: int  # byte offset of "num gen obj", or -1 inside an object stream
+    stream_offset: int  # byte offset of the stream body, or -1
+    stream_length: int  # encoded stream length, or 0
+
+    @property
+    def is_stream(self) -> bool:
+        return self.stream_offset >= 0
+
+
+# ---------------------------------------------------------------------------
+# Parser and serializer
+# ---------------------------------------------------------------------------
+
+_WS = re.compile(rb"(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*")
+_REGULAR = re.compile(rb"[^\x00\t\n\x0c\r ()<>\[\]{}/%]+")
+_REF = re.compile(
+    rb"(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])"
+)
+_OBJ = re.compile(rb"[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj")
+_STREAM = re.compile(rb"stream(?:\r\n|\n|\r)?")
+_ENDSTREAM = re.compile(rb"[\x00\t\n\x0c\r ]*endstream")
+_STRING_SPECIAL = re.compile(rb"[()\\]")
+_NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+_NAME_UNSAFE = re.compile(rb"[^!-~]|[#()<>\[\]{}/%]")
+_KEYWORDS = {b"true": True, b"false": False, b"null": None}
+
+
+def parse_object(data, pos: int) -> Tuple[Any, int]:
+    """Parse one PDF object from *data* at *pos*; return (value, end position)."""
+    pos = _WS.match(data, pos).end()
+    head = data[pos : pos + 2]
+    if head == b"<<":
+        result: Dict[str, Any] = {}
+        pos += 2
+        while True:
+            pos = _WS.match(data, pos).end()
+            if data[pos : pos + 2] == b">>":
+                return result, pos + 2
+            key, pos = parse_object(data, pos)
+            if not isinstance(key, Name):
+                raise PdfSyntaxError(f"Expected a name as dictionary key at offset {pos}")
+            value, pos = parse_object(data, pos)
+            result[str(key)] = value
+    if head[:1] == b"[":
+        items: List[Any] = []
+        pos += 1
+        while True:
+            pos = _WS.match(data, pos).end()
+            if data[pos : pos + 1] == b"]":
+                return items, pos + 1
+            item, pos = parse_object(data, pos)
+            items.append(item)
+    if head[:1] == b"/":
+        match = _REGULAR.match(data, pos + 1)
+        raw = match.group() if match else b""
+        name = _NAME_ESCAPE.sub(lambda m: bytes([int(m.group(1), 16)]), raw)
+        return Name(name.decode("latin-1")), pos + 1 + len(raw)
+    if head[:1] == b"(":
+        return _parse_literal_string(data, pos)
+    if head[:1] == b"<":
+        end = data.find(b">", pos)
+        if end < 0:
+            raise PdfSyntaxError("Unterminated hex string")
+        digits = re.sub(rb"[^0-9A-Fa-f]", b"", data[pos + 1 : end])
+        if len(digits) % 2:
+            digits += b"0"
+        return HexString(bytes.fromhex(digits.decode())), end + 1
+    match = _REF.match(data, pos)
+    if match:
+        return Ref(int(match.group(1)), int(match.group(2))), match.end()
+    match = _REGULAR.match(data, pos)
+    if not match:
+        raise PdfSyntaxError(f"Unexpected byte {head[:1]!r} at offset {pos}")
+    token = match.group()
+    if token in _KEYWORDS:
+        return _KEYWORDS[token], match.end()
+    try:
+        return (Real(token) if b"." in token else int(token)), match.end()
+    except ValueError:
+        # Operators and other bare keywords; callers decide what to do
+        return Keyword(token), match.end()
+
+
+def _parse_literal_string(data, pos: int) -> Tuple[String, int]:
+    depth = 1
+    start = pos = pos + 1
+    while True:
+        match = _STRING_SPECIAL.search(data, pos)
+        if match is None:
+            raise PdfSyntaxError("Unterminated string")
+        char = match.group()
+        pos = match.end()
+        if char == b"\\":
+            pos += 1
+        elif char == b"(":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return String(data[start : pos - 1]), pos
+
+
+def serialize(value: Any, renumber: Callable[[Ref], Optional[int]]) -> bytes:
+    """
+    Write *value* back in PDF syntax.
+
+    Args:
+        value: A value returned by parse_object()
+        renumber: Maps each reference to its new object number, or to None
+            (or 0) to write ``null`` in its place
+
+    Returns:
+        bytes: The serialized object
+    """
+    if isinstance(value, dict):
+        return b"<<" + b"".join(
+            _serialize_name(key) + b" " + serialize(item, renumber)
+            for key, item in value.items()
+        ) + b">>"
+    if isinstance(value, list):
+        return b"[" + b" ".join(serialize(item, renumber) for item in value) + b"]"
+    if isinstance(value, Ref):
+        num = renumber(value)
+        return b"%d 0 R" % num if num else b"null"
+    if isinstance(value, Name):
+        return _serialize_name(value)
+    if isinstance(value, String):
+        return b"(" + value + b")"
+    if isinstance(value, HexString):
+        return b"<" + value.hex().encode() + b">"
+    if isinstance(value, Keyword):
+        return bytes(value)
+    if value is None:
+        return b"null"
+    if value is True:
+        return b"true"
+    if value is False:
+        return b"false"
+    if isinstance(value, Real):
+        return value.token
+    if isinstance(value, float):
+        return (b"%.6f" % value).rstrip(b"0").rstrip(b".") or b"0"
+    if isinstance(value, int):
+        return b"%d" % value
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _serialize_name(name: str) -> bytes:
+    raw = name.encode("latin-1")
+    return b"/" + _NAME_UNSAFE.sub(lambda m: b"#%02X" % m.group()[0], raw)
+
+
+def iter_refs(value: Any) -> Iterator[Ref]:
+    """Yield every reference inside *value*, depth first."""
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, Ref):
+            yield item
+        elif isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+
+
+# ---------------------------------------------------------------------------
+# Object access
+# ---------------------------------------------------------------------------
+
+
+class PdfFile:
+    """
+    Random access to the raw objects of a PDF.
+
+    Subclasses fill in the xref, usually with read_xref(). Use as a context
+    manager, or call close() when done.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._fh = open(self.path, "rb")
+        self.data = None
+        try:
+            self.stat = os.fstat(self._fh.fileno())
+            self.size = self.stat.st_size
+            self.data = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.close()
+            raise
+        self.offsets: Dict[int, int] = {}
+        self.compressed: Dict[int, Tuple[int, int]] = {}
+        self._objstm: Tuple[int, Optional[bytes], Optional[List[int]]] = (-1, None, None)
+
+    def read_xref(self) -> PdfReader:
+        """Fill in offsets, compressed and version from the xref; return pypdf's reader."""
+        header = re.match(rb"%PDF-(\d\.\d)", self.data[:1024].lstrip())
+        self.version = header.group(1).decode() if header else "1.7"
+        reader = PdfReader(self._fh, strict=False)
+        self.offsets = {}
+        for generation in sorted(reader.xref):
+            self.offsets.update(reader.xref[generation])
+        self.compressed = {
+            num: (stm, index) for num, (stm, index) in reader.xref_objStm.items()
+        }
+        return reader
+
+    def get(self, num: int) -> Optional[PdfObject]:
+        """
+        Return object *num*, or None if it does not exist (a null reference).
+
+        Raises:
+            PdfSyntaxError: If the object exists but cannot be read
+        """
+        try:
+            # Same precedence as pypdf
+            if num in self.compressed:
+                return self._read_compressed(num, *self.compressed[num])
+            if num in self.offsets:
+                return self._read_uncompressed(num, self.offsets[num])
+        except PdfSyntaxError:
+            raise
+        except (ValueError, IndexError, KeyError, zlib.error) as e:
+            raise PdfSyntaxError(f"object {num} is unreadable: {e}") from None
+        return None
+
+    def resolve(self, value: Any) -> Any:
+        """Follow *value* if it is a reference; return the referenced value."""
+        seen = 0
+        while isinstance(value, Ref) and seen < 32:
+            obj = self.get(value.num)
+            value = obj.value if obj is not None else None
+            seen += 1
+        return value
+
+    def _read_uncompressed(self, num: int, offset: int) -> PdfObject:
+        match = _OBJ.match(self.data, offset)
+        if match is None or int(match.group(1)) != num:
+            raise PdfSyntaxError(f"xref entry of object {num} points elsewhere")
+        value, pos = parse_object(self.data, match.end())
+        stream_offset, stream_length = -1, 0
+        if isinstance(value, dict):
+            pos = _WS.match(self.data, pos).end()
+            stream = _STREAM.match(self.data, pos)
+            if stream:
+                stream_offset = stream.end()
+                length = value.get("Length")
+                if isinstance(length, Ref):
+                    length = self.resolve(length)
+                if not (
+                    isinstance(length, int)
+                    and length >= 0
+                    and _ENDSTREAM.match(self.data, stream_offset + length)
+                ):
+                    # Missing or wrong /Length: trust the endstream keyword
+                    end = self.data.find(b"endstream", stream_offset)
+                    if end < 0:
+                        raise PdfSyntaxError(f"stream of object {num} is unterminated")
+                    length = len(self.data[stream_offset:end].rstrip(b"\r\n"))
+                    self._unmap(stream_offset, end)
+                stream_length = length
+                self._unmap(stream_offset + length, stream_offset + length + 32)
+        self._unmap(offset, pos)
+        return PdfObject(num, value, offset, stream_offset, stream_length)
+
+    def _read_compressed(self, num: int, stm: int, index: int) -> PdfObject:
+        if self._objstm[0] != stm:
+            self._objstm = (stm, *self._load_object_stream(stm))
+        _, body, offsets = self._objstm
+        if body is None or index >= len(offsets):
+            raise PdfSyntaxError(f"object stream {stm} is unreadable")
+        value, _ = parse_object(body, offsets[index])
+        return PdfObject(num, value, -1, -1, 0)
+
+    def _load_object_stream(self, stm: int):
+        # Object streams hold dictionaries, so they have to be decoded
+        container = self.get(stm)
+        if container is None or not container.is_stream:
+            return None, None
+        body = self.stream_data(container)
+        first = int(container.value["First"])
+        numbers = body[:first].split()
+        offsets = [first + int(off) for off in numbers[1::2]]
+        return body, offsets
+
+    def stream_data(self, obj: PdfObject) -> bytes:
+        """
+        Return the decoded body of stream *obj*.
+
+        Only unfiltered and plain Flate streams are decoded, which covers
+        object streams and nearly all content streams; images are never
+        decoded here.
+
+        Raises:
+            PdfSyntaxError: If the stream uses another filter or is corrupt
+        """
+        raw = self.data[obj.stream_offset : obj.stream_offset + obj.stream_length]
+        self._unmap(obj.stream_offset, obj.stream_offset + obj.stream_length)
+        filters = obj.value.get("Filter")
+        if isinstance(filters, list):
+            filters = filters[0] if len(filters) == 1 else filters
+        if filters is None:
+            return raw
+        if filters == "FlateDecode" and not obj.value.get("DecodeParms"):
+            try:
+                return zlib.decompress(raw)
+            except zlib.error as e:
+                raise PdfSyntaxError(f"stream {obj.num} is corrupt: {e}") from None
+        raise PdfSyntaxError(f"stream {obj.num} uses an unsupported filter")
+
+    def _unmap(self, start: int, end: int) -> None:
+        """
+        Drop [start, end) of the mapping from this process's memory.
+
+        Pages of the mapping that were read count towards the RSS until
+        released, so without this a pass over a multi-GB file would grow the
+        RSS to the file size. The data stays in the OS page cache.
+        """
+        if _MADV_DONTNEED is None:
+            return
+        start -= start % mmap.PAGESIZE
+        end = min(end, self.size)
+        if end > start:
+            self.data.madvise(_MADV_DONTNEED, start, end - start)
+
+    def release(self) -> None:
+        """Drop the cached object stream."""
+        self._objstm = (-1, None, None)
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self._fh.close()
+
+    def __enter__(self) -> "PdfFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
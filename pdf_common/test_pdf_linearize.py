@@ -0,0 +1,69 @@
+"""Tests for pdf_linearize.py."""
+
+import os
+import stat
+
+import pytest
+
+from pdf_linearize import is_linearized, linearize_pdf, require_qpdf
+
+
+def _stub_qpdf(bin_dir, script):
+    """Put an executable `qpdf` shell script first on PATH."""
+    bin_dir.mkdir()
+    qpdf = bin_dir / "qpdf"
+    qpdf.write_text("#!/bin/sh\n" + script)
+    qpdf.chmod(qpdf.stat().st_mode | stat.S_IEXEC)
+    return str(bin_dir)
+
+
+def _linearized_bytes(body=b"%%EOF\n"):
+    head = b"%PDF-1.7\n1 0 obj\n<</Linearized 1 /L 0000 /N 1>>\nendobj\n"
+    size = len(head) + len(body)
+    return head.replace(b"/L 0000", b"/L %04d" % size) + body
+
+
+def test_is_linearized(tmp_path):
+    path = tmp_path / "web.pdf"
+    path.write_bytes(_linearized_bytes())
+    assert is_linearized(path)
+
+    # An incremental update appended afterwards invalidates it
+    path.write_bytes(_linearized_bytes() + b"trailer\n")
+    assert not is_linearized(path)
+
+    path.write_bytes(b"%PDF-1.7\n1 0 obj\n<</Type /Catalog>>\nendobj\n")
+    assert not is_linearized(path)
+
+
+def test_require_qpdf_without_qpdf(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    with pytest.raises(RuntimeError, match="--linearize requires qpdf"):
+        require_qpdf("--linearize")
+
+
+def test_linearize_replaces_file_in_place(tmp_path, monkeypatch):
+    bin_dir = _stub_qpdf(tmp_path / "bin", 'cp "$2" "$3" && echo linearized >> "$3"\n')
+    monkeypatch.setenv("PATH", bin_dir + os.pathsep + os.environ["PATH"])
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.7\n")
+    path.chmod(0o640)
+
+    linearize_pdf(path)
+
+    assert path.read_bytes() == b"%PDF-1.7\nlinearized\n"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    assert sorted(os.listdir(tmp_path)) == ["bin", "doc.pdf"]
+
+
+def test_linearize_failure_keeps_original(tmp_path, monkeypatch):
+    bin_dir = _stub_qpdf(tmp_path / "bin", "echo broken >&2\nexit 2\n")
+    monkeypatch.setenv("PATH", bin_dir + os.pathsep + os.environ["PATH"])
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.7\n")
+
+    with pytest.raises(RuntimeError, match="broken"):
+        linearize_pdf(path)
+
+    assert path.read_bytes() == b"%PDF-1.7\n"
+    assert sorted(os.listdir(tmp_path)) == ["bin", "doc.pdf"]
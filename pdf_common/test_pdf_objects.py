@@ -0,0 +1,107 @@
+"""Tests for pdf_objects.py."""
+
+import zlib
+
+import pytest
+
+from pdf_objects import (
+    HexString,
+    Keyword,
+    Name,
+    PdfFile,
+    PdfSyntaxError,
+    Real,
+    Ref,
+    String,
+    parse_object,
+    serialize,
+)
+
+
+def _roundtrip(text: bytes) -> bytes:
+    value, _ = parse_object(text, 0)
+    return serialize(value, lambda ref: ref.num)
+
+
+def test_parse_values():
+    text = b"<</Type /Page /Kids [3 0 R 4 0 R] /N 1.50 /S (a\\)b) /H <4142> /X#20Y true>>"
+    value, end = parse_object(text + b" trailing", 0)
+    assert value == {
+        "Type": "Page",
+        "Kids": [Ref(3, 0), Ref(4, 0)],
+        "N": 1.5,
+        "S": b"a\\)b",
+        "H": b"AB",
+        "X Y": True,
+    }
+    assert isinstance(value["Type"], Name)
+    assert isinstance(value["N"], Real)
+    assert isinstance(value["S"], String)
+    assert isinstance(value["H"], HexString)
+    assert end == len(text)
+
+
+def test_serialize_roundtrip():
+    text = b"<</A [1 -2 3.250 null false] /B (x(y)z) /C <00ff> /D#23 /E#20F /R 7 0 R>>"
+    assert _roundtrip(text) == (
+        b"<</A [1 -2 3.250 null false]/B (x(y)z)/C <00ff>/D#23 /E#20F/R 7 0 R>>"
+    )
+
+
+def test_renumber_to_null():
+    value, _ = parse_object(b"[1 0 R 2 0 R]", 0)
+    assert serialize(value, lambda ref: ref.num if ref.num == 2 else None) == b"[null 2 0 R]"
+
+
+def test_bare_keywords_are_kept():
+    value, _ = parse_object(b"BT", 0)
+    assert isinstance(value, Keyword)
+    assert serialize(value, lambda ref: None) == b"BT"
+
+
+def test_malformed_dictionary_raises():
+    with pytest.raises(PdfSyntaxError):
+        parse_object(b"<<1 2>>", 0)
+
+
+def _file_with_duplicate_object(path):
+    """Object 5 exists both at a plain offset and in object stream 4."""
+    members = b"(from stream)"
+    body = b"5 0 " + members
+    first = len(b"5 0 ")
+    stream = zlib.compress(body)
+    data = bytearray(b"%PDF-1.5\n")
+    offsets = {}
+    offsets[4] = len(data)
+    data += b"4 0 obj\n<</Type /ObjStm /N 1 /First %d /Filter /FlateDecode /Length %d>>\n" % (
+        first,
+        len(stream),
+    )
+    data += b"stream\n" + stream + b"\nendstream\nendobj\n"
+    offsets[5] = len(data)
+    data += b"5 0 obj\n(plain)\nendobj\n"
+    path.write_bytes(bytes(data))
+    return offsets
+
+
+def test_object_streams_take_precedence_like_pypdf(tmp_path):
+    path = tmp_path / "dup.pdf"
+    offsets = _file_with_duplicate_object(path)
+    with PdfFile(path) as pdf:
+        pdf.offsets = offsets
+        pdf.compressed = {5: (4, 0)}
+        assert pdf.get(5).value == b"from stream"
+        pdf.compressed = {}
+        pdf.release()
+        assert pdf.get(5).value == b"plain"
+        assert pdf.get(6) is None
+
+
+def test_unreadable_object_raises(tmp_path):
+    path = tmp_path / "dup.pdf"
+    offsets = _file_with_duplicate_object(path)
+    with PdfFile(path) as pdf:
+        # Points into the middle of object 4
+        pdf.offsets = {5: offsets[4] + 3}
+        with pytest.raises(PdfSyntaxError):
+            pdf.get(5)
@@ -0,0 +1,742 @@
+#!/usr/bin/env python3
+"""
+benchmark.py  –  Compression benchmark over a reproducible synthetic corpus.
+
+Generates a corpus of PDFs offline (text-only, vector-heavy, JPEG scans, PNG
+screenshots and a document with thousands of pages), compresses every file
+with every engine and compression level, and records throughput (MB/s and
+pages/s), size ratio and peak memory. Results can be saved as a baseline and
+later runs compared against it with regression thresholds.
+
+Each case runs in a fresh child process, and its peak memory is the larger
+of that process's own peak and the peak of the Ghostscript process it starts.
+
+Examples
+--------
+# 1. Run everything and save the results as the baseline
+python benchmark.py --save-baseline baseline.json
+
+# 2. After changing the gs flags, compare (exit status 1 on a regression)
+python benchmark.py --baseline baseline.json
+
+# 3. Only the Ghostscript engine on the scanned corpus, 5 repetitions
+python benchmark.py --engine gs --corpus jpeg_scans --repeat 5
+
+# 4. Writing to an NFS mount directly vs. staged on tmpfs (adds "+staged" rows)
+python benchmark.py --engine gs --output-dir /mnt/nfs/tmp --staging-dir /dev/shm
+
+# 5. Only the output write path, without Ghostscript: each corpus file written
+#    to the NFS mount in small writes (as gs does), staged next to it and
+#    renamed, and staged on tmpfs and published with one sequential copy
+python benchmark.py --engine none --publish-target /mnt/nfs/tmp --staging-dir /dev/shm
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import statistics
+import subprocess
+import argparse
+import io
+import itertools
+import tempfile
+import time
+import zlib
+
+from compress_pdf2 import (
+    COMPRESSION_LEVELS,
+    ENGINES,
+    _partial_path,
+    _publish,
+    compress_pdf_detailed,
+    format_size,
+)
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # only needed to generate the image corpora
+    Image = ImageDraw = None
+
+# Bumped whenever the generators change, so stale corpora are regenerated
+CORPUS_VERSION = 1
+
+# A4 in PDF points
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+# Size of each write() in the publish benchmark; Ghostscript writes its
+# output through small stdio buffers
+PUBLISH_WRITE_SIZE = 8192
+
+# Default regression thresholds, in percent
+MAX_SLOWDOWN = 10.0
+MAX_RATIO_INCREASE = 2.0
+MAX_MEMORY_INCREASE = 20.0
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo"
+).split()
+
+
+# ---------------------------------------------------------------------------
+# Corpus generation
+# ---------------------------------------------------------------------------
+
+
+def _write_pdf(path, pages):
+    """
+    Write a minimal PDF.
+
+    Args:
+        path (str): Output path
+        pages (iterable): (content stream bytes, list of image XObject
+            (dictionary bytes, stream bytes)) per page; images are named
+            /Im0, /Im1, ... in order
+    """
+    offsets = []
+    with open(path, "wb") as out:
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        def add(body, stream=None):
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n" % len(offsets))
+            if stream is None:
+                out.write(body)
+            else:
+                out.write(body[:-2] + b"/Length %d>>\nstream\n" % len(stream))
+                out.write(stream)
+                out.write(b"\nendstream")
+            out.write(b"\nendobj\n")
+            return len(offsets)
+
+        # Objects 1-3 are written last-but-known: catalog, page tree, font
+        offsets.extend([0, 0, 0])
+        page_refs = []
+        for content, images in pages:
+            image_refs = [add(header, data) for header, data in images]
+            content_ref = add(b"<<>>", content)
+            xobjects = b"".join(
+                b"/Im%d %d 0 R" % (i, ref) for i, ref in enumerate(image_refs)
+            )
+            page_refs.append(
+                add(
+                    b"<</Type/Page/Parent 2 0 R/Contents %d 0 R"
+                    b"/Resources<</Font<</F1 3 0 R>>/XObject<<%s>>>>>>"
+                    % (content_ref, xobjects)
+                )
+            )
+        for num, body in (
+            (1, b"<</Type/Catalog/Pages 2 0 R>>"),
+            (
+                2,
+                b"<</Type/Pages/MediaBox[0 0 %d %d]/Count %d/Kids[%s]>>"
+                % (
+                    PAGE_WIDTH,
+                    PAGE_HEIGHT,
+                    len(page_refs),
+                    b" ".join(b"%d 0 R" % ref for ref in page_refs),
+                ),
+            ),
+            (3, b"<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>"),
+        ):
+            offsets[num - 1] = out.tell()
+            out.write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+        xref = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        out.write(
+            b"trailer\n<</Size %d/Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(offsets) + 1, xref)
+        )
+    return len(page_refs)
+
+
+def _text_content(rng, lines):
+    """Return a content stream with *lines* lines of random words."""
+    parts = [b"BT /F1 10 Tf 12 TL 50 800 Td"]
+    for _ in range(lines):
+        text = " ".join(rng.choice(_WORDS) for _ in range(12))
+        parts.append(b"(%s) '" % text.encode())
+    parts.append(b"ET")
+    return b"\n".join(parts)
+
+
+def _text_pages(rng, count, lines=60):
+    for _ in range(count):
+        yield _text_content(rng, lines), []
+
+
+def _vector_pages(rng, count, paths=4000):
+    for _ in range(count):
+        ops = []
+        for _ in range(paths):
+            x, y = rng.uniform(0, PAGE_WIDTH), rng.uniform(0, PAGE_HEIGHT)
+            ops.append(
+                b"%.2f %.2f %.2f RG %.2f %.2f m %.2f %.2f %.2f %.2f %.2f %.2f c S"
+                % (
+                    rng.random(),
+                    rng.random(),
+                    rng.random(),
+                    x,
+                    y,
+                    *(rng.uniform(-40, 40) + v for v in (x, y, x, y, x, y)),
+                )
+            )
+        yield b"0.5 w\n" + b"\n".join(ops), []
+
+
+def _draw_scan(rng, width, height):
+    """Draw a page that looks like a scanned document: paper tint, text, stains."""
+    image = Image.new("RGB", (width, height), (246, 242, 232))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randrange(20, 200)
+        shade = rng.randrange(225, 245)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=(shade,) * 3)
+    line_height = max(8, height // 70)
+    for y in range(height // 12, height - height // 12, line_height):
+        x = width // 10
+        while x < width - width // 10:
+            word = rng.randrange(line_height, line_height * 5)
+            ink = rng.randrange(20, 70)
+            draw.rectangle((x, y, x + word, y + line_height // 2), fill=(ink,) * 3)
+            x += word + line_height // 2
+    return image
+
+
+def _draw_screenshot(rng, width, height):
+    """Draw a flat-colored UI screenshot: title bar, panels, buttons."""
+    image = Image.new("RGB", (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 40), fill=(45, 52, 64))
+    draw.rectangle((0, 40, 260, height), fill=(236, 239, 244))
+    for _ in range(60):
+        x, y = rng.randrange(280, width - 200), rng.randrange(60, height - 40)
+        color = tuple(rng.randrange(60, 230) for _ in range(3))
+        draw.rectangle((x, y, x + rng.randrange(40, 200), y + 24), fill=color)
+    for y in range(60, height, 22):
+        draw.rectangle((20, y, rng.randrange(80, 240), y + 8), fill=(120, 130, 140))
+    return image
+
+
+def _image_xobject(image, filter_name, data):
+    header = (
+        b"<</Type/XObject/Subtype/Image/Width %d/Height %d"
+        b"/ColorSpace/DeviceRGB/BitsPerComponent 8/Filter/%s>>"
+        % (image.width, image.height, filter_name)
+    )
+    return header, data
+
+
+def _image_page(xobject):
+    content = b"q %d 0 0 %d 0 0 cm /Im0 Do Q" % (PAGE_WIDTH, PAGE_HEIGHT)
+    return content, [xobject]
+
+
+def _jpeg_scan_pages(rng, count):
+    # A4 at 300 dpi
+    for _ in range(count):
+        image = _draw_scan(rng, 2480, 3508)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        yield _image_page(_image_xobject(image, b"DCTDecode", buffer.getvalue()))
+
+
+def _png_screenshot_pages(rng, count):
+    for _ in range(count):
+        image = _draw_screenshot(rng, 1920, 1080)
+        data = zlib.compress(image.tobytes(), 6)
+        yield _image_page(_image_xobject(image, b"FlateDecode", data))
+
+
+# name -> (generator, page count, needs Pillow)
+CORPUS = {
+    "text": (_text_pages, 50, False),
+    "vector": (_vector_pages, 20, False),
+    "jpeg_scans": (_jpeg_scan_pages, 8, True),
+    "png_screenshots": (_png_screenshot_pages, 12, True),
+    "many_pages": (lambda rng, count: _text_pages(rng, count, lines=8), 3000, False),
+}
+
+
+def generate_corpus(directory, names=None):
+    """
+    Generate the benchmark corpus, reusing files from an earlier run.
+
+    Every document is drawn from its own seeded random generator, so the same
+    CORPUS_VERSION always produces the same files.
+
+    Args:
+        directory (str): Directory to write the corpus to
+        names (list, optional): Corpus entries to generate (default: all)
+
+    Returns:
+        dict: name -> (path, page count)
+    """
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, "corpus.json")
+    try:
+        with open(index_path) as fh:
+            index = json.load(fh)
+    except (OSError, ValueError):
+        index = {}
+    if index.get("version") != CORPUS_VERSION:
+        index = {"version": CORPUS_VERSION, "files": {}}
+
+    corpus = {}
+    for name in names or CORPUS:
+        generator, count, needs_pillow = CORPUS[name]
+        path = os.path.join(directory, f"{name}.pdf")
+        entry = index["files"].get(name)
+        if entry is None or not os.path.exists(path):
+            if needs_pillow and Image is None:
+                print(f"Skipping corpus '{name}': requires Pillow (pip install Pillow)")
+                continue
+            print(f"Generating corpus '{name}' ({count} page(s))...")
+            rng = random.Random(f"{name}-{CORPUS_VERSION}")
+            pages = _write_pdf(path, generator(rng, count))
+            entry = index["files"][name] = {"pages": pages}
+        corpus[name] = (path, entry["pages"])
+
+    with open(index_path, "w") as fh:
+        json.dump(index, fh, indent=2)
+    return corpus
+
+
+# ---------------------------------------------------------------------------
+# Running cases
+# ---------------------------------------------------------------------------
+
+
+def _peak_rss_self():
+    """Return the peak RSS of this process in bytes, or None if unknown."""
+    # VmHWM belongs to the current address space; ru_maxrss would include
+    # the parent's peak inherited across fork/exec
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak * (1 if sys.platform == "darwin" else 1024)
+
+
+def _run_case_child(input_path, output_path, engine, level, staging_dir):
+    """Entry point of the child process: compress once and print the result."""
+    result = compress_pdf_detailed(
+        input_path,
+        output_path,
+        level,
+        force=True,
+        quiet=True,
+        engine=engine,
+        staging_dir=staging_dir or None,
+    ).to_dict()
+    peaks = [peak for peak in (_peak_rss_self(), result["peak_rss"]) if peak]
+    result["peak_memory"] = max(peaks) if peaks else None
+    print(json.dumps(result))
+
+
+def run_case(input_path, output_path, engine, level, staging_dir=None):
+    """
+    Compress a file once in a fresh child process.
+
+    Args:
+        input_path (str): Path to the input PDF file
+        output_path (str): Path for the output PDF file
+        engine (str): Compression engine, one of ENGINES
+        level (str): Compression level
+        staging_dir (str, optional): Staging directory passed to compress_pdf_detailed()
+
+    Returns:
+        dict: CompressionResult fields plus peak_memory (bytes or None)
+    """
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--run-case",
+        input_path,
+        output_path,
+        engine,
+        level,
+        staging_dir or "",
+    ]
+    process = subprocess.run(command, capture_output=True)
+    if process.returncode:
+        message = process.stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(message[-1] if message else f"exit status {process.returncode}")
+    return json.loads(process.stdout)
+
+
+def run_benchmark(corpus, engines, levels, repeat=3, work_dir=None, staging_dir=None):
+    """
+    Compress every corpus file with every engine and level.
+
+    Args:
+        corpus (dict): name -> (path, page count), from generate_corpus()
+        engines (list): Engines to run
+        levels (list): Compression levels to run (the lossless engine ignores them)
+        repeat (int): Runs per case; the median wall time is reported
+        work_dir (str, optional): Directory for the outputs (default: a temp dir)
+        staging_dir (str, optional): Also run every case staged through this
+            directory, reported under "<key>+staged" with the time saved
+
+    Returns:
+        dict: "corpus/engine/level" -> metrics dict
+    """
+    results = {}
+    modes = [("", None)] + ([("+staged", staging_dir)] if staging_dir else [])
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for name, (path, pages) in corpus.items():
+            for engine in engines:
+                for level, (suffix, staging) in itertools.product(
+                    ["default"] if engine == "lossless" else levels, modes
+                ):
+                    key = f"{name}/{engine}/{level if engine != 'lossless' else '-'}"
+                    direct = results.get(key)
+                    key += suffix
+                    output_path = os.path.join(tmp, "out.pdf")
+                    try:
+                        runs = [
+                            run_case(path, output_path, engine, level, staging)
+                            for _ in range(repeat)
+                        ]
+                    except RuntimeError as e:
+                        print(f"{key}: FAILED ({e})")
+                        continue
+                    wall = statistics.median(run["wall_time"] for run in runs)
+                    peaks = [run["peak_memory"] for run in runs if run["peak_memory"]]
+                    first = runs[0]
+                    metrics = {
+                        "input_bytes": first["input_bytes"],
+                        "output_bytes": first["output_bytes"],
+                        "pages": pages,
+                        "wall_time": round(wall, 6),
+                        "mb_per_s": round(first["input_bytes"] / 1024**2 / wall, 3)
+                        if wall > 0
+                        else None,
+                        "pages_per_s": round(pages / wall, 3) if wall > 0 else None,
+                        "ratio": round(first["output_bytes"] / first["input_bytes"], 6),
+                        "peak_memory": max(peaks) if peaks else None,
+                    }
+                    results[key] = metrics
+                    row = _format_row(key, metrics)
+                    if suffix and direct and direct["wall_time"] > 0:
+                        saved = 1 - metrics["wall_time"] / direct["wall_time"]
+                        row += f"  saved {saved * 100:+.1f}% wall time"
+                    print(row, flush=True)
+    return results
+
+
+def _write_in_chunks(data, path, write_size):
+    """Write *data* to *path* in unbuffered writes of *write_size* bytes."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        for offset in range(0, len(data), write_size):
+            os.write(fd, view[offset : offset + write_size])
+    finally:
+        os.close(fd)
+
+
+def _publish_once(data, target_dir, mode, staging_dir, write_size):
+    """Write one output to *target_dir* the way *mode* does; return the wall time."""
+    output_path = os.path.join(target_dir, "publish.pdf")
+    start = time.perf_counter()
+    if mode == "direct":
+        # What compress_pdf() did before staging: gs writes the final path
+        _write_in_chunks(data, output_path, write_size)
+        with open(output_path, "rb") as fh:
+            os.fsync(fh.fileno())
+    else:
+        staged_path = _partial_path(
+            staging_dir if mode == "staged" else target_dir, "publish.pdf"
+        )
+        _write_in_chunks(data, staged_path, write_size)
+        _publish(staged_path, output_path)
+    wall = time.perf_counter() - start
+    os.remove(output_path)
+    return wall
+
+
+def run_publish_benchmark(
+    corpus, target_dir, staging_dir=None, repeat=3, write_size=PUBLISH_WRITE_SIZE
+):
+    """
+    Time the output write path alone, without compressing anything.
+
+    Each corpus file is written to *target_dir* (e.g. a network filesystem)
+    in *write_size* writes, in three modes:
+
+    * ``direct``: straight to the final path, then fsynced;
+    * ``partial``: to a hidden file next to it, published with _publish()
+      (fsync and rename), as compress_pdf() does without --staging-dir;
+    * ``staged``: to *staging_dir*, published with one sequential copy into
+      *target_dir*, as with --staging-dir.
+
+    Args:
+        corpus (dict): name -> (path, page count), from generate_corpus()
+        target_dir (str): Directory the outputs are published to
+        staging_dir (str, optional): Staging directory (default: the system temp dir)
+        repeat (int): Runs per case; the median wall time is reported
+        write_size (int): Bytes per write() call
+
+    Returns:
+        dict: "corpus/publish/mode" -> metrics dict
+    """
+    staging_dir = staging_dir or tempfile.gettempdir()
+    for directory in (target_dir, staging_dir):
+        if not os.path.isdir(directory):
+            raise NotADirectoryError(f"Directory not found: {directory}")
+    results = {}
+    for name, (path, pages) in corpus.items():
+        with open(path, "rb") as fh:
+            data = fh.read()
+        direct = None
+        for mode in ("direct", "partial", "staged"):
+            wall = statistics.median(
+                _publish_once(data, target_dir, mode, staging_dir, write_size)
+                for _ in range(repeat)
+            )
+            key = f"{name}/publish/{mode}"
+            metrics = {
+                "input_bytes": len(data),
+                "output_bytes": len(data),
+                "pages": pages,
+                "wall_time": round(wall, 6),
+                "mb_per_s": round(len(data) / 1024**2 / wall, 3) if wall > 0 else None,
+                "pages_per_s": round(pages / wall, 3) if wall > 0 else None,
+                "ratio": 1.0,
+                "peak_memory": None,
+            }
+            results[key] = metrics
+            row = _format_row(key, metrics)
+            if direct is None:
+                direct = wall
+            elif direct > 0:
+                row += f"  saved {(1 - wall / direct) * 100:+.1f}% wall time vs direct"
+            print(row, flush=True)
+    return results
+
+
+def _format_row(key, metrics):
+    peak = metrics["peak_memory"]
+    return (
+        f"{key:<36} {metrics['mb_per_s'] or 0:>9.2f} MB/s "
+        f"{metrics['pages_per_s'] or 0:>9.1f} pages/s "
+        f"ratio {metrics['ratio']:.3f}  "
+        f"peak {format_size(peak) if peak is not None else 'n/a':>10}"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+
+def compare(results, baseline, max_slowdown, max_ratio_increase, max_memory_increase):
+    """
+    Compare results with a baseline and return the regressions found.
+
+    Args:
+        results (dict): Output of run_benchmark()
+        baseline (dict): Output of an earlier run_benchmark()
+        max_slowdown (float): Allowed drop in MB/s, in percent
+        max_ratio_increase (float): Allowed growth of the size ratio, in percentage points
+        max_memory_increase (float): Allowed growth of peak memory, in percent
+
+    Returns:
+        list: Human-readable regression messages
+    """
+    regressions = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if old.get("mb_per_s") and new.get("mb_per_s"):
+            change = (new["mb_per_s"] / old["mb_per_s"] - 1) * 100
+            if change < -max_slowdown:
+                regressions.append(
+                    f"{key}: throughput {old['mb_per_s']:.2f} -> "
+                    f"{new['mb_per_s']:.2f} MB/s ({change:+.1f}%)"
+                )
+        ratio_change = (new["ratio"] - old["ratio"]) * 100
+        if ratio_change > max_ratio_increase:
+            regressions.append(
+                f"{key}: size ratio {old['ratio']:.3f} -> {new['ratio']:.3f} "
+                f"({ratio_change:+.1f} points)"
+            )
+        if old.get("peak_memory") and new.get("peak_memory"):
+            change = (new["peak_memory"] / old["peak_memory"] - 1) * 100
+            if change > max_memory_increase:
+                regressions.append(
+                    f"{key}: peak memory {format_size(old['peak_memory'])} -> "
+                    f"{format_size(new['peak_memory'])} ({change:+.1f}%)"
+                )
+    return regressions
+
+
+def main():
+    """Parse command line arguments and run the benchmark."""
+    if len(sys.argv) == 7 and sys.argv[1] == "--run-case":
+        _run_case_child(*sys.argv[2:])
+        return 0
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark PDF compression over a synthetic corpus."
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        default="benchmark_corpus",
+        help="Where the generated corpus is kept between runs (default: ./benchmark_corpus)",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=CORPUS.keys(),
+        help="Corpus entry to run (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--engine",
+        action="append",
+        choices=[*ENGINES.keys(), "none"],
+        help="Engine to run (repeatable; default: all available; "
+        "'none' runs no compression cases)",
+    )
+    parser.add_argument(
+        "-c",
+        "--compression",
+        action="append",
+        choices=COMPRESSION_LEVELS.keys(),
+        help="Compression level to run (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per case (default: 3)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        metavar="DIR",
+        help="Where outputs are written, e.g. a network filesystem (default: a temp dir)",
+    )
+    parser.add_argument(
+        "--staging-dir",
+        metavar="DIR",
+        help="Also run every case staged through DIR (e.g. /dev/shm) and report "
+        "the saving over writing to the output directory directly",
+    )
+    parser.add_argument(
+        "--publish-target",
+        metavar="DIR",
+        help="Also time writing each corpus file into DIR (e.g. an NFS mount) "
+        "directly vs. staged and published, without compressing; stages in "
+        "--staging-dir (default: the system temp dir)",
+    )
+    parser.add_argument(
+        "--write-size",
+        type=int,
+        default=PUBLISH_WRITE_SIZE,
+        metavar="BYTES",
+        help=f"Bytes per write in the publish benchmark (default: {PUBLISH_WRITE_SIZE})",
+    )
+    parser.add_argument(
+        "--save-baseline", metavar="PATH", help="Write the results to a JSON file"
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="PATH",
+        help="Compare with a saved baseline; exit status 1 on a regression",
+    )
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=MAX_SLOWDOWN,
+        metavar="PERCENT",
+        help=f"Allowed throughput drop (default: {MAX_SLOWDOWN:g})",
+    )
+    parser.add_argument(
+        "--max-ratio-increase",
+        type=float,
+        default=MAX_RATIO_INCREASE,
+        metavar="POINTS",
+        help=f"Allowed size ratio growth, in percentage points (default: {MAX_RATIO_INCREASE:g})",
+    )
+    parser.add_argument(
+        "--max-memory-increase",
+        type=float,
+        default=MAX_MEMORY_INCREASE,
+        metavar="PERCENT",
+        help=f"Allowed peak memory growth (default: {MAX_MEMORY_INCREASE:g})",
+    )
+    args = parser.parse_args()
+
+    engines = [engine for engine in args.engine or [] if engine != "none"]
+    if args.engine is None:
+        engines = [engine for engine in ENGINES if engine != "gs" or shutil.which("gs")]
+        if "gs" not in engines:
+            print("Ghostscript (gs) not found; skipping the gs engine")
+    levels = args.compression or list(COMPRESSION_LEVELS)
+
+    try:
+        corpus = generate_corpus(args.corpus_dir, args.corpus)
+        results = run_benchmark(
+            corpus,
+            engines,
+            levels,
+            max(1, args.repeat),
+            args.output_dir,
+            args.staging_dir,
+        )
+        if args.publish_target:
+            results.update(
+                run_publish_benchmark(
+                    corpus,
+                    args.publish_target,
+                    args.staging_dir,
+                    max(1, args.repeat),
+                    max(1, args.write_size),
+                )
+            )
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+        print(f"Baseline saved to: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(
+            results,
+            baseline,
+            args.max_slowdown,
+            args.max_ratio_increase,
+            args.max_memory_increase,
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
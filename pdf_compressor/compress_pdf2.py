@@ -12,10 +12,48 @@ Installation of Ghostscript:
 """
 
 import os
+import sys
+import asyncio
+import queue
+import random
+import hashlib
+import shutil
+import signal
+import sqlite3
+import tempfile
+import threading
 import subprocess
 import argparse
+import io
+import json
+import uuid
+import contextlib
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
+from typing import NamedTuple, Optional
+
+from pdf_lease import LeaseDirectory
+from pdf_watch import FolderWatcher
+
+# Shared helpers live in ../pdf_common
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "pdf_common")
+)
+
+from pdf_linearize import is_linearized, linearize_pdf, require_qpdf  # noqa: E402
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pdf_scan import PdfScan, Ref
+    from pdf_lossless import optimize_lossless
+except ImportError:  # pypdf is only needed by the page-level features
+    PdfReader = PdfWriter = PdfScan = Ref = optimize_lossless = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed by the native engine
+    Image = None
 
 # Available compression presets
 COMPRESSION_LEVELS = {
@@ -26,10 +64,86 @@ COMPRESSION_LEVELS = {
     "default": "Almost identical to screen",
 }
 
+# Ghostscript flags shared by one-shot and pooled invocations
+GS_BASE_ARGS = [
+    "-sDEVICE=pdfwrite",
+    "-dCompatibilityLevel=1.4",
+    "-dNOPAUSE",
+    "-dQUIET",
+]
+
+# Resolution (dpi) each preset downsamples images to; /default does not downsample
+PRESET_IMAGE_DPI = {
+    "screen": 72,
+    "ebook": 150,
+    "printer": 300,
+    "prepress": 300,
+    "default": None,
+}
+
+# Compression engines selectable with --engine
+ENGINES = {
+    "gs": "Ghostscript re-renders the whole document",
+    "native": "pypdf + Pillow recompress oversized images only, content untouched",
+    "lossless": "Object streams, Flate and duplicate merging only, no quality loss",
+}
+
+# JPEG quality the native engine re-encodes downsampled images with
+NATIVE_JPEG_QUALITY = {
+    "screen": 40,
+    "ebook": 60,
+    "printer": 80,
+    "prepress": 90,
+    "default": 75,
+}
+
+# Presets ordered from best to worst image quality, tried by --target-size
+TARGET_PRESETS = ["prepress", "printer", "ebook", "screen"]
+
+# Image resolutions (dpi) tried below the screen preset when no preset fits
+TARGET_FALLBACK_DPIS = [60, 48, 36, 24]
+
+# Batch job orders selectable with --schedule
+SCHEDULES = {
+    "lpt": "Largest files first, shortest total run time (makespan)",
+    "sjf": "Smallest files first, lowest average time until each file is done",
+    "fifo": "In the order given",
+}
+
+
+def parse_size(text):
+    """Parse a size such as '5MB', '750 KB' or '1048576' into bytes."""
+    units = {"": 1, "B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+    value = str(text).strip().upper()
+    number = value.rstrip("KMGB ").strip()
+    unit = value[len(number) :].strip()
+    if unit not in units:
+        raise ValueError(f"Invalid size: {text!r} (use B, KB, MB or GB)")
+    try:
+        return int(float(number) * units[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size: {text!r}") from None
+
+
+def _require_pypdf(feature):
+    """Raise a helpful error if pypdf is not installed."""
+    if PdfReader is None:
+        raise RuntimeError(f"{feature} requires pypdf: pip install pypdf")
+
+
+def _require_pillow(feature):
+    """Raise a helpful error if Pillow is not installed."""
+    if Image is None:
+        raise RuntimeError(f"{feature} requires Pillow: pip install Pillow")
+
 
 def get_file_size(file_path):
     """Get file size in bytes and format it as human-readable."""
-    size_bytes = os.path.getsize(file_path)
+    return format_size(os.path.getsize(file_path))
+
+
+def format_size(size_bytes):
+    """Format a byte count as human-readable."""
     for unit in ["B", "KB", "MB", "GB"]:
         if size_bytes < 1024.0:
             return f"{size_bytes:.2f} {unit}"
@@ -37,18 +151,936 @@ def get_file_size(file_path):
     return f"{size_bytes:.2f} GB"
 
 
-def compress_pdf(input_path, output_path=None, compression_level="ebook", force=False):
+def gs_settings(compression_level):
+    """Return the Ghostscript flags that determine the output for a level."""
+    return [*GS_BASE_ARGS, f"-dPDFSETTINGS=/{compression_level}"]
+
+
+def build_gs_command(input_path, output_path, compression_level):
+    """Build the one-shot Ghostscript command line for a single file."""
+    return [
+        "gs",
+        *gs_settings(compression_level),
+        "-dBATCH",
+        f"-sOutputFile={output_path}",
+        input_path,
+    ]
+
+
+def _ps_string(text):
+    """Encode *text* as a PostScript string literal."""
+    out = bytearray(b"(")
+    for byte in os.fsencode(text):
+        if byte in b"()\\":
+            out += b"\\" + bytes([byte])
+        elif 32 <= byte < 127:
+            out.append(byte)
+        else:
+            out += b"\\%03o" % byte
+    out += b")"
+    return bytes(out)
+
+
+class _GhostscriptWorker:
+    """
+    A long-lived ``gs`` interpreter fed PostScript jobs over stdin.
+
+    The interpreter runs with -dSAFER and may only read files in
+    *read_dirs* and write files in *write_dirs*; the permissions are fixed
+    when it starts.
+    """
+
+    _OK = b"%%[pdf_compressor job ok]%%"
+    _FAILED = b"%%[pdf_compressor job failed]%%"
+
+    def __init__(self, compression_level, read_dirs=(), write_dirs=()):
+        self.read_dirs = frozenset(read_dirs)
+        self.write_dirs = frozenset(write_dirs)
+        self.command = [
+            "gs",
+            *gs_settings(compression_level),
+            "-dSAFER",
+            *(f"--permit-file-read={d}{os.sep}" for d in sorted(self.read_dirs)),
+            *(f"--permit-file-write={d}{os.sep}" for d in sorted(self.write_dirs)),
+            f"--permit-file-write={os.devnull}",
+            f"-sOutputFile={os.devnull}",
+            "-",
+        ]
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self.jobs = 0
+        self._timed_out = False
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def permits(self, input_path, output_path):
+        """Return True if the sandbox lets this worker run the job."""
+        return (
+            os.path.dirname(input_path) in self.read_dirs
+            and os.path.dirname(output_path) in self.write_dirs
+        )
+
+    def _kill(self):
+        self._timed_out = True
+        self.process.kill()
+
+    def run(self, input_path, output_path, timeout=None):
+        """
+        Compress *input_path* into *output_path*.
+
+        Both paths must be absolute and permitted (see permits()). If the job
+        takes longer than *timeout* seconds the interpreter is killed.
+
+        Raises:
+            subprocess.CalledProcessError: If the job failed
+            subprocess.TimeoutExpired: If the job was killed after *timeout*
+        """
+        job = (
+            b"{ << /OutputFile " + _ps_string(output_path) + b" >> setpagedevice "
+            + _ps_string(input_path) + b" run "
+            + b"<< /OutputFile " + _ps_string(os.devnull) + b" >> setpagedevice "
+            + b"} stopped { (\\n" + self._FAILED + b"\\n) } "
+            + b"{ (\\n" + self._OK + b"\\n) } ifelse print flush\n"
+        )
+        messages = []
+        # Killing the process ends the readline loop below with EOF
+        timer = threading.Timer(timeout, self._kill) if timeout else None
+        try:
+            if timer is not None:
+                timer.start()
+            self.process.stdin.write(job)
+            self.process.stdin.flush()
+            for line in iter(self.process.stdout.readline, b""):
+                line = line.strip()
+                if line == self._OK:
+                    self.jobs += 1
+                    return
+                if line == self._FAILED:
+                    break
+                if line:
+                    messages.append(line.decode(errors="replace"))
+        except BrokenPipeError:
+            pass
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if self._timed_out:
+            raise subprocess.TimeoutExpired(
+                self.command, timeout, output="\n".join(messages)
+            )
+        raise subprocess.CalledProcessError(
+            self.process.poll() or 1,
+            self.command,
+            output="\n".join(messages),
+        )
+
+    def close(self):
+        if self.alive():
+            try:
+                self.process.stdin.write(b"quit\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            if not stream.closed:
+                stream.close()
+
+
+class GhostscriptPool:
+    """
+    A pool of warm Ghostscript interpreters for one compression level.
+
+    Starting ``gs`` reinitializes fonts, resources and the interpreter, which
+    for small files costs more than the compression itself. The pool keeps up
+    to *size* interpreters running and sends each job to an idle one. A
+    worker is replaced after *max_jobs* jobs, or as soon as a job fails, runs
+    longer than *timeout* seconds, or the process dies. Workers are started
+    lazily and the pool is thread-safe.
+
+    Workers run sandboxed (-dSAFER) with access to the directories of the
+    jobs they have run. A job in a directory its idle worker may not access
+    restarts that worker with the directory added.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, compression_level="ebook", size=None, max_jobs=100, timeout=600.0):
+        if compression_level not in COMPRESSION_LEVELS.keys():
+            raise ValueError(
+                f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
+            )
+        if max_jobs < 1:
+            raise ValueError("max_jobs must be at least 1")
+        self.compression_level = compression_level
+        self.size = max(1, size or os.cpu_count() or 1)
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self._slots = queue.LifoQueue()
+        for _ in range(self.size):
+            self._slots.put(None)
+        self._closed = False
+
+    def run(self, input_path, output_path):
+        """Compress *input_path* into *output_path* on a warm worker."""
+        if self._closed:
+            raise RuntimeError("GhostscriptPool is closed")
+        input_path = os.path.abspath(input_path)
+        output_path = os.path.abspath(output_path)
+        worker = self._slots.get()
+        try:
+            if worker is not None and not worker.permits(input_path, output_path):
+                read_dirs, write_dirs = worker.read_dirs, worker.write_dirs
+                worker.close()
+                worker = _GhostscriptWorker(
+                    self.compression_level,
+                    read_dirs | {os.path.dirname(input_path)},
+                    write_dirs | {os.path.dirname(output_path)},
+                )
+            elif worker is None or not worker.alive():
+                worker = _GhostscriptWorker(
+                    self.compression_level,
+                    {os.path.dirname(input_path)},
+                    {os.path.dirname(output_path)},
+                )
+            worker.run(input_path, output_path, self.timeout)
+            if worker.jobs >= self.max_jobs:
+                worker.close()
+                worker = None
+        except BaseException:
+            if worker is not None:
+                worker.close()
+            worker = None
+            raise
+        finally:
+            self._slots.put(worker)
+
+    def close(self):
+        """Shut down all idle workers."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._slots.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _clone_file(source, destination):
+    """
+    Place a copy of *source* at *destination*, as cheaply as the filesystem allows.
+
+    Tries a copy-on-write reflink first (Linux FICLONE) and falls back to a
+    byte copy. Never a hardlink: editing one file in place (an incremental
+    save) would silently change the other. The destination is replaced
+    atomically.
+    """
+    tmp_path = f"{destination}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        try:
+            import fcntl
+
+            with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), 0x40049409, src.fileno())  # FICLONE
+        except (ImportError, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _partial_path(directory, name):
+    """Return an unused hidden path in *directory* for staging the output *name*."""
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex[:12]}.partial")
+
+
+def _fsync_directory(directory):
+    """Make a rename in *directory* durable (not possible on every platform)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _publish(staged_path, output_path):
+    """
+    Move a finished staged file to *output_path*, durably and atomically.
+
+    The data is fsynced before the rename, so after a crash *output_path*
+    is either the old file or the complete new one. A staged file on
+    another filesystem (tmpfs, local SSD) is first copied next to
+    *output_path* in one sequential pass, which is far cheaper on a network
+    filesystem than the many small writes Ghostscript makes.
+    """
+    output_dir = os.path.dirname(output_path)
+    if os.stat(staged_path).st_dev == os.stat(output_dir).st_dev:
+        with open(staged_path, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(staged_path, output_path)
+    else:
+        tmp_path = _partial_path(output_dir, os.path.basename(output_path))
+        try:
+            with open(staged_path, "rb") as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+                dst.flush()
+                os.fsync(dst.fileno())
+            shutil.copymode(staged_path, tmp_path)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        os.remove(staged_path)
+    _fsync_directory(output_dir)
+
+
+@contextlib.contextmanager
+def _staged_output(output_path, staging_dir=None):
+    """
+    Yield a temporary path to write instead of *output_path*.
+
+    When the block completes, the file is published to *output_path* with
+    _publish(); if it raises, the temporary file is removed and any existing
+    *output_path* is left untouched.
+
+    Args:
+        output_path (str): Final path of the output file
+        staging_dir (str, optional): Where to write it first (default: next to the output)
+    """
+    if staging_dir is not None and not os.path.isdir(staging_dir):
+        raise NotADirectoryError(f"Staging directory not found: {staging_dir}")
+    staged_path = _partial_path(
+        staging_dir or os.path.dirname(output_path), os.path.basename(output_path)
+    )
+    try:
+        yield staged_path
+        _publish(staged_path, output_path)
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of compressed PDFs.
+
+    Entries are keyed by the SHA-256 of the input file together with the
+    Ghostscript flags used, so a repeated input skips Ghostscript entirely.
+    Entries are stored and hits served by reflink where possible, else by
+    copy, so an output edited in place never changes the cached result. The
+    cache is capped at *max_bytes*; the least recently used entries (by
+    mtime, which is refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, directory, max_bytes=1024**3):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, input_path, settings):
+        """Return the cache key for *input_path* compressed with *settings*."""
+        digest = hashlib.sha256()
+        with open(input_path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest.update(b"\0" + "\0".join(settings).encode())
+        return digest.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    def fetch(self, key, output_path):
+        """Copy the cached result for *key* to *output_path*; return True on a hit."""
+        entry = self._entry(key)
+        try:
+            os.utime(entry)
+            _clone_file(entry, output_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, source_path):
+        """Add *source_path* to the cache under *key* and enforce the size cap."""
+        if os.path.getsize(source_path) > self.max_bytes:
+            return
+        entry = self._entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        _clone_file(source_path, entry)
+        with self._lock:
+            if self._size is not None:
+                self._size += os.path.getsize(entry)
+            if self._size is None or self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def estimate_savings(input_path, compression_level="ebook"):
+    """
+    Estimate how many bytes Ghostscript can save, from a structural pre-scan.
+
+    Only the xref and object dictionaries are read (see pdf_scan.py); no
+    stream is decoded. Images are credited with the area they lose when
+    downsampled to the preset's resolution, assuming they span the first
+    page. Unfiltered streams are credited with a typical Flate gain, and
+    Flate-coded photos with a smaller JPEG re-encoding gain.
+
+    Args:
+        input_path (str): Path to the PDF file
+        compression_level (str): Level of compression to estimate for
+
+    Returns:
+        dict: file_bytes, image_bytes, image_count, max_image_dpi and
+        expected_saving (all in bytes except the count and dpi)
+    """
+    _require_pypdf("Pre-scan")
+    target_dpi = PRESET_IMAGE_DPI[compression_level]
+    image_bytes = image_count = saving = 0
+    max_dpi = 0.0
+    with PdfScan(input_path) as scan:
+        page_w, page_h = 612.0, 792.0  # US Letter, when the page tree is unreadable
+        for _, page in scan.pages():
+            box = scan.resolve(page.get("MediaBox"))
+            if isinstance(box, list) and len(box) == 4:
+                box = [scan.resolve(v) for v in box]
+                page_w, page_h = abs(box[2] - box[0]) or page_w, abs(box[3] - box[1]) or page_h
+            break
+
+        for obj in scan.objects():
+            if not obj.is_stream or not isinstance(obj.value, dict):
+                continue
+            filters = scan.resolve(obj.value.get("Filter"))
+            if isinstance(filters, list):
+                filters = filters[-1] if filters else None
+            if obj.value.get("Subtype") != "Image":
+                if filters is None:
+                    saving += obj.stream_length * 0.6
+                continue
+
+            image_count += 1
+            image_bytes += obj.stream_length
+            width = scan.resolve(obj.value.get("Width")) or 0
+            height = scan.resolve(obj.value.get("Height")) or 0
+            dpi = max(width / (page_w / 72.0), height / (page_h / 72.0))
+            max_dpi = max(max_dpi, dpi)
+            if target_dpi and dpi > target_dpi * 1.5:
+                saving += obj.stream_length * (1 - (target_dpi / dpi) ** 2)
+            elif filters is None:
+                saving += obj.stream_length * 0.7
+            elif filters == "FlateDecode" and obj.value.get("BitsPerComponent", 8) == 8:
+                saving += obj.stream_length * 0.3
+
+    return {
+        "file_bytes": scan.size,
+        "image_bytes": image_bytes,
+        "image_count": image_count,
+        "max_image_dpi": round(max_dpi),
+        "expected_saving": int(saving),
+    }
+
+
+def _default_output_path(input_path):
+    """Return filename_compressed.pdf next to *input_path*."""
+    dir_path, filename = os.path.split(input_path)
+    base_name, ext = os.path.splitext(filename)
+    return os.path.join(dir_path, f"{base_name}_compressed{ext}")
+
+
+def _resolve_paths(input_path, output_path, force):
+    """Validate and absolutize the input and (default) output paths."""
+    input_path = os.path.abspath(input_path)
+    if not os.path.isfile(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+    if output_path is None:
+        output_path = _default_output_path(input_path)
+    output_path = os.path.abspath(output_path)
+    if os.path.exists(output_path) and not force:
+        raise FileExistsError(f"Output file already exists: {output_path}")
+    return input_path, output_path
+
+
+def engine_settings(engine, compression_level):
+    """Return the settings that determine an engine's output (used as cache key)."""
+    if engine == "gs":
+        return gs_settings(compression_level)
+    if engine == "lossless":
+        return ["engine=lossless"]
+    return [
+        f"engine={engine}",
+        f"dpi={PRESET_IMAGE_DPI[compression_level]}",
+        f"quality={NATIVE_JPEG_QUALITY[compression_level]}",
+    ]
+
+
+def _image_mode(xobject):
+    """Return the Pillow mode for an image XObject the native engine can handle."""
+    if xobject.get("/ImageMask") or "/Decode" in xobject:
+        return None
+    if xobject.get("/BitsPerComponent") != 8:
+        return None
+    colorspace = xobject.get("/ColorSpace")
+    colorspace = colorspace.get_object() if colorspace is not None else None
+    if colorspace == "/DeviceRGB":
+        return "RGB"
+    if colorspace == "/DeviceGray":
+        return "L"
+    if isinstance(colorspace, list) and len(colorspace) == 2 and colorspace[0] == "/ICCBased":
+        return {1: "L", 3: "RGB"}.get(colorspace[1].get_object().get("/N"))
+    return None
+
+
+def _image_filters(xobject):
+    """Return the image's filter chain as a list of names."""
+    filters = xobject.get("/Filter")
+    if filters is None:
+        return []
+    filters = filters.get_object()
+    if isinstance(filters, list):
+        return [str(f) for f in filters]
+    return [str(filters)]
+
+
+def _oversized_images(writer, target_dpi):
+    """
+    Find the images worth downsampling in *writer*.
+
+    The effective resolution is estimated against the page size, assuming an
+    image spans at most the whole page. Images in Form XObjects are included.
+    Each image object is visited once, however many pages share it.
+
+    Returns:
+        list: (xobject, mode, filters, new_width, new_height) tuples
+    """
+    jobs = []
+    seen = set()
+    for page, xobjects, name in _iter_image_slots(writer):
+        ref = xobjects.raw_get(name)
+        if ref.idnum in seen:
+            continue
+        seen.add(ref.idnum)
+        xobject = ref.get_object()
+        mode = _image_mode(xobject)
+        filters = _image_filters(xobject)
+        if mode is None or filters not in ([], ["/FlateDecode"], ["/DCTDecode"]):
+            continue
+        width, height = int(xobject["/Width"]), int(xobject["/Height"])
+        width_in = float(page.mediabox.width) / 72.0 or 8.5
+        height_in = float(page.mediabox.height) / 72.0 or 11.0
+        dpi = max(width / width_in, height / height_in)
+        if dpi <= target_dpi * 1.5:
+            continue
+        scale = target_dpi / dpi
+        jobs.append(
+            (
+                xobject,
+                mode,
+                filters,
+                max(1, round(width * scale)),
+                max(1, round(height * scale)),
+            )
+        )
+    return jobs
+
+
+def _iter_image_slots(writer):
+    """
+    Yield (page, xobject dictionary, name) for every image reference in the page tree.
+
+    Resources of Form XObjects are included; each dictionary is visited once.
+    """
+    seen = set()
+    for page in writer.pages:
+        stack = [page.get("/Resources")]
+        while stack:
+            resources = stack.pop()
+            resources = resources.get_object() if resources is not None else None
+            if not isinstance(resources, dict) or id(resources) in seen:
+                continue
+            seen.add(id(resources))
+            xobjects = resources.get("/XObject")
+            xobjects = xobjects.get_object() if xobjects is not None else None
+            if not isinstance(xobjects, dict) or id(xobjects) in seen:
+                continue
+            seen.add(id(xobjects))
+            for name, ref in list(xobjects.items()):
+                if not hasattr(ref, "idnum"):
+                    continue
+                xobject = ref.get_object()
+                if xobject.get("/Subtype") == "/Form":
+                    stack.append(xobject.get("/Resources"))
+                elif xobject.get("/Subtype") == "/Image":
+                    yield page, xobjects, name
+
+
+def _image_shape(xobject):
+    """Return the entries two identical images must share; used to pre-group them."""
+    return (
+        xobject.get("/Width"),
+        xobject.get("/Height"),
+        xobject.get("/BitsPerComponent"),
+        repr(xobject.get("/ColorSpace")),
+    )
+
+
+def _image_digest(xobject, digests):
+    """Hash an image by its decoded pixels and rendering-relevant entries."""
+    idnum = xobject.indirect_reference.idnum
+    if idnum not in digests:
+        digest = hashlib.sha256()
+        for key in sorted(xobject):
+            if key in ("/Length", "/Filter", "/DecodeParms", "/SMask", "/Mask"):
+                continue
+            digest.update(f"{key}={xobject[key]!r};".encode())
+        for key in ("/SMask", "/Mask"):
+            mask = xobject.get(key)
+            if mask is not None and hasattr(mask, "idnum"):
+                digest.update(key.encode() + _image_digest(mask.get_object(), digests))
+            elif mask is not None:
+                digest.update(f"{key}={mask!r};".encode())
+        digest.update(xobject.get_data())
+        digests[idnum] = digest.digest()
+    return digests[idnum]
+
+
+def dedupe_images(writer):
+    """
+    Point every reference to a duplicated image at one shared image object.
+
+    Images are compared by their decoded data and rendering-relevant
+    dictionary entries, so copies that were encoded differently (another
+    filter or predictor) are merged too. Images are only decoded when
+    another image has the same size and format. The orphaned copies are
+    dropped when the writer removes unreferenced objects.
+
+    Used by the native engine. The gs engine needs no such pass: Ghostscript
+    decodes every image anyway, and pdfwrite writes identical ones once
+    (-dDetectDuplicateImages, on by default).
+
+    Returns:
+        int: Number of image references redirected
+    """
+    slots = [(xobjects, name) for _, xobjects, name in _iter_image_slots(writer)]
+    groups = {}
+    for xobjects, name in slots:
+        shape = _image_shape(xobjects[name])
+        groups.setdefault(shape, set()).add(xobjects.raw_get(name).idnum)
+
+    digests = {}
+    by_digest = {}
+    for xobjects, name in slots:
+        xobject = xobjects[name]
+        if len(groups[_image_shape(xobject)]) < 2:
+            continue
+        try:
+            digest = _image_digest(xobject, digests)
+        except Exception:
+            continue  # undecodable image; leave it alone
+        by_digest.setdefault(digest, []).append((xobjects, name))
+
+    merged = 0
+    for copies in by_digest.values():
+        # Keep the most compact encoding of the image
+        keep = min(
+            (xobjects.raw_get(name) for xobjects, name in copies),
+            key=lambda ref: len(ref.get_object()._data),
+        )
+        for xobjects, name in copies:
+            if xobjects.raw_get(name).idnum != keep.idnum:
+                xobjects[name] = keep
+                merged += 1
+    return merged
+
+
+def _recompress_image(xobject, mode, filters, width, height, quality):
+    """Decode, downsample and JPEG-encode one image; return the new stream data."""
+    data = xobject.get_data()
+    if filters == ["/DCTDecode"]:
+        img = Image.open(io.BytesIO(data))
+        img.draft(mode, (width, height))  # let libjpeg decode at reduced scale
+    else:
+        img = Image.frombytes(mode, (int(xobject["/Width"]), int(xobject["/Height"])), data)
+    if img.mode != mode:
+        img = img.convert(mode)
+    img = img.resize((width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def compress_native(input_path, output_path, compression_level="ebook", workers=None):
+    """
+    Recompress only the oversized images of a PDF, leaving everything else intact.
+
+    Content streams, fonts and vector graphics are copied untouched by pypdf.
+    Duplicate images are first collapsed into one shared object (see
+    dedupe_images()), then 8-bit RGB/gray images above the preset resolution
+    are downsampled and re-encoded as JPEG with Pillow, one unique image per
+    worker thread.
+
+    Args:
+        input_path (str): Path to the input PDF file
+        output_path (str): Path for the output PDF file
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+        workers (int, optional): Number of images processed concurrently
+
+    Returns:
+        tuple: (images replaced, duplicate image references merged)
+    """
+    _require_pypdf("The native engine")
+    _require_pillow("The native engine")
+    from pypdf.generic import NameObject, NumberObject, StreamObject
+
+    writer = PdfWriter(clone_from=PdfReader(input_path))
+    merged = dedupe_images(writer)
+    target_dpi = PRESET_IMAGE_DPI[compression_level]
+    jobs = _oversized_images(writer, target_dpi) if target_dpi else []
+    quality = NATIVE_JPEG_QUALITY[compression_level]
+
+    replaced = 0
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures = {
+            executor.submit(_recompress_image, *job, quality): job for job in jobs
+        }
+        for future in as_completed(futures):
+            xobject, _, _, width, height = futures[future]
+            data = future.result()
+            if len(data) >= len(xobject._data):
+                continue
+            StreamObject.set_data(xobject, data)
+            if hasattr(xobject, "decoded_self"):
+                xobject.decoded_self = None
+            xobject[NameObject("/Filter")] = NameObject("/DCTDecode")
+            xobject[NameObject("/Width")] = NumberObject(width)
+            xobject[NameObject("/Height")] = NumberObject(height)
+            xobject.pop("/DecodeParms", None)
+            replaced += 1
+
+    # Drops the duplicates orphaned above and merges byte-identical objects
+    writer.compress_identical_objects()
+    with open(output_path, "wb") as fh:
+        writer.write(fh)
+    return replaced, merged
+
+
+def _silent(*args, **kwargs):
+    """Stand-in for print() when output is suppressed."""
+
+
+class CompressionResult(NamedTuple):
+    """Machine-readable outcome of compressing one file."""
+
+    input_path: str
+    output_path: str
+    compression_level: str
+    engine: str
+    status: str  # "compressed", "kept_original", "skipped" or "cached"
+    input_bytes: int
+    output_bytes: int
+    wall_time: float  # seconds
+    cpu_user: Optional[float]  # Ghostscript child CPU seconds, None if not measured
+    cpu_system: Optional[float]
+    peak_rss: Optional[int]  # Ghostscript child peak resident set size, in bytes
+
+    @property
+    def reduction(self):
+        """Fraction of the input size saved (0.25 means 25% smaller)."""
+        if not self.input_bytes:
+            return 0.0
+        return 1 - self.output_bytes / self.input_bytes
+
+    def to_dict(self):
+        """Return the result as a JSON-serializable dict."""
+        result = {
+            key: round(value, 6) if isinstance(value, float) else value
+            for key, value in self._asdict().items()
+        }
+        result["reduction"] = round(self.reduction, 6)
+        return result
+
+    def to_json(self):
+        """Return the result as a single line of JSON."""
+        return json.dumps(self.to_dict())
+
+
+def _run_measured(command):
+    """
+    Run a command and return the child's resource usage.
+
+    The child is reaped with os.wait4(), which reports the same usage as
+    resource.getrusage() but for this child alone, so concurrent batch
+    workers do not see each other's CPU time. Where wait4 is unavailable
+    (Windows), the command is run normally and the usage is None.
+
+    Args:
+        command (list): Command line to run
+
+    Returns:
+        tuple: (user CPU seconds, system CPU seconds, peak RSS in bytes)
+    """
+    if not hasattr(os, "wait4"):
+        subprocess.run(command, check=True)
+        return None, None, None
+    process = subprocess.Popen(command)
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return usage.ru_utime, usage.ru_stime, peak_rss
+
+
+def compress_pdf(
+    input_path,
+    output_path=None,
+    compression_level="ebook",
+    force=False,
+    quiet=False,
+    pool=None,
+    cache=None,
+    prescan=False,
+    min_gain=0.05,
+    engine="gs",
+    image_workers=None,
+    linearize=False,
+    staging_dir=None,
+):
+    """
+    Compress a PDF file using Ghostscript (or another engine).
+
+    Takes the same arguments as compress_pdf_detailed(), which also reports
+    sizes, timings and Ghostscript resource usage.
+
+    Returns:
+        str: Path to the compressed file
+    """
+    return compress_pdf_detailed(
+        input_path,
+        output_path,
+        compression_level,
+        force,
+        quiet,
+        pool,
+        cache,
+        prescan,
+        min_gain,
+        engine,
+        image_workers,
+        linearize,
+        staging_dir,
+    ).output_path
+
+
+def compress_pdf_detailed(
+    input_path,
+    output_path=None,
+    compression_level="ebook",
+    force=False,
+    quiet=False,
+    pool=None,
+    cache=None,
+    prescan=False,
+    min_gain=0.05,
+    engine="gs",
+    image_workers=None,
+    linearize=False,
+    staging_dir=None,
+):
     """
     Compress a PDF file using Ghostscript with the specified compression level.
 
+    With engine="native", compress_native() is used instead of Ghostscript;
+    with engine="lossless", optimize_lossless() (the compression level is
+    then ignored).
+
+    If the result is not smaller than the input, the original is kept as the
+    output instead. The output is written under a temporary name (in
+    *staging_dir* if given), fsynced and renamed into place, so readers never
+    see a partial file and a failed run leaves an existing output untouched.
+
     Args:
         input_path (str): Path to the input PDF file
         output_path (str, optional): Path for the output PDF file
         compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
         force (bool): Whether to overwrite output file if it exists
+        quiet (bool): Suppress progress output (used by batch mode)
+        pool (GhostscriptPool, optional): Warm Ghostscript workers to run the job on
+        cache (ResultCache, optional): Reuse results for previously seen inputs
+        prescan (bool): Skip Ghostscript when estimate_savings() expects little gain
+        min_gain (float): Minimum expected saving, as a fraction of the input size
+        engine (str): Compression engine, one of ENGINES
+        image_workers (int, optional): Images recompressed concurrently by the native engine
+        linearize (bool): Linearize the output for fast web view (requires qpdf)
+        staging_dir (str, optional): Write the output here first, e.g. on tmpfs or
+            a local disk when the output is on a network filesystem
 
     Returns:
-        str: Path to the compressed file
+        CompressionResult: Paths, sizes, wall time and, for a one-shot
+        Ghostscript run, the child's CPU time and peak memory
     """
     # Validate input file
     input_path = os.path.abspath(input_path)
@@ -57,9 +1089,7 @@ def compress_pdf(input_path, output_path=None, compression_level="ebook", force=
 
     # Set output path if not provided
     if output_path is None:
-        dir_path, filename = os.path.split(input_path)
-        base_name, ext = os.path.splitext(filename)
-        output_path = os.path.join(dir_path, f"{base_name}_compressed{ext}")
+        output_path = _default_output_path(input_path)
 
     # Validate output path
     output_path = os.path.abspath(output_path)
@@ -71,101 +1101,1838 @@ def compress_pdf(input_path, output_path=None, compression_level="ebook", force=
         raise ValueError(
             f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
         )
+    if engine not in ENGINES:
+        raise ValueError(f"Invalid engine. Choose from: {', '.join(ENGINES)}")
+    if linearize:
+        require_qpdf("Linearization")
+    if pool is not None and pool.compression_level != compression_level:
+        raise ValueError(
+            f"Ghostscript pool runs level '{pool.compression_level}', "
+            f"not '{compression_level}'"
+        )
+    if staging_dir is not None and not os.path.isdir(staging_dir):
+        raise NotADirectoryError(f"Staging directory not found: {staging_dir}")
+    work_path = _partial_path(
+        staging_dir or os.path.dirname(output_path), os.path.basename(output_path)
+    )
 
     # Get the input file size before compression
     input_size = get_file_size(input_path)
 
-    print(f"Compressing PDF: {input_path}")
-    print(
-        f"Compression level: {compression_level} ({COMPRESSION_LEVELS[compression_level]})"
-    )
+    log = _silent if quiet else print
+    log(f"Compressing PDF: {input_path}")
+    start_time = time.time()
+    usage = (None, None, None)
+    status = "compressed"
 
-    # Prepare the Ghostscript command
-    gs_command = [
-        "gs",
-        "-sDEVICE=pdfwrite",
-        f"-dPDFSETTINGS=/{compression_level}",
-        "-dCompatibilityLevel=1.4",
-        "-dNOPAUSE",
-        "-dQUIET",
-        "-dBATCH",
-        f"-sOutputFile={output_path}",
-        input_path,
-    ]
+    def result():
+        return CompressionResult(
+            input_path,
+            output_path,
+            compression_level,
+            engine,
+            status,
+            os.path.getsize(input_path),
+            os.path.getsize(output_path),
+            time.time() - start_time,
+            *usage,
+        )
+
+    if engine != "lossless":
+        log(
+            f"Compression level: {compression_level} ({COMPRESSION_LEVELS[compression_level]})"
+        )
+    if engine != "gs":
+        log(f"Engine: {engine} ({ENGINES[engine]})")
+
+    if prescan:
+        estimate = estimate_savings(input_path, compression_level)
+        expected = estimate["expected_saving"] / max(estimate["file_bytes"], 1)
+        log(
+            f"Pre-scan: {estimate['image_count']} image(s), "
+            f"{format_size(estimate['image_bytes'])} of image data, "
+            f"up to {estimate['max_image_dpi']} dpi, expected saving {expected * 100:.1f}%"
+        )
+        if expected < min_gain:
+            try:
+                _clone_file(input_path, work_path)
+                if linearize:
+                    linearize_pdf(work_path)
+                _publish(work_path, output_path)
+            finally:
+                if os.path.exists(work_path):
+                    os.remove(work_path)
+            log("Skipped: no worthwhile gain expected, kept the original")
+            log(f"Output saved to: {output_path}")
+            status = "skipped"
+            return result()
 
     # Execute the command
     try:
-        start_time = time.time()
-        subprocess.run(gs_command, check=True)
+        key = None
+        if cache is not None:
+            key = cache.key(input_path, engine_settings(engine, compression_level))
+        if key is not None and cache.fetch(key, work_path):
+            log("Cache hit: reusing previous result")
+            status = "cached"
+        else:
+            if engine == "native":
+                replaced, merged = compress_native(
+                    input_path, work_path, compression_level, image_workers
+                )
+                log(f"Recompressed {replaced} image(s), merged {merged} duplicate(s)")
+            elif engine == "lossless":
+                _require_pypdf("The lossless engine")
+                stats = optimize_lossless(input_path, work_path)
+                log(
+                    f"Objects: {stats['objects_in']} -> {stats['objects_out']} "
+                    f"({stats['merged']} merged, {stats['dropped']} unreferenced dropped, "
+                    f"{stats['streams_compressed']} stream(s) Flate-compressed)"
+                )
+            elif pool is not None:
+                pool.run(input_path, work_path)
+            else:
+                gs_command = build_gs_command(input_path, work_path, compression_level)
+                usage = _run_measured(gs_command)
+            if (
+                os.path.exists(work_path)
+                and os.path.getsize(work_path) >= os.path.getsize(input_path)
+            ):
+                _clone_file(input_path, work_path)
+                log("Output was not smaller; kept the original")
+                status = "kept_original"
+            if key is not None and os.path.exists(work_path):
+                cache.store(key, work_path)
+        # Cached results stay unlinearized
+        if linearize and os.path.exists(work_path):
+            linearize_pdf(work_path)
+            log("Linearized for fast web view")
+        if os.path.exists(work_path):
+            _publish(work_path, output_path)
+        else:
+            raise FileNotFoundError(f"Output file was not created: {output_path}")
         end_time = time.time()
 
         # Compare file sizes
-        if os.path.exists(output_path):
-            output_size = get_file_size(output_path)
-            input_bytes = os.path.getsize(input_path)
-            output_bytes = os.path.getsize(output_path)
-
-            if output_bytes > 0 and input_bytes > 0:
-                reduction = (1 - (output_bytes / input_bytes)) * 100
-                print(f"\nCompression successful!")
-                print(f"Original size: {input_size}")
-                print(f"Compressed size: {output_size}")
-                print(f"Reduction: {reduction:.1f}%")
-                print(f"Time taken: {end_time - start_time:.2f} seconds")
-                print(f"Output saved to: {output_path}")
-                return output_path
-            else:
-                print("Warning: Could not calculate size reduction")
-                return output_path
+        output_size = get_file_size(output_path)
+        input_bytes = os.path.getsize(input_path)
+        output_bytes = os.path.getsize(output_path)
+
+        if output_bytes > 0 and input_bytes > 0:
+            reduction = (1 - (output_bytes / input_bytes)) * 100
+            log(f"\nCompression successful!")
+            log(f"Original size: {input_size}")
+            log(f"Compressed size: {output_size}")
+            log(f"Reduction: {reduction:.1f}%")
+            log(f"Time taken: {end_time - start_time:.2f} seconds")
+            log(f"Output saved to: {output_path}")
         else:
-            raise FileNotFoundError(f"Output file was not created: {output_path}")
+            log("Warning: Could not calculate size reduction")
+        return result()
 
     except subprocess.CalledProcessError as e:
-        print(f"Error running Ghostscript: {e}")
-        if os.path.exists(output_path):
-            os.remove(output_path)
+        log(f"Error running Ghostscript: {e}")
         raise
     except Exception as e:
-        print(f"Compression failed: {e}")
-        if os.path.exists(output_path):
-            os.remove(output_path)
+        log(f"Compression failed: {e}")
         raise
+    finally:
+        if os.path.exists(work_path):
+            os.remove(work_path)
 
 
-def main():
-    """Parse command line arguments and run the PDF compression."""
-    parser = argparse.ArgumentParser(
-        description="Compress PDF files using Ghostscript.",
-        epilog=f"Available compression levels:\n"
-        + "\n".join([f"  {k}: {v}" for k, v in COMPRESSION_LEVELS.items()]),
-    )
-    parser.add_argument("input", help="Path to the input PDF file")
-    parser.add_argument(
-        "-o",
-        "--output",
-        help="Path for the output PDF file (default: filename_compressed.pdf)",
-    )
-    parser.add_argument(
-        "-c",
-        "--compression",
-        choices=COMPRESSION_LEVELS.keys(),
-        default="ebook",
+def _dpi_settings(dpi):
+    """Return Ghostscript flags for the screen preset with images capped at *dpi*."""
+    return gs_settings("screen") + [
+        "-dDownsampleColorImages=true",
+        "-dDownsampleGrayImages=true",
+        "-dDownsampleMonoImages=true",
+        f"-dColorImageResolution={dpi}",
+        f"-dGrayImageResolution={dpi}",
+        f"-dMonoImageResolution={dpi * 4}",
+        "-dColorImageDownsampleThreshold=1.0",
+        "-dGrayImageDownsampleThreshold=1.0",
+    ]
+
+
+def _target_candidates():
+    """Return (label, gs settings) pairs ordered from best to worst quality."""
+    candidates = [(level, gs_settings(level)) for level in TARGET_PRESETS]
+    candidates += [(f"{dpi} dpi", _dpi_settings(dpi)) for dpi in TARGET_FALLBACK_DPIS]
+    return candidates
+
+
+def _search_candidates(input_path, candidates, target_bytes, work_dir, workers, log):
+    """
+    Run Ghostscript for every candidate concurrently and pick the best fit.
+
+    *candidates* are ordered best quality first. As soon as a candidate fits
+    the budget, every running or queued candidate of lower quality is no
+    longer needed and is killed or dropped.
+
+    Returns:
+        tuple: (index, output path) of the best fitting candidate, or of the
+        smallest result if none fits; (None, None) if every run failed
+    """
+    finished = queue.Queue()
+    running = {}
+    pending = list(range(len(candidates)))
+    best = None
+    smallest = None
+    sizes = {}
+
+    def wait_for(index, process):
+        finished.put((index, process.wait()))
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index = pending.pop(0)
+                label, settings = candidates[index]
+                out_path = os.path.join(work_dir, f"candidate{index}.pdf")
+                process = subprocess.Popen(
+                    ["gs", *settings, "-dBATCH", f"-sOutputFile={out_path}", input_path]
+                )
+                running[index] = (process, out_path)
+                threading.Thread(
+                    target=wait_for, args=(index, process), daemon=True
+                ).start()
+
+            index, returncode = finished.get()
+            if index not in running:
+                continue  # cancelled after it was launched
+            _, out_path = running.pop(index)
+            label = candidates[index][0]
+            if returncode != 0 or not os.path.exists(out_path):
+                log(f"  {label}: Ghostscript failed (exit code {returncode})")
+                continue
+
+            sizes[index] = os.path.getsize(out_path)
+            fits = sizes[index] <= target_bytes
+            log(f"  {label}: {format_size(sizes[index])}{' (fits)' if fits else ''}")
+            if smallest is None or sizes[index] < sizes[smallest]:
+                smallest = index
+            if fits and (best is None or index < best):
+                best = index
+                pending = [i for i in pending if i < best]
+                for other in [i for i in running if i > best]:
+                    running.pop(other)[0].kill()
+    finally:
+        for process, _ in running.values():
+            process.kill()
+            process.wait()
+
+    chosen = best if best is not None else smallest
+    if chosen is None:
+        return None, None
+    return chosen, os.path.join(work_dir, f"candidate{chosen}.pdf")
+
+
+def compress_to_target(
+    input_path,
+    target_bytes,
+    output_path=None,
+    force=False,
+    workers=None,
+    quiet=False,
+    staging_dir=None,
+):
+    """
+    Compress a PDF to the best quality that fits under *target_bytes*.
+
+    The presets in TARGET_PRESETS and the reduced image resolutions in
+    TARGET_FALLBACK_DPIS are run as concurrent Ghostscript processes, so the
+    target is found in a single wall-clock pass instead of serial retries.
+    If nothing fits, the smallest result is kept and a warning is printed.
+
+    Args:
+        input_path (str): Path to the input PDF file
+        target_bytes (int): Maximum size of the output file in bytes
+        output_path (str, optional): Path for the output PDF file
+        force (bool): Whether to overwrite output file if it exists
+        workers (int, optional): Number of concurrent Ghostscript processes
+        quiet (bool): Suppress progress output
+        staging_dir (str, optional): Directory for the candidates and the output
+            before it is renamed into place (default: next to the output)
+
+    Returns:
+        str: Path to the compressed file
+    """
+    input_path, output_path = _resolve_paths(input_path, output_path, force)
+    if target_bytes <= 0:
+        raise ValueError("Target size must be positive")
+
+    candidates = _target_candidates()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(candidates)))
+    log = _silent if quiet else print
+    log(f"Compressing PDF: {input_path}")
+    log(
+        f"Target size: {format_size(target_bytes)} "
+        f"(trying {len(candidates)} settings, {workers} at a time)"
+    )
+
+    if os.path.getsize(input_path) <= target_bytes:
+        with _staged_output(output_path, staging_dir) as work_path:
+            _clone_file(input_path, work_path)
+        log("The original already fits the target; kept it unchanged")
+        log(f"Output saved to: {output_path}")
+        return output_path
+
+    start_time = time.time()
+    with _staged_output(output_path, staging_dir) as work_path:
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(work_path)) as work_dir:
+            index, result_path = _search_candidates(
+                input_path, candidates, target_bytes, work_dir, workers, log
+            )
+            if index is None:
+                raise RuntimeError("Ghostscript failed for every candidate setting")
+            os.replace(result_path, work_path)
+    end_time = time.time()
+
+    input_bytes = os.path.getsize(input_path)
+    output_bytes = os.path.getsize(output_path)
+    label = candidates[index][0]
+    if output_bytes <= target_bytes:
+        log(f"\nTarget reached with: {label}")
+    else:
+        log(
+            f"\nWarning: no setting reached {format_size(target_bytes)}; "
+            f"kept the smallest result ({label})"
+        )
+    log(f"Original size: {format_size(input_bytes)}")
+    log(f"Compressed size: {format_size(output_bytes)}")
+    if input_bytes > 0:
+        log(f"Reduction: {(1 - output_bytes / input_bytes) * 100:.1f}%")
+    log(f"Time taken: {end_time - start_time:.2f} seconds")
+    log(f"Output saved to: {output_path}")
+    return output_path
+
+
+def _shard_ranges(page_count, shards):
+    """Split pages 1..page_count into at most *shards* contiguous (first, last) ranges."""
+    shards = max(1, min(shards, page_count))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    first = 1
+    for i in range(shards):
+        last = first + size - 1 + (1 if i < extra else 0)
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+
+def _stitch_shards(shard_paths, output_path, metadata=None):
+    """Concatenate shard PDFs into *output_path*, merging identical objects."""
+    writer = PdfWriter()
+    for shard_path in shard_paths:
+        writer.append(PdfReader(shard_path))
+    # Shards are compressed independently, so each carries its own copy of any
+    # image or font resource it uses; collapse byte-identical copies.
+    writer.compress_identical_objects()
+    if metadata:
+        writer.add_metadata(metadata)
+    with open(output_path, "wb") as fh:
+        writer.write(fh)
+
+
+def _duplicated_font_bytes(path):
+    """
+    Return the bytes spent on extra copies of the same font in a stitched PDF.
+
+    Each shard embeds its own subset of a font (ABCDEF+Name, GHIJKL+Name);
+    the copies cannot be merged, and a single-pass compress would have
+    embedded one. Copies are found by font name without the subset prefix,
+    from the object dictionaries and stream lengths only.
+    """
+    copies = {}
+    with PdfScan(path) as scan:
+        for obj in scan.objects():
+            if not isinstance(obj.value, dict) or obj.value.get("Type") != "FontDescriptor":
+                continue
+            name = str(obj.value.get("FontName", ""))
+            if name[6:7] == "+" and name[:6].isalpha() and name[:6].isupper():
+                name = name[7:]
+            for key in ("FontFile", "FontFile2", "FontFile3"):
+                ref = obj.value.get(key)
+                font_file = scan.get(ref.num) if isinstance(ref, Ref) else None
+                if font_file is not None and font_file.is_stream:
+                    copies.setdefault(name, {})[ref.num] = font_file.stream_length
+    return sum(sum(sizes.values()) - max(sizes.values()) for sizes in copies.values())
+
+
+def compress_sharded(
+    input_path,
+    output_path=None,
+    compression_level="ebook",
+    force=False,
+    workers=None,
+    pages_per_shard=None,
+    quiet=False,
+    linearize=False,
+    staging_dir=None,
+):
+    """
+    Compress a large PDF by splitting it into page ranges processed in parallel.
+
+    Each shard is compressed by its own ``gs`` process using -dFirstPage and
+    -dLastPage, and the results are stitched back together with pypdf.
+    Identical fonts and images in different shards are merged into a single
+    object. Font subsets that differ between shards cannot be merged; when
+    the stitched file carries such extra copies, the document is also
+    compressed in a single pass and the smaller result is kept, so the
+    output is never larger than a single-pass compress.
+
+    Args:
+        input_path (str): Path to the input PDF file
+        output_path (str, optional): Path for the output PDF file
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+        force (bool): Whether to overwrite output file if it exists
+        workers (int, optional): Number of concurrent Ghostscript processes
+        pages_per_shard (int, optional): Pages per shard (default: one shard per worker)
+        quiet (bool): Suppress progress output
+        linearize (bool): Linearize the output for fast web view (requires qpdf)
+        staging_dir (str, optional): Directory for the shards and the output
+            before it is renamed into place (default: next to the output)
+
+    Returns:
+        str: Path to the compressed file
+    """
+    _require_pypdf("Sharded compression")
+    if linearize:
+        require_qpdf("Linearization")
+    input_path, output_path = _resolve_paths(input_path, output_path, force)
+    if compression_level not in COMPRESSION_LEVELS.keys():
+        raise ValueError(
+            f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
+        )
+
+    with open(input_path, "rb") as fh:
+        reader = PdfReader(fh)
+        page_count = len(reader.pages)
+        info = reader.metadata or {}
+        metadata = {key: str(info[key]) for key in info}
+    workers = max(1, workers or os.cpu_count() or 1)
+    if pages_per_shard:
+        shards = -(-page_count // pages_per_shard)
+    else:
+        shards = workers
+    ranges = _shard_ranges(page_count, shards)
+
+    log = _silent if quiet else print
+    log(f"Compressing PDF: {input_path}")
+    log(
+        f"Compression level: {compression_level} ({COMPRESSION_LEVELS[compression_level]})"
+    )
+    log(
+        f"Sharding {page_count} page(s) into {len(ranges)} shard(s), "
+        f"{min(workers, len(ranges))} at a time"
+    )
+
+    start_time = time.time()
+    with _staged_output(output_path, staging_dir) as work_path:
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(work_path)) as work_dir:
+            shard_paths = [
+                os.path.join(work_dir, f"shard{i}.pdf") for i in range(len(ranges))
+            ]
+            commands = [
+                build_gs_command(input_path, shard_path, compression_level)[:-1]
+                + [f"-dFirstPage={first}", f"-dLastPage={last}", input_path]
+                for shard_path, (first, last) in zip(shard_paths, ranges)
+            ]
+            with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+                for _ in executor.map(
+                    lambda command: subprocess.run(command, check=True), commands
+                ):
+                    pass
+            shard_time = time.time()
+            _stitch_shards(shard_paths, work_path, metadata)
+            duplicated = _duplicated_font_bytes(work_path)
+            if duplicated:
+                # Sharding may have lost to a single pass; check with one
+                log(
+                    f"Shards carry {format_size(duplicated)} of extra font copies; "
+                    "comparing with a single-pass compress"
+                )
+                single_path = os.path.join(work_dir, "single.pdf")
+                subprocess.run(
+                    build_gs_command(input_path, single_path, compression_level), check=True
+                )
+                if os.path.getsize(single_path) < os.path.getsize(work_path):
+                    os.replace(single_path, work_path)
+                    log("Single-pass output was smaller; kept it")
+        if os.path.getsize(work_path) >= os.path.getsize(input_path):
+            _clone_file(input_path, work_path)
+            log("Output was not smaller; kept the original")
+        if linearize:
+            linearize_pdf(work_path)
+            log("Linearized for fast web view")
+    end_time = time.time()
+
+    input_bytes = os.path.getsize(input_path)
+    output_bytes = os.path.getsize(output_path)
+    log("\nCompression successful!")
+    log(f"Original size: {format_size(input_bytes)}")
+    log(f"Compressed size: {format_size(output_bytes)}")
+    if input_bytes > 0:
+        log(f"Reduction: {(1 - output_bytes / input_bytes) * 100:.1f}%")
+    log(
+        f"Time taken: {end_time - start_time:.2f} seconds "
+        f"(shards: {shard_time - start_time:.2f}s, stitch: {end_time - shard_time:.2f}s)"
+    )
+    log(f"Output saved to: {output_path}")
+    return output_path
+
+
+def _feed_stdin(process, source):
+    """Write *source* (bytes or a binary file-like object) to the process stdin."""
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            process.stdin.write(source)
+        else:
+            shutil.copyfileobj(source, process.stdin, 1024 * 1024)
+    except BrokenPipeError:
+        pass  # gs exited early; its return code reports the failure
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def compress_stream(source, destination=None, compression_level="ebook"):
+    """
+    Compress a PDF held in memory or read from a stream, without touching paths.
+
+    The document is piped into Ghostscript's stdin and the result is read
+    from its stdout. Note that Ghostscript itself spools a PDF read from
+    stdin to a temporary file, because PDF parsing needs random access.
+
+    When both sides are buffered (bytes in, no *destination*), the original
+    bytes are returned if the compressed result is not smaller.
+
+    Args:
+        source (bytes or file-like): The input PDF, as bytes or a binary stream
+        destination (file-like, optional): Binary stream to write the result to
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+
+    Returns:
+        bytes or int: The compressed PDF, or the number of bytes written to *destination*
+    """
+    if compression_level not in COMPRESSION_LEVELS.keys():
+        raise ValueError(
+            f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
+        )
+    # Ghostscript's own messages also go to stdout; route them to stderr so
+    # only the PDF is on the pipe
+    command = [
+        "gs",
+        *gs_settings(compression_level),
+        "-dBATCH",
+        "-q",
+        "-sstdout=%stderr",
+        "-sOutputFile=-",
+        "-",
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    feeder = threading.Thread(target=_feed_stdin, args=(process, source), daemon=True)
+    feeder.start()
+
+    chunks = []
+    written = 0
+    try:
+        for chunk in iter(lambda: process.stdout.read(1024 * 1024), b""):
+            if destination is None:
+                chunks.append(chunk)
+            else:
+                destination.write(chunk)
+            written += len(chunk)
+    finally:
+        process.stdout.close()
+        feeder.join()
+        returncode = process.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command)
+
+    if destination is not None:
+        return written
+    result = b"".join(chunks)
+    if isinstance(source, (bytes, bytearray, memoryview)) and len(result) >= len(source):
+        return bytes(source)
+    return result
+
+
+async def _run_gs_async(command, output_path, timeout):
+    """Run Ghostscript as an asyncio child; kill it on timeout or cancellation."""
+    process = await asyncio.create_subprocess_exec(*command)
+    try:
+        returncode = await asyncio.wait_for(process.wait(), timeout)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    if returncode != 0:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+async def compress_pdf_async(
+    input_path,
+    output_path=None,
+    compression_level="ebook",
+    force=False,
+    timeout=None,
+    semaphore=None,
+    staging_dir=None,
+):
+    """
+    Compress a PDF file with Ghostscript without blocking the event loop.
+
+    The ``gs`` child is started with asyncio.create_subprocess_exec. If the
+    job times out or the awaiting task is cancelled, the child is killed and
+    any partial output removed. As with compress_pdf(), the original is kept
+    when the result is not smaller, and the output is staged and renamed
+    into place.
+
+    Args:
+        input_path (str): Path to the input PDF file
+        output_path (str, optional): Path for the output PDF file
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+        force (bool): Whether to overwrite output file if it exists
+        timeout (float, optional): Seconds after which the job is killed (asyncio.TimeoutError)
+        semaphore (asyncio.Semaphore, optional): Limits how many gs processes run at once
+        staging_dir (str, optional): Write the output here first (default: next to it)
+
+    Returns:
+        str: Path to the compressed file
+    """
+    input_path, output_path = _resolve_paths(input_path, output_path, force)
+    if compression_level not in COMPRESSION_LEVELS.keys():
+        raise ValueError(
+            f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
+        )
+    if staging_dir is not None and not os.path.isdir(staging_dir):
+        raise NotADirectoryError(f"Staging directory not found: {staging_dir}")
+    work_path = _partial_path(
+        staging_dir or os.path.dirname(output_path), os.path.basename(output_path)
+    )
+    command = build_gs_command(input_path, work_path, compression_level)
+
+    try:
+        if semaphore is None:
+            await _run_gs_async(command, work_path, timeout)
+        else:
+            async with semaphore:
+                await _run_gs_async(command, work_path, timeout)
+
+        if not os.path.exists(work_path):
+            raise FileNotFoundError(f"Output file was not created: {output_path}")
+        if os.path.getsize(work_path) >= os.path.getsize(input_path):
+            _clone_file(input_path, work_path)
+        # fsync can take a while on a network filesystem
+        await asyncio.get_running_loop().run_in_executor(
+            None, _publish, work_path, output_path
+        )
+    finally:
+        if os.path.exists(work_path):
+            os.remove(work_path)
+    return output_path
+
+
+async def compress_many_async(
+    inputs,
+    output_dir=None,
+    compression_level="ebook",
+    force=False,
+    concurrency=None,
+    timeout=None,
+):
+    """
+    Compress many PDF files concurrently on the running event loop.
+
+    Args:
+        inputs (list): Paths to PDF files and/or directories containing PDFs
+        output_dir (str, optional): Directory for the outputs (default: next to each input)
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+        force (bool): Whether to overwrite output files if they exist
+        concurrency (int, optional): Maximum concurrent gs processes (default: CPU cores)
+        timeout (float, optional): Per-file timeout in seconds
+
+    Returns:
+        list: Output path or exception for each input PDF, in input order
+    """
+    pdfs = collect_pdfs(inputs)
+    outputs = _batch_output_paths(pdfs, output_dir)
+    semaphore = asyncio.Semaphore(concurrency or os.cpu_count() or 1)
+    return await asyncio.gather(
+        *(
+            compress_pdf_async(
+                pdf,
+                outputs[pdf],
+                compression_level,
+                force,
+                timeout,
+                semaphore,
+            )
+            for pdf in pdfs
+        ),
+        return_exceptions=True,
+    )
+
+
+def collect_pdfs(paths):
+    """
+    Expand a list of files and directories into the PDF files to compress.
+
+    Directories are scanned non-recursively for ``*.pdf`` files; explicit file
+    paths are taken as given. Duplicates are dropped and order is preserved.
+
+    Args:
+        paths (list): Paths to PDF files and/or directories
+
+    Returns:
+        list: Absolute paths of the PDF files found
+    """
+    pdfs = []
+    seen = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            candidates = sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.lower().endswith(".pdf")
+                and not os.path.splitext(name)[0].endswith("_compressed")
+                and os.path.isfile(os.path.join(path, name))
+            )
+        elif os.path.isfile(path):
+            candidates = [path]
+        else:
+            raise FileNotFoundError(f"Input file not found: {path}")
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                pdfs.append(candidate)
+    return pdfs
+
+
+def _batch_output_path(input_path, output_dir, subdir=""):
+    """Return the output path for *input_path* in batch mode."""
+    if output_dir is None:
+        return None
+    base_name, ext = os.path.splitext(os.path.basename(input_path))
+    return os.path.normpath(os.path.join(output_dir, subdir, f"{base_name}_compressed{ext}"))
+
+
+def _batch_output_paths(pdfs, output_dir):
+    """
+    Map every input of a batch to its output path, creating the directories.
+
+    Outputs mirror each input's directory relative to the deepest directory
+    all inputs share, so ``a/report.pdf`` and ``b/report.pdf`` do not both
+    become ``report_compressed.pdf``; inputs from a single directory land
+    directly in *output_dir*. With no *output_dir*, every output goes next
+    to its input (the mapped value is None).
+
+    Args:
+        pdfs (list): Absolute paths of the inputs, from collect_pdfs()
+        output_dir (str): Directory for the outputs, or None
+
+    Returns:
+        dict: input path -> output path (or None)
+    """
+    if output_dir is None or not pdfs:
+        return {pdf: None for pdf in pdfs}
+    try:
+        root = os.path.commonpath([os.path.dirname(pdf) for pdf in pdfs])
+    except ValueError:
+        # Inputs on different drives (Windows): mirror the full paths
+        root = None
+    outputs = {}
+    for pdf in pdfs:
+        directory = os.path.dirname(pdf)
+        if root is None:
+            subdir = os.path.splitdrive(directory)[1].lstrip(os.sep)
+        else:
+            subdir = os.path.relpath(directory, root)
+        outputs[pdf] = _batch_output_path(pdf, output_dir, subdir)
+    for directory in {os.path.dirname(path) for path in outputs.values()}:
+        os.makedirs(directory, exist_ok=True)
+    return outputs
+
+
+def _file_sha256(path):
+    """Return the hex SHA-256 of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_settings(engine, compression_level):
+    """
+    Return the settings a manifest entry is recorded under.
+
+    Files done with another engine or level are compressed again. The
+    Ghostscript engine uses the plain level, as manifests did before there
+    were other engines; the lossless engine ignores the level.
+    """
+    if engine == "gs":
+        return compression_level
+    if engine == "lossless":
+        return "lossless"
+    return f"{engine}:{compression_level}"
+
+
+class Manifest:
+    """
+    SQLite record of files already compressed by batch runs.
+
+    Each completed file is stored with its size, mtime, SHA-256, settings
+    (see manifest_settings()) and output path, in its own transaction, so a
+    re-run (or a run resumed after a crash) only processes new or changed
+    files. A file whose mtime changed but whose content hash did not is still
+    considered done.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS files (
+                    input_path TEXT NOT NULL,
+                    compression_level TEXT NOT NULL,  -- manifest_settings()
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    output_path TEXT NOT NULL,
+                    output_bytes INTEGER NOT NULL,
+                    completed_at REAL NOT NULL,
+                    PRIMARY KEY (input_path, compression_level)
+                )"""
+            )
+
+    def status(self, input_path, settings, output_path):
+        """
+        Classify *input_path* against the manifest, for the given *settings*.
+
+        Returns:
+            str: "current" if it was already compressed to *output_path* and is
+            unchanged, "changed" if an earlier run wrote *output_path* from a
+            different version or with other settings, or "new"
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256, output_path FROM files "
+                "WHERE input_path = ? AND compression_level = ?",
+                (input_path, settings),
+            ).fetchone()
+            written = self._conn.execute(
+                "SELECT 1 FROM files WHERE input_path = ? AND output_path = ?",
+                (input_path, output_path),
+            ).fetchone()
+        if row is None or row[3] != output_path:
+            return "changed" if written and os.path.exists(output_path) else "new"
+        if not os.path.exists(output_path):
+            return "changed"
+        st = os.stat(input_path)
+        if st.st_size != row[0]:
+            return "changed"
+        if st.st_mtime_ns == row[1]:
+            return "current"
+        if _file_sha256(input_path) != row[2]:
+            return "changed"
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE files SET mtime_ns = ? WHERE input_path = ? AND compression_level = ?",
+                (st.st_mtime_ns, input_path, settings),
+            )
+        return "current"
+
+    def record(self, input_path, settings, output_path):
+        """Record a completed compression (atomically, in its own transaction)."""
+        st = os.stat(input_path)
+        sha256 = _file_sha256(input_path)
+        with self._lock, self._conn:
+            # The output written with other settings has just been replaced
+            self._conn.execute(
+                "DELETE FROM files WHERE input_path = ? AND output_path = ?",
+                (input_path, output_path),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    input_path,
+                    settings,
+                    st.st_size,
+                    st.st_mtime_ns,
+                    sha256,
+                    output_path,
+                    os.path.getsize(output_path),
+                    time.time(),
+                ),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _compress_job(input_path, output_path, options, manifest=None):
+    """Compress one file quietly and return its CompressionResult."""
+    result = compress_pdf_detailed(input_path, output_path, quiet=True, **options)
+    if manifest is not None:
+        settings = manifest_settings(options.get("engine", "gs"), options["compression_level"])
+        manifest.record(input_path, settings, result.output_path)
+    return result
+
+
+def _report_batch_job(future, pdf, done, total, json_lines, succeeded, failed):
+    """Print the outcome of one batch job and append it to *succeeded* or *failed*."""
+    name = os.path.basename(pdf)
+    try:
+        result = future.result()
+    except Exception as e:
+        failed.append((pdf, e))
+        if json_lines:
+            print(json.dumps({"input_path": pdf, "error": str(e)}), flush=True)
+        else:
+            print(f"[{done}/{total}] {name}: FAILED ({e})")
+        return
+
+    succeeded.append(result.output_path)
+    if json_lines:
+        print(result.to_json(), flush=True)
+        return
+    in_bytes = result.input_bytes
+    rate = in_bytes / result.wall_time if result.wall_time > 0 else 0.0
+    print(
+        f"[{done}/{total}] {name}: {format_size(in_bytes)} -> "
+        f"{format_size(result.output_bytes)} ({result.reduction * 100:.1f}%) "
+        f"in {result.wall_time:.2f}s, {format_size(rate)}/s"
+    )
+
+
+def _schedule_order(pdfs, sizes, schedule):
+    """Return *pdfs* in the order *schedule* (one of SCHEDULES) starts them."""
+    if schedule == "lpt":
+        return sorted(pdfs, key=lambda pdf: -sizes[pdf])
+    if schedule == "sjf":
+        return sorted(pdfs, key=lambda pdf: sizes[pdf])
+    return list(pdfs)
+
+
+def compress_batch(
+    inputs,
+    output_dir=None,
+    compression_level="ebook",
+    force=False,
+    workers=None,
+    warm=False,
+    max_jobs_per_worker=100,
+    warm_timeout=600.0,
+    manifest=None,
+    json_lines=False,
+    schedule="lpt",
+    memory_budget=None,
+    **options,
+):
+    """
+    Compress many PDF files concurrently.
+
+    Ghostscript does the heavy lifting in a child process, so a thread pool is
+    enough to keep one ``gs`` process running per worker. The pool is bounded
+    by *workers*, which defaults to the number of CPU cores.
+
+    Files are started in *schedule* order. The default, largest first, keeps
+    one big file picked up last from running alone while the other workers
+    sit idle. With a *memory_budget*, the input sizes of the files in flight
+    (a proxy for their memory use) never add up to more than the budget: a
+    file that does not fit waits, and smaller files behind it are started
+    in its place. A file larger than the whole budget runs on its own.
+
+    Args:
+        inputs (list): Paths to PDF files and/or directories containing PDFs
+        output_dir (str, optional): Directory for the outputs (default: next to each input)
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+        force (bool): Whether to overwrite output files if they exist
+        workers (int, optional): Number of concurrent Ghostscript processes
+        warm (bool): Reuse long-lived Ghostscript interpreters (see GhostscriptPool)
+        max_jobs_per_worker (int): Recycle a warm interpreter after this many jobs
+        warm_timeout (float, optional): Kill and replace a warm interpreter whose
+            job runs longer than this many seconds
+        manifest (Manifest, optional): Skip files already done and record new ones
+        json_lines (bool): Print one JSON object per file instead of progress text
+        schedule (str): Order files are started in, one of SCHEDULES
+        memory_budget (int, optional): Maximum total input bytes in flight
+        **options: Further keyword arguments for compress_pdf() (cache, prescan, ...)
+
+    Returns:
+        tuple: (list of output paths, list of (input path, exception) failures)
+    """
+    if compression_level not in COMPRESSION_LEVELS.keys():
+        raise ValueError(
+            f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
+        )
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Invalid schedule. Choose from: {', '.join(SCHEDULES)}")
+
+    log = _silent if json_lines else print
+    pdfs = collect_pdfs(inputs)
+    if not pdfs:
+        raise FileNotFoundError("No PDF files found in the given inputs")
+    outputs = _batch_output_paths(pdfs, output_dir)
+    rerun = set()
+    if manifest is not None:
+        settings = manifest_settings(options.get("engine", "gs"), compression_level)
+        total = len(pdfs)
+        todo = []
+        for pdf in pdfs:
+            output_path = outputs[pdf] or _default_output_path(pdf)
+            state = manifest.status(pdf, settings, os.path.abspath(output_path))
+            if state == "changed":
+                # The existing output was written by an earlier run; replace it
+                rerun.add(pdf)
+            if state != "current":
+                todo.append(pdf)
+        pdfs = todo
+        log(f"Manifest: {total - len(pdfs)} of {total} file(s) already up to date")
+        if not pdfs:
+            return [], []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pdfs)))
+
+    log(
+        f"Compressing {len(pdfs)} PDF(s) with {workers} worker(s), "
+        f"level: {compression_level} ({COMPRESSION_LEVELS[compression_level]}), "
+        f"schedule: {schedule}"
+        + (f", memory budget: {format_size(memory_budget)}" if memory_budget else "")
+    )
+
+    succeeded = []
+    failed = []
+    pool = (
+        GhostscriptPool(compression_level, workers, max_jobs_per_worker, warm_timeout)
+        if warm
+        else None
+    )
+    options.update(compression_level=compression_level, force=force, pool=pool)
+    if options.get("engine") == "native":
+        # Files are already processed in parallel; don't fan out per image too
+        options.setdefault("image_workers", 1)
+    cache = options.get("cache")
+    sizes = {pdf: os.path.getsize(pdf) for pdf in pdfs}
+    pending = _schedule_order(pdfs, sizes, schedule)
+    running = {}  # future -> input path
+    in_flight_bytes = 0
+    done = 0
+    start_time = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                # Start files in schedule order; skip over those that do not
+                # fit the memory budget right now and backfill smaller ones
+                for pdf in list(pending):
+                    if len(running) >= workers:
+                        break
+                    if (
+                        memory_budget
+                        and running
+                        and in_flight_bytes + sizes[pdf] > memory_budget
+                    ):
+                        continue
+                    pending.remove(pdf)
+                    future = executor.submit(
+                        _compress_job,
+                        pdf,
+                        outputs[pdf],
+                        dict(options, force=True) if pdf in rerun else options,
+                        manifest,
+                    )
+                    running[future] = pdf
+                    in_flight_bytes += sizes[pdf]
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pdf = running.pop(future)
+                    in_flight_bytes -= sizes[pdf]
+                    done += 1
+                    _report_batch_job(
+                        future, pdf, done, len(pdfs), json_lines, succeeded, failed
+                    )
+    finally:
+        if pool is not None:
+            pool.close()
+    elapsed = time.time() - start_time
+    failed_paths = {pdf for pdf, _ in failed}
+    total_in = sum(sizes[pdf] for pdf in pdfs if pdf not in failed_paths)
+    total_out = sum(os.path.getsize(path) for path in succeeded)
+
+    reduction = (1 - total_out / total_in) * 100 if total_in else 0.0
+    log(f"\nBatch complete: {len(succeeded)}/{len(pdfs)} file(s) compressed")
+    log(f"Total size: {format_size(total_in)} -> {format_size(total_out)}")
+    log(f"Reduction: {reduction:.1f}%")
+    if elapsed > 0:
+        log(
+            f"Throughput: {format_size(total_in / elapsed)}/s, "
+            f"{len(succeeded) / elapsed:.2f} files/s"
+        )
+    if cache is not None:
+        stats = cache.stats()
+        log(
+            f"Cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+            f"{stats['evictions']} eviction(s)"
+        )
+    log(f"Time taken: {elapsed:.2f} seconds")
+    return succeeded, failed
+
+
+def _watch_job(input_path, output_dir, processed_dir, failed_dir, options):
+    """
+    Compress one file that arrived in the watched directory.
+
+    The result appears in *output_dir* only once complete, then the original
+    is moved to *processed_dir* (or *failed_dir*).
+
+    Returns:
+        CompressionResult: The result, or None if the file was rewritten while
+        it was being compressed; it is then left in place (and its outdated
+        output removed) to be picked up again
+    """
+    name = os.path.basename(input_path)
+    output_path = _batch_output_path(input_path, output_dir)
+    st = os.stat(input_path)
+    try:
+        result = compress_pdf_detailed(
+            input_path, output_path, quiet=True, **dict(options, force=True)
+        )
+    except BaseException:
+        if os.path.exists(input_path):
+            os.replace(input_path, os.path.join(failed_dir, name))
+        raise
+    now = os.stat(input_path)
+    if (now.st_size, now.st_mtime_ns, now.st_ino) != (st.st_size, st.st_mtime_ns, st.st_ino):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(output_path)
+        return None
+    os.replace(input_path, os.path.join(processed_dir, name))
+    return result
+
+
+def compress_watch(
+    watch_dir,
+    output_dir,
+    compression_level="ebook",
+    workers=None,
+    debounce=2.0,
+    poll_interval=1.0,
+    use_inotify=True,
+    warm=False,
+    max_jobs_per_worker=100,
+    warm_timeout=600.0,
+    stop_event=None,
+    **options,
+):
+    """
+    Watch a drop directory and compress PDF files as they arrive.
+
+    A file is picked up once it has stopped changing for *debounce* seconds
+    (see pdf_watch.FolderWatcher; inotify on Linux, polling elsewhere).
+    At most *workers* files are compressed at a time; others wait their turn.
+    Each result is renamed into *output_dir* once complete, and the original
+    is moved into the ``processed/`` (or ``failed/``) subdirectory of
+    *watch_dir*. Files already in *watch_dir* at startup are processed too.
+    A file rewritten while it was being compressed stays where it is, its
+    outdated output is removed, and it is compressed again once it settles.
+
+    Runs until SIGINT or SIGTERM (or until *stop_event* is set), then stops
+    picking up new files and waits for the jobs in flight to finish.
+
+    Args:
+        watch_dir (str): Directory to watch (not recursive)
+        output_dir (str): Directory for the compressed files
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+        workers (int, optional): Number of concurrent compressions (default: CPU cores)
+        debounce (float): Seconds a file must stay unchanged before it is processed
+        poll_interval (float): Seconds between directory scans when polling
+        use_inotify (bool): Use inotify when available; False forces polling
+        warm (bool): Reuse long-lived Ghostscript interpreters (see GhostscriptPool)
+        max_jobs_per_worker (int): Recycle a warm interpreter after this many jobs
+        warm_timeout (float, optional): Kill and replace a warm interpreter whose
+            job runs longer than this many seconds
+        stop_event (threading.Event, optional): Set to stop watching
+        **options: Further keyword arguments for compress_pdf() (engine, cache, ...)
+
+    Returns:
+        tuple: (number of files compressed, number of failures)
+    """
+    if compression_level not in COMPRESSION_LEVELS.keys():
+        raise ValueError(
+            f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
+        )
+    watch_dir = os.path.abspath(watch_dir)
+    output_dir = os.path.abspath(output_dir)
+    if output_dir == watch_dir:
+        raise ValueError("The output directory must differ from the watched directory")
+    processed_dir = os.path.join(watch_dir, "processed")
+    failed_dir = os.path.join(watch_dir, "failed")
+    for directory in (output_dir, processed_dir, failed_dir):
+        os.makedirs(directory, exist_ok=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    stop_event = stop_event or threading.Event()
+    previous_handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous_handlers[signum] = signal.signal(
+                signum, lambda *args: stop_event.set()
+            )
+
+    pool = (
+        GhostscriptPool(compression_level, workers, max_jobs_per_worker, warm_timeout)
+        if warm
+        else None
+    )
+    options.update(compression_level=compression_level, pool=pool)
+    if options.get("engine") == "native":
+        options.setdefault("image_workers", 1)
+
+    succeeded = failed = 0
+    inflight = {}  # future -> input path
+    waiting = []
+
+    def report(future):
+        nonlocal succeeded, failed
+        path = inflight.pop(future)
+        watcher.forget(path)
+        name = os.path.basename(path)
+        try:
+            result = future.result()
+        except Exception as e:
+            failed += 1
+            print(f"{name}: FAILED ({e}), moved to {failed_dir}", flush=True)
+            return
+        if result is None:
+            # Rewritten while in flight: wait for it to settle, then redo it
+            watcher.recheck(path)
+            print(f"{name}: changed while being compressed, queued again", flush=True)
+            return
+        succeeded += 1
+        print(
+            f"{name}: {format_size(result.input_bytes)} -> "
+            f"{format_size(result.output_bytes)} ({result.reduction * 100:.1f}%) "
+            f"in {result.wall_time:.2f}s",
+            flush=True,
+        )
+
+    watcher = FolderWatcher(
+        watch_dir,
+        debounce=debounce,
+        poll_interval=poll_interval,
+        use_inotify=use_inotify,
+    )
+    print(
+        f"Watching {watch_dir} ({watcher.backend}), {workers} worker(s), "
+        f"level: {compression_level}; press Ctrl+C to stop",
+        flush=True,
+    )
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while not stop_event.is_set():
+                for path in watcher.poll(timeout=0.5):
+                    if path not in waiting and path not in inflight.values():
+                        waiting.append(path)
+                for future in [f for f in inflight if f.done()]:
+                    report(future)
+                while waiting and len(inflight) < workers:
+                    path = waiting.pop(0)
+                    future = executor.submit(
+                        _watch_job, path, output_dir, processed_dir, failed_dir, options
+                    )
+                    inflight[future] = path
+
+            if inflight:
+                print(f"Stopping: waiting for {len(inflight)} job(s) in flight...", flush=True)
+            for future in as_completed(list(inflight)):
+                report(future)
+    finally:
+        watcher.close()
+        if pool is not None:
+            pool.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+
+    print(f"Stopped: {succeeded} file(s) compressed, {failed} failed")
+    return succeeded, failed
+
+
+def compress_distributed(
+    inputs,
+    output_dir,
+    queue_dir,
+    compression_level="ebook",
+    workers=None,
+    lease_seconds=300.0,
+    max_attempts=3,
+    **options,
+):
+    """
+    Compress a batch cooperatively with other processes or hosts.
+
+    Every participant runs this with the same inputs, output directory and
+    *queue_dir* on a shared filesystem; no coordinator is needed. Each file
+    is claimed through a lease file in *queue_dir* (see pdf_lease.py), so
+    it is compressed by exactly one participant. A participant that crashes
+    stops renewing its leases, and after *lease_seconds* another one takes
+    over its files. A file that fails is retried, by any participant, until
+    it has been attempted *max_attempts* times. Each participant returns
+    once every file is done or failed, whoever processed it.
+
+    Args:
+        inputs (list): Paths to PDF files and/or directories containing PDFs
+        output_dir (str): Directory for the outputs, shared by all participants
+        queue_dir (str): Shared directory for the lease and done files
+        compression_level (str): Level of compression (screen, ebook, printer, prepress, default)
+        workers (int, optional): Files compressed concurrently by this process
+        lease_seconds (float): Time without a heartbeat after which a lease expires
+        max_attempts (int): Attempts at a file before it is given up as failed
+        **options: Further keyword arguments for compress_pdf() (engine, cache, ...)
+
+    Returns:
+        tuple: (files compressed by this process, files this process gave up on)
+    """
+    if compression_level not in COMPRESSION_LEVELS.keys():
+        raise ValueError(
+            f"Invalid compression level. Choose from: {', '.join(COMPRESSION_LEVELS.keys())}"
+        )
+    pdfs = collect_pdfs(inputs)
+    if not pdfs:
+        raise FileNotFoundError("No PDF files found in the given inputs")
+    outputs = _batch_output_paths(pdfs, output_dir)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pdfs)))
+    options.update(compression_level=compression_level)
+    if options.get("engine") == "native":
+        options.setdefault("image_workers", 1)
+
+    lock = threading.Lock()
+    succeeded, failed = [], []
+    with LeaseDirectory(queue_dir, lease_seconds, max_attempts=max_attempts) as leases:
+        jobs = {leases.key(pdf): pdf for pdf in pdfs}
+        # Participants walk the jobs in different orders to avoid contention
+        candidates = list(jobs)
+        random.shuffle(candidates)
+        held_elsewhere = []
+        print(
+            f"Compressing {len(pdfs)} PDF(s) with {workers} worker(s) as "
+            f"{leases.owner}, level: {compression_level}",
+            flush=True,
+        )
+
+        def next_job():
+            """Claim the next job; return None once every job is finished."""
+            while True:
+                with lock:
+                    if not candidates and held_elsewhere:
+                        # Revisit jobs other participants held: they may have
+                        # finished, or their leases may have expired
+                        candidates.extend(held_elsewhere)
+                        held_elsewhere.clear()
+                        wait_first = True
+                    else:
+                        wait_first = False
+                    if not candidates:
+                        return None
+                    key = candidates.pop()
+                if wait_first:
+                    time.sleep(min(5.0, lease_seconds / 4))
+                if leases.is_finished(key):
+                    continue
+                if leases.claim(key):
+                    return key
+                with lock:
+                    held_elsewhere.append(key)
+
+        def worker():
+            while True:
+                key = next_job()
+                if key is None:
+                    return
+                pdf = jobs[key]
+                name = os.path.basename(pdf)
+                try:
+                    result = compress_pdf_detailed(
+                        pdf,
+                        outputs[pdf],
+                        quiet=True,
+                        **dict(options, force=True),
+                    )
+                except Exception as e:
+                    attempt = leases.attempts(key)
+                    if leases.fail(key, {"input_path": pdf, "error": str(e)}):
+                        with lock:
+                            failed.append((pdf, e))
+                        print(f"{name}: FAILED ({e})", flush=True)
+                    else:
+                        # Released; revisit it after the other jobs
+                        with lock:
+                            held_elsewhere.append(key)
+                        print(
+                            f"{name}: attempt {attempt}/{max_attempts} failed ({e}), "
+                            "will retry",
+                            flush=True,
+                        )
+                    continue
+                leases.complete(key, result.to_dict())
+                with lock:
+                    succeeded.append(result.output_path)
+                print(
+                    f"{name}: {format_size(result.input_bytes)} -> "
+                    f"{format_size(result.output_bytes)} "
+                    f"({result.reduction * 100:.1f}%) in {result.wall_time:.2f}s",
+                    flush=True,
+                )
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    print(
+        f"All {len(pdfs)} file(s) finished; this process compressed "
+        f"{len(succeeded)}, {len(failed)} failed here"
+    )
+    return succeeded, failed
+
+
+def main():
+    """Parse command line arguments and run the PDF compression."""
+    parser = argparse.ArgumentParser(
+        description="Compress PDF files using Ghostscript.",
+        epilog=f"Available compression levels:\n"
+        + "\n".join([f"  {k}: {v}" for k, v in COMPRESSION_LEVELS.items()]),
+    )
+    parser.add_argument(
+        "input",
+        nargs="+",
+        help="Path to the input PDF file, or - for stdin "
+        "(several files or a directory enable batch mode)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Path for the output PDF file, or - for stdout "
+        "(default: filename_compressed.pdf, or stdout when reading stdin); "
+        "in batch mode, the output directory",
+    )
+    parser.add_argument(
+        "-c",
+        "--compression",
+        choices=COMPRESSION_LEVELS.keys(),
+        default="ebook",
         help="Compression level (default: ebook)",
     )
     parser.add_argument(
         "-f", "--force", action="store_true", help="Overwrite output file if it exists"
     )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of concurrent Ghostscript processes in batch mode "
+        "(default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES.keys(),
+        default="gs",
+        help="Compression engine: gs (Ghostscript), native (pypdf + Pillow, "
+        "recompresses oversized images only) or lossless (default: gs)",
+    )
+    parser.add_argument(
+        "--lossless",
+        action="store_const",
+        const="lossless",
+        dest="engine",
+        help="Shrink without touching image quality: object streams, Flate, "
+        "duplicate merging (same as --engine lossless)",
+    )
+    parser.add_argument(
+        "--target-size",
+        type=parse_size,
+        help="Pick the best quality that fits under this size, e.g. 5MB "
+        "(runs candidate presets concurrently; single file only)",
+    )
+    parser.add_argument(
+        "--shard",
+        action="store_true",
+        help="Split a large PDF into page ranges and compress them in parallel "
+        "(single file only)",
+    )
+    parser.add_argument(
+        "--pages-per-shard",
+        type=int,
+        metavar="N",
+        help="Pages per shard with --shard (default: one shard per worker)",
+    )
+    parser.add_argument(
+        "--linearize",
+        action="store_true",
+        help="Linearize the output for fast web view, so viewers can show "
+        "page 1 before the whole file has downloaded (requires qpdf)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print machine-readable results instead of progress text: one "
+        "JSON object per file (JSON lines in batch mode)",
+    )
+    parser.add_argument(
+        "--check-linearized",
+        action="store_true",
+        help="Only report whether the input files are already linearized "
+        "(exit status 1 if any is not)",
+    )
+    parser.add_argument(
+        "--skip-incompressible",
+        action="store_true",
+        help="Pre-scan each file and keep the original when little gain is expected",
+    )
+    parser.add_argument(
+        "--min-gain",
+        type=float,
+        default=5.0,
+        metavar="PERCENT",
+        help="Expected saving below which --skip-incompressible keeps the original "
+        "(default: 5)",
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="PATH",
+        help="SQLite manifest of completed files; re-runs only process new or "
+        "changed files (batch mode)",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULES.keys(),
+        default="lpt",
+        help="Order batch files are started in: lpt (largest first, finishes the "
+        "whole batch soonest), sjf (smallest first) or fifo (default: lpt)",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        metavar="SIZE",
+        help="In batch mode, never have more than this much input (e.g. 4GB) in "
+        "flight at once; smaller files run alongside a large one",
+    )
+    parser.add_argument(
+        "--queue-dir",
+        metavar="DIR",
+        help="Share a batch with other processes or hosts: each runs the same "
+        "command, and files are claimed through lease files in this shared directory",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=300.0,
+        metavar="SECONDS",
+        help="With --queue-dir, how long a crashed participant's files stay "
+        "claimed before another takes them over (default: 300)",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        metavar="N",
+        help="With --queue-dir, how many times a file is tried, by any "
+        "participant, before it is given up as failed (default: 3)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Run as a daemon: compress PDFs as they arrive in the input "
+        "directory and write them to -o (originals move to processed/)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help="With --watch, how long a file must stay unchanged before it is "
+        "compressed (default: 2)",
+    )
+    parser.add_argument(
+        "--polling",
+        action="store_true",
+        help="With --watch, poll the directory instead of using inotify "
+        "(e.g. for network filesystems)",
+    )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="In batch mode, keep Ghostscript interpreters running between files",
+    )
+    parser.add_argument(
+        "--recycle-after",
+        type=int,
+        default=100,
+        metavar="N",
+        help="Restart a warm Ghostscript interpreter after N jobs (default: 100)",
+    )
+    parser.add_argument(
+        "--warm-timeout",
+        type=float,
+        default=600.0,
+        metavar="SECONDS",
+        help="Kill and replace a warm Ghostscript interpreter whose job runs "
+        "longer than this (default: 600)",
+    )
+    parser.add_argument(
+        "--staging-dir",
+        metavar="DIR",
+        help="Write outputs here first (e.g. tmpfs or a local disk), then copy "
+        "them into place in one pass; speeds up output on network filesystems",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory of a content-addressed cache of compressed results",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=parse_size,
+        default="1GB",
+        help="Maximum size of the result cache, e.g. 500MB (default: 1GB)",
+    )
 
     args = parser.parse_args()
 
+    if args.check_linearized:
+        return _check_linearized_main(args.input)
+    if "-" in args.input or args.output == "-":
+        if len(args.input) != 1 or os.path.isdir(args.input[0]):
+            parser.error("Streaming (- as input or output) works on a single file only")
+        streaming_unsupported = {
+            "--engine/--lossless": args.engine != "gs",
+            "--target-size": args.target_size,
+            "--shard": args.shard,
+            "--skip-incompressible": args.skip_incompressible,
+            "--cache-dir": args.cache_dir,
+            "--manifest": args.manifest,
+            "--queue-dir": args.queue_dir,
+            "--watch": args.watch,
+            "--json": args.json,
+        }
+        given = [flag for flag, value in streaming_unsupported.items() if value]
+        if given:
+            parser.error(
+                f"Streaming (- as input or output) does not support {', '.join(given)}"
+            )
+        return _stream_main(args)
+
+    if args.watch:
+        if len(args.input) != 1 or not os.path.isdir(args.input[0]) or not args.output:
+            parser.error("--watch needs one input directory and an output directory (-o)")
+        if args.target_size or args.shard or args.json:
+            parser.error("--watch does not support --target-size, --shard or --json")
+    if args.queue_dir:
+        if not args.output:
+            parser.error("--queue-dir needs a shared output directory (-o)")
+        if args.watch or args.target_size or args.shard or args.manifest or args.json:
+            parser.error(
+                "--queue-dir does not support --watch, --target-size, --shard, "
+                "--manifest or --json"
+            )
+    batch = len(args.input) > 1 or os.path.isdir(args.input[0])
+    if batch and (args.target_size or args.shard):
+        parser.error("--target-size and --shard work on a single input file")
+    if args.manifest and (args.watch or not batch):
+        parser.error("--manifest works in batch mode only (several files or a directory)")
+    if args.json and (args.target_size or args.shard):
+        parser.error("--json is not supported with --target-size or --shard")
+    cache = ResultCache(args.cache_dir, args.cache_size) if args.cache_dir else None
+
     try:
-        compress_pdf(args.input, args.output, args.compression, args.force)
+        if args.queue_dir:
+            _, failed = compress_distributed(
+                args.input,
+                args.output,
+                args.queue_dir,
+                args.compression,
+                args.workers,
+                args.lease_seconds,
+                args.max_attempts,
+                cache=cache,
+                prescan=args.skip_incompressible,
+                min_gain=args.min_gain / 100,
+                engine=args.engine,
+                linearize=args.linearize,
+                staging_dir=args.staging_dir,
+            )
+            if failed:
+                return 1
+        elif args.watch:
+            compress_watch(
+                args.input[0],
+                args.output,
+                args.compression,
+                args.workers,
+                debounce=args.debounce,
+                use_inotify=not args.polling,
+                warm=args.warm,
+                max_jobs_per_worker=args.recycle_after,
+                warm_timeout=args.warm_timeout,
+                cache=cache,
+                prescan=args.skip_incompressible,
+                min_gain=args.min_gain / 100,
+                engine=args.engine,
+                linearize=args.linearize,
+                staging_dir=args.staging_dir,
+            )
+        elif batch:
+            with (
+                Manifest(args.manifest) if args.manifest else contextlib.nullcontext()
+            ) as manifest:
+                _, failed = compress_batch(
+                    args.input,
+                    args.output,
+                    args.compression,
+                    args.force,
+                    args.workers,
+                    warm=args.warm,
+                    max_jobs_per_worker=args.recycle_after,
+                    warm_timeout=args.warm_timeout,
+                    manifest=manifest,
+                    cache=cache,
+                    prescan=args.skip_incompressible,
+                    min_gain=args.min_gain / 100,
+                    engine=args.engine,
+                    linearize=args.linearize,
+                    staging_dir=args.staging_dir,
+                    json_lines=args.json,
+                    schedule=args.schedule,
+                    memory_budget=args.memory_budget,
+                )
+            if failed:
+                return 1
+        elif args.shard:
+            compress_sharded(
+                args.input[0],
+                args.output,
+                args.compression,
+                args.force,
+                args.workers,
+                args.pages_per_shard,
+                linearize=args.linearize,
+                staging_dir=args.staging_dir,
+            )
+        elif args.target_size:
+            output_path = compress_to_target(
+                args.input[0],
+                args.target_size,
+                args.output,
+                args.force,
+                args.workers,
+                staging_dir=args.staging_dir,
+            )
+            if args.linearize:
+                linearize_pdf(output_path)
+                print(f"Linearized size: {get_file_size(output_path)}")
+            if os.path.getsize(output_path) > args.target_size:
+                return 1
+        else:
+            result = compress_pdf_detailed(
+                args.input[0],
+                args.output,
+                args.compression,
+                args.force,
+                quiet=args.json,
+                cache=cache,
+                prescan=args.skip_incompressible,
+                min_gain=args.min_gain / 100,
+                engine=args.engine,
+                linearize=args.linearize,
+                staging_dir=args.staging_dir,
+            )
+            if args.json:
+                print(result.to_json())
     except Exception as e:
-        print(f"Error: {e}")
+        if args.json:
+            print(json.dumps({"input_path": args.input[0], "error": str(e)}))
+        else:
+            print(f"Error: {e}")
         return 1
 
     return 0
 
 
+def _check_linearized_main(paths):
+    """Report whether each input PDF is linearized (the --check-linearized mode)."""
+    status = 0
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            # Unlike collect_pdfs(), include the *_compressed.pdf outputs
+            pdfs.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.lower().endswith(".pdf")
+            )
+        else:
+            pdfs.append(path)
+    for pdf in pdfs:
+        try:
+            linearized = is_linearized(pdf)
+        except OSError as e:
+            print(f"{pdf}: error: {e}")
+            status = 1
+            continue
+        print(f"{pdf}: {'linearized' if linearized else 'not linearized'}")
+        if not linearized:
+            status = 1
+    return status
+
+
+def _stream_main(args):
+    """Run the CLI in streaming mode (input and/or output is -)."""
+    try:
+        if args.input == ["-"]:
+            source = sys.stdin.buffer
+        else:
+            source = open(args.input[0], "rb")
+        with source:
+            if args.output in (None, "-"):
+                if args.linearize:
+                    raise ValueError("--linearize needs an output file, not stdout")
+                compress_stream(source, sys.stdout.buffer, args.compression)
+                sys.stdout.buffer.flush()
+            else:
+                if os.path.exists(args.output) and not args.force:
+                    raise FileExistsError(f"Output file already exists: {args.output}")
+                output_path = os.path.abspath(args.output)
+                with _staged_output(output_path, args.staging_dir) as work_path:
+                    with open(work_path, "wb") as destination:
+                        compress_stream(source, destination, args.compression)
+                    if args.linearize:
+                        linearize_pdf(work_path)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
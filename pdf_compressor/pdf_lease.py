@@ -0,0 +1,284 @@
+"""
+pdf_lease.py  –  Coordinator-free job claiming through a shared directory.
+
+Several processes, on one host or on many hosts sharing a filesystem, agree
+on who processes which job without any central service:
+
+* a job is claimed by creating ``<key>.lease`` with O_CREAT | O_EXCL, which
+  succeeds for exactly one process; the lease holds a token unique to the
+  claim;
+* the owner keeps the lease alive by touching its mtime (a heartbeat), but
+  only while the lease still holds its token;
+* a lease whose mtime is older than *lease_seconds* belongs to a crashed or
+  hung process and is stolen by renaming a new lease, already holding the
+  thief's token, over it in one step; the lease path never disappears, so
+  the steal cannot interleave with an O_EXCL claim;
+* every claim counts as an attempt in ``<key>.attempts``; a failed job is
+  released for a retry until it has had *max_attempts*, and then (like a
+  job whose holders keep crashing) gets a ``<key>.failed`` marker;
+* a finished job gets a ``<key>.done`` (or ``<key>.failed``) marker, written
+  atomically, and is never claimed again.
+
+Expiry compares file mtimes with the local clock, so hosts need roughly
+synchronized clocks (NTP); *lease_seconds* should be well above the skew.
+
+Example
+-------
+    with LeaseDirectory("/shared/queue", lease_seconds=300) as leases:
+        key = leases.key("/archive/2019/scan.pdf")
+        if not leases.is_finished(key) and leases.claim(key):
+            ...  # do the work
+            leases.complete(key, {"output": "/archive/out/scan.pdf"})
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+
+class LeaseDirectory:
+    """
+    Claim, renew and complete jobs through lease files in a shared directory.
+
+    Use as a context manager, or call close() when done; held leases are
+    renewed by a background thread until then.
+    """
+
+    def __init__(
+        self,
+        directory,
+        lease_seconds: float = 300.0,
+        owner: Optional[str] = None,
+        max_attempts: int = 3,
+    ):
+        if lease_seconds <= 0:
+            raise ValueError("lease_seconds must be positive")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Unique per process, readable in the lease files when debugging
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Job key -> token written into the lease when it was claimed
+        self._held: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_loop, daemon=True)
+        self._heartbeat.start()
+
+    # -- paths --------------------------------------------------------------
+
+    @staticmethod
+    def key(name: str) -> str:
+        """Return the job key for a job name, such as an input path."""
+        return hashlib.sha256(name.encode("utf-8", "surrogateescape")).hexdigest()[:32]
+
+    def _path(self, key: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{key}.{kind}")
+
+    # -- state --------------------------------------------------------------
+
+    def is_finished(self, key: str) -> bool:
+        """Return True if the job has a done or failed marker."""
+        return os.path.exists(self._path(key, "done")) or os.path.exists(
+            self._path(key, "failed")
+        )
+
+    def claim(self, key: str) -> bool:
+        """
+        Try to take the lease on a job.
+
+        Args:
+            key (str): Job key, see key()
+
+        Returns:
+            bool: True if this process now holds the lease
+        """
+        lease_path = self._path(key, "lease")
+        token = f"{self.owner}:{uuid.uuid4().hex}"
+        if self._create(lease_path, token):
+            return self._claimed(key, token)
+        try:
+            stat = os.stat(lease_path)
+        except FileNotFoundError:
+            # Released in the meantime; try once more
+            return self._create(lease_path, token) and self._claimed(key, token)
+        if time.time() - stat.st_mtime < self.lease_seconds:
+            return False
+
+        # Expired: replace it with a lease carrying our token in one rename,
+        # so the lease path always exists and no O_EXCL claim can slip in
+        new_path = f"{lease_path}.{uuid.uuid4().hex}.tmp"
+        with open(new_path, "w") as fh:
+            fh.write(token)
+        try:
+            current = os.stat(lease_path)
+            if current.st_ino != stat.st_ino or current.st_mtime != stat.st_mtime:
+                # Renewed, or stolen by someone else, since we looked
+                return False
+            os.rename(new_path, lease_path)
+        except FileNotFoundError:
+            return False
+        finally:
+            if os.path.exists(new_path):
+                os.remove(new_path)
+        # Two thieves that both saw the stale lease can both rename; the
+        # later rename wins, and the earlier thief sees a foreign token here
+        # (or at its next heartbeat, which then drops the job)
+        if self._read(lease_path) != token:
+            return False
+        return self._claimed(key, token)
+
+    def _create(self, lease_path: str, token: str) -> bool:
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as fh:
+            fh.write(token)
+        return True
+
+    @staticmethod
+    def _read(path: str) -> Optional[str]:
+        try:
+            with open(path) as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def _claimed(self, key: str, token: str) -> bool:
+        with self._lock:
+            self._held[key] = token
+        if self.is_finished(key):
+            # Finished between our check and the claim
+            self.release(key)
+            return False
+        attempt = self.attempts(key) + 1
+        if attempt > self.max_attempts:
+            # Every attempt so far crashed or hung without recording a failure
+            self._mark(key, "failed", {"error": f"gave up after {self.max_attempts} attempts"})
+            return False
+        self._write_json(self._path(key, "attempts"), {"attempts": attempt})
+        return True
+
+    def attempts(self, key: str) -> int:
+        """Return how many times the job has been claimed so far."""
+        try:
+            with open(self._path(key, "attempts")) as fh:
+                return int(json.load(fh)["attempts"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return 0
+
+    def release(self, key: str) -> None:
+        """Give up the lease on a job, if this process still holds it."""
+        with self._lock:
+            token = self._held.pop(key, None)
+        if token is None:
+            return
+        lease_path = self._path(key, "lease")
+        try:
+            with open(lease_path) as fh:
+                if fh.read() != token:
+                    return
+                age = time.time() - os.fstat(fh.fileno()).st_mtime
+        except FileNotFoundError:
+            return
+        # An expired lease may be stolen between our check and the remove;
+        # leave it for the thief rather than delete its fresh lease
+        if age < self.lease_seconds / 2:
+            os.remove(lease_path)
+
+    def _write_json(self, path: str, data: Dict[str, Any]) -> None:
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, path)
+
+    def _mark(self, key: str, kind: str, info: Optional[Dict[str, Any]]) -> None:
+        self._write_json(
+            self._path(key, kind), dict(info or {}, owner=self.owner, time=time.time())
+        )
+        self.release(key)
+
+    def complete(self, key: str, info: Optional[Dict[str, Any]] = None) -> None:
+        """Mark a job done (with optional JSON-serializable *info*) and release it."""
+        self._mark(key, "done", info)
+
+    def fail(self, key: str, info: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Record a failed attempt at a job and release it.
+
+        The job is released for another attempt, by any process, until it
+        has had *max_attempts*; then it is marked failed and never retried.
+
+        Args:
+            key (str): Job key, see key()
+            info (dict, optional): JSON-serializable details for the failed marker
+
+        Returns:
+            bool: True if the job is now marked failed for good
+        """
+        attempts = self.attempts(key)
+        if attempts < self.max_attempts:
+            self.release(key)
+            return False
+        self._mark(key, "failed", dict(info or {}, attempts=attempts))
+        return True
+
+    # -- heartbeat ----------------------------------------------------------
+
+    def _renew_loop(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                held = list(self._held.items())
+            for key, token in held:
+                if not self._renew(key, token):
+                    # Stolen after we stalled past lease_seconds: stop
+                    # renewing, the new holder owns the job now
+                    with self._lock:
+                        if self._held.get(key) == token:
+                            del self._held[key]
+
+    def _renew(self, key: str, token: str) -> bool:
+        try:
+            with open(self._path(key, "lease"), "r+") as fh:
+                if fh.read() != token:
+                    return False
+                # Through the descriptor, so a lease renamed over ours after
+                # the check is left alone
+                if os.utime in os.supports_fd:
+                    os.utime(fh.fileno())
+                else:
+                    os.utime(self._path(key, "lease"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def holds(self, key: str) -> bool:
+        """Return True if this process still holds the lease on a job."""
+        with self._lock:
+            return key in self._held
+
+    def close(self) -> None:
+        """Stop renewing and release every lease still held."""
+        self._stop.set()
+        self._heartbeat.join()
+        with self._lock:
+            held = list(self._held)
+        for key in held:
+            self.release(key)
+
+    def __enter__(self) -> "LeaseDirectory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
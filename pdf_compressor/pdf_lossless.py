@@ -0,0 +1,275 @@
+"""
+pdf_lossless.py  –  Lossless structural optimization of PDF files.
+
+Rewrites a PDF without touching image quality or page content:
+
+* unreferenced objects (old revisions, orphans) are dropped,
+* identical objects are merged into one,
+* uncompressed streams are Flate-compressed,
+* non-stream objects are packed into compressed object streams and the
+  cross-reference table is written as a compressed xref stream (PDF 1.5).
+
+Objects are read with pdf_scan.py, so stream bodies are copied as raw bytes
+and only the streams that had no filter are ever compressed. An object that
+cannot be read fails the whole rewrite: writing the references to it as
+null would silently lose content.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import zlib
+from collections import deque
+from typing import Any, Dict, List
+
+from pdf_scan import PdfScan
+
+# pdf_scan puts ../pdf_common on the import path
+from pdf_objects import Name, Ref, iter_refs, serialize
+
+
+# Non-stream objects packed into each object stream
+OBJECTS_PER_STREAM = 100
+
+# Objects with their own identity: two identical blank pages are still two
+# pages, and two identical form fields are still two fields. /Type is
+# optional on annotations, so those are also found through the pages.
+_NEVER_MERGED_TYPES = frozenset({"Page", "Pages", "Annot", "Catalog"})
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _with_kids(scan: PdfScan, refs: List[Any]) -> set:
+    """Return the object numbers of *refs* and of their /Kids, recursively."""
+    stack = list(refs)
+    found = set()
+    while stack:
+        ref = stack.pop()
+        if not isinstance(ref, Ref) or ref.num in found:
+            continue
+        found.add(ref.num)
+        node = scan.resolve(ref)
+        kids = scan.resolve(node.get("Kids")) if isinstance(node, dict) else None
+        if isinstance(kids, list):
+            stack.extend(kids)
+    return found
+
+
+def _form_fields(scan: PdfScan) -> set:
+    """Return the object numbers of all AcroForm fields, including nested ones."""
+    root = scan.resolve(scan.trailer.get("Root"))
+    form = scan.resolve(root.get("AcroForm")) if isinstance(root, dict) else None
+    fields = scan.resolve(form.get("Fields")) if isinstance(form, dict) else None
+    return _with_kids(scan, fields if isinstance(fields, list) else [])
+
+
+def _annotations(scan: PdfScan) -> set:
+    """Return the object numbers of every page's annotations and their /Kids."""
+    refs: List[Any] = []
+    for _, page in scan.pages():
+        annots = scan.resolve(page.get("Annots"))
+        if isinstance(annots, list):
+            refs.extend(annots)
+    return _with_kids(scan, refs)
+
+
+# ---------------------------------------------------------------------------
+# Optimizer
+# ---------------------------------------------------------------------------
+
+
+def optimize_lossless(input_path, output_path) -> Dict[str, int]:
+    """
+    Write a structurally optimized, visually identical copy of a PDF.
+
+    Args:
+        input_path (str): Path to the input PDF file
+        output_path (str): Path for the output PDF file
+
+    Returns:
+        dict: objects_in, objects_out, merged, dropped and streams_compressed counts
+
+    Raises:
+        PdfSyntaxError: If an object of the input cannot be read
+    """
+    with PdfScan(input_path, strict=True) as scan:
+        if "Encrypt" in scan.trailer:
+            raise ValueError("Lossless optimization of encrypted PDFs is not supported")
+        objects = {obj.num: obj for obj in scan.objects()}
+        data = scan.data
+
+        def stream_body(obj) -> bytes:
+            return data[obj.stream_offset : obj.stream_offset + obj.stream_length]
+
+        # Merge identical objects until no more merges happen: merging two
+        # children can make their parents identical in turn.
+        canonical = {num: num for num in objects}
+
+        def find(num: int) -> int:
+            while canonical.get(num, num) != num:
+                num = canonical[num]
+            return num
+
+        def renumber_canonical(ref: Ref) -> int:
+            return find(ref.num) if ref.num in objects else 0
+
+        # Pages, page tree nodes, annotations and form fields are never merged
+        unique = _form_fields(scan) | _annotations(scan)
+        unique.update(ref.num for ref, _ in scan.pages())
+        unique.update(
+            num
+            for num, obj in objects.items()
+            if isinstance(obj.value, dict) and obj.value.get("Type") in _NEVER_MERGED_TYPES
+        )
+        stream_digest = {
+            num: hashlib.sha256(stream_body(obj)).digest()
+            for num, obj in objects.items()
+            if obj.is_stream
+        }
+        merged = 0
+        for _ in range(16):
+            seen: Dict[bytes, int] = {}
+            changed = False
+            for num in sorted(objects):
+                if canonical[num] != num or num in unique:
+                    continue
+                obj = objects[num]
+                value = obj.value
+                if obj.is_stream:
+                    value = {k: v for k, v in value.items() if k != "Length"}
+                key = serialize(value, renumber_canonical) + stream_digest.get(num, b"")
+                first = seen.setdefault(key, num)
+                if first != num:
+                    canonical[num] = first
+                    merged += 1
+                    changed = True
+            if not changed:
+                break
+
+        # Keep only what the trailer can reach, numbered in discovery order
+        new_numbers: Dict[int, int] = {}
+        order: List[int] = []
+        queue = deque(
+            find(ref.num)
+            for ref in (scan.trailer.get("Root"), scan.trailer.get("Info"))
+            if isinstance(ref, Ref) and ref.num in objects
+        )
+        while queue:
+            num = queue.popleft()
+            if num in new_numbers:
+                continue
+            new_numbers[num] = len(order) + 1
+            order.append(num)
+            obj = objects[num]
+            value = obj.value
+            if obj.is_stream:
+                value = {k: v for k, v in value.items() if k != "Length"}
+            for ref in iter_refs(value):
+                if ref.num in objects and find(ref.num) not in new_numbers:
+                    queue.append(find(ref.num))
+
+        def renumber(ref: Ref) -> int:
+            if ref.num not in objects:
+                return 0
+            return new_numbers.get(find(ref.num), 0)
+
+        version = data[5:8] if data[:5] == b"%PDF-" else b"1.4"
+        if version < b"1.5":
+            version = b"1.5"
+
+        streams_compressed = 0
+        with open(output_path, "wb") as out:
+            out.write(b"%PDF-" + version + b"\n%\xe2\xe3\xcf\xd3\n")
+            # entries[n] = (type, field2, field3) for the xref stream
+            entries: Dict[int, tuple] = {}
+            packed: List[int] = []
+
+            for num in order:
+                obj = objects[num]
+                new_num = new_numbers[num]
+                if not obj.is_stream:
+                    packed.append(num)
+                    continue
+                header = {k: v for k, v in obj.value.items() if k != "Length"}
+                body = stream_body(obj)
+                if (
+                    "Filter" not in header
+                    and header.get("Type") != "Metadata"
+                    and len(body) > 64
+                ):
+                    flated = zlib.compress(body, 6)
+                    if len(flated) < len(body):
+                        body = flated
+                        header["Filter"] = Name("FlateDecode")
+                        header.pop("DecodeParms", None)
+                        streams_compressed += 1
+                header["Length"] = len(body)
+                entries[new_num] = (1, out.tell(), 0)
+                out.write(b"%d 0 obj\n" % new_num)
+                out.write(serialize(header, renumber))
+                out.write(b"\nstream\n")
+                out.write(body)
+                out.write(b"\nendstream\nendobj\n")
+
+            next_num = len(order) + 1
+            for start in range(0, len(packed), OBJECTS_PER_STREAM):
+                chunk = packed[start : start + OBJECTS_PER_STREAM]
+                stm_num = next_num
+                next_num += 1
+                index_parts, bodies = [], []
+                offset = 0
+                for index, num in enumerate(chunk):
+                    text = serialize(objects[num].value, renumber) + b"\n"
+                    index_parts.append(b"%d %d" % (new_numbers[num], offset))
+                    bodies.append(text)
+                    offset += len(text)
+                    entries[new_numbers[num]] = (2, stm_num, index)
+                index_bytes = b" ".join(index_parts) + b"\n"
+                body = zlib.compress(index_bytes + b"".join(bodies), 6)
+                entries[stm_num] = (1, out.tell(), 0)
+                out.write(b"%d 0 obj\n" % stm_num)
+                out.write(
+                    b"<</Type/ObjStm/N %d/First %d/Filter/FlateDecode/Length %d>>"
+                    % (len(chunk), len(index_bytes), len(body))
+                )
+                out.write(b"\nstream\n" + body + b"\nendstream\nendobj\n")
+
+            xref_num = next_num
+            xref_offset = out.tell()
+            entries[xref_num] = (1, xref_offset, 0)
+            size = xref_num + 1
+            width = 4 if xref_offset < 2**32 else 8
+            rows = [b"\x00" + b"\x00" * width + b"\xff\xff"]
+            for n in range(1, size):
+                kind, field2, field3 = entries.get(n, (0, 0, 0))
+                rows.append(
+                    bytes([kind]) + field2.to_bytes(width, "big") + field3.to_bytes(2, "big")
+                )
+            xref_body = zlib.compress(b"".join(rows), 6)
+            trailer: Dict[str, Any] = {
+                "Type": Name("XRef"),
+                "Size": size,
+                "W": [1, width, 2],
+                "Root": scan.trailer["Root"],
+            }
+            if isinstance(scan.trailer.get("Info"), Ref):
+                trailer["Info"] = scan.trailer["Info"]
+            if "ID" in scan.trailer:
+                trailer["ID"] = scan.trailer["ID"]
+            trailer["Filter"] = Name("FlateDecode")
+            trailer["Length"] = len(xref_body)
+            out.write(b"%d 0 obj\n" % xref_num)
+            out.write(serialize(trailer, renumber))
+            out.write(b"\nstream\n" + xref_body + b"\nendstream\nendobj\n")
+            out.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+    return {
+        "objects_in": len(objects),
+        "objects_out": len(order),
+        "merged": merged,
+        "dropped": len(objects) - len(order) - merged,
+        "streams_compressed": streams_compressed,
+    }
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+pdf_profile.py  –  Show where the bytes of a PDF go.
+
+Attributes every byte of the file to images (by filter and resolution),
+fonts (subset, fully embedded or not embedded), content streams, metadata,
+other document structure, unreferenced objects, duplicate streams and
+cross-reference overhead, per document and per page. Objects shared by
+several pages (fonts, repeated logos) are split evenly between them.
+
+Only the xref, the object dictionaries and the stream lengths are read (see
+pdf_scan.py), so profiling a multi-GB scan is fast. The one exception is
+duplicate detection: streams whose dictionary and length both match another
+stream's are hashed to confirm they are copies. Based on the result, the
+best compression preset is suggested.
+
+Examples
+--------
+# 1. Document summary and the 10 largest pages
+python pdf_profile.py report.pdf
+
+# 2. Every page
+python pdf_profile.py report.pdf --pages 0
+
+# 3. Machine-readable output
+python pdf_profile.py report.pdf --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from collections import Counter, defaultdict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from compress_pdf2 import COMPRESSION_LEVELS, PRESET_IMAGE_DPI, format_size
+from pdf_scan import PdfScan, Ref
+
+# pdf_scan puts ../pdf_common on the import path
+from pdf_objects import iter_refs
+
+# Categories in report order
+CATEGORIES = [
+    "images",
+    "fonts",
+    "content",
+    "metadata",
+    "other",
+    "unreferenced",
+    "duplicates",
+    "overhead",
+]
+
+# Upper bounds of the image resolution buckets (dpi)
+DPI_BUCKETS = [75, 150, 300, 600]
+
+_SUBSET_PREFIX = re.compile(r"^[A-Z]{6}\+")
+
+# Stream bodies are hashed in chunks of this size
+_HASH_CHUNK = 1024 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _dpi_bucket(dpi: float) -> str:
+    for limit in DPI_BUCKETS:
+        if dpi <= limit:
+            return f"<= {limit} dpi"
+    return f"> {DPI_BUCKETS[-1]} dpi"
+
+
+def _last_filter(scan: PdfScan, header: Dict[str, Any]) -> str:
+    filters = scan.resolve(header.get("Filter"))
+    if isinstance(filters, list):
+        filters = scan.resolve(filters[-1]) if filters else None
+    return str(filters) if filters else "uncompressed"
+
+
+class _Profiler:
+    """Single-use state for profile_pdf()."""
+
+    def __init__(self, scan: PdfScan):
+        self.scan = scan
+        self.objects = {obj.num: obj for obj in scan.objects()}
+        self.sizes = self._object_sizes()
+        self.category: Dict[int, str] = {}
+        self.image_groups: Dict[int, tuple] = {}  # object -> (label, dpi)
+        self.font_kinds: Dict[int, str] = {}
+        self.font_members: Dict[int, int] = {}  # object -> font dictionary
+        self.stop: Set[int] = set()  # page tree nodes and pages
+
+    # -- sizes ----------------------------------------------------------------
+
+    def _object_sizes(self) -> Dict[int, float]:
+        """Return the bytes each object occupies in the file."""
+        data = self.scan.data
+        sizes: Dict[int, float] = {}
+        for num, obj in self.objects.items():
+            if obj.offset < 0:
+                continue
+            start = obj.stream_offset + obj.stream_length if obj.is_stream else obj.offset
+            end = data.find(b"endobj", start)
+            sizes[num] = (end + 6 if end >= 0 else start) - obj.offset
+        # Objects inside an object stream share its bytes equally
+        members = Counter(stm for stm, _ in self.scan.compressed.values())
+        for num, (stm, _) in self.scan.compressed.items():
+            if num in self.objects and stm in sizes:
+                sizes[num] = sizes[stm] / members[stm]
+        for stm in members:
+            sizes[stm] = 0
+        return sizes
+
+    # -- traversal --------------------------------------------------------------
+
+    def closure(self, value: Any) -> Set[int]:
+        """Return the objects reachable from *value*, not crossing into pages."""
+        found: Set[int] = set()
+        queue = deque(iter_refs(value))
+        while queue:
+            ref = queue.popleft()
+            num = ref.num
+            if num in found or num in self.stop or num not in self.objects:
+                continue
+            found.add(num)
+            queue.extend(iter_refs(self.objects[num].value))
+        return found
+
+    def mark(self, nums: Iterable[int], category: str) -> None:
+        for num in nums:
+            self.category.setdefault(num, category)
+
+    def walk_resources(self, resources: Any, page_size, seen_forms: Set[int]) -> None:
+        resources = self.scan.resolve(resources)
+        if not isinstance(resources, dict):
+            return
+        fonts = self.scan.resolve(resources.get("Font"))
+        if isinstance(fonts, dict):
+            for ref in fonts.values():
+                if isinstance(ref, Ref) and ref.num not in self.font_kinds:
+                    self.walk_font(ref)
+        xobjects = self.scan.resolve(resources.get("XObject"))
+        if not isinstance(xobjects, dict):
+            return
+        for ref in xobjects.values():
+            if not isinstance(ref, Ref) or ref.num not in self.objects:
+                continue
+            obj = self.objects[ref.num]
+            header = obj.value if isinstance(obj.value, dict) else {}
+            if header.get("Subtype") == "Image":
+                self.walk_image(ref.num, header, page_size)
+            elif header.get("Subtype") == "Form" and ref.num not in seen_forms:
+                seen_forms.add(ref.num)
+                self.mark([ref.num], "content")
+                self.walk_resources(header.get("Resources"), page_size, seen_forms)
+
+    def walk_font(self, ref: Ref) -> None:
+        members = self.closure(ref)
+        font = self.scan.resolve(ref)
+        kind = "not embedded"
+        if isinstance(font, dict):
+            fonts = [font] + [
+                self.scan.resolve(f)
+                for f in self.scan.resolve(font.get("DescendantFonts")) or []
+            ]
+            for item in fonts:
+                descriptor = self.scan.resolve(
+                    item.get("FontDescriptor") if isinstance(item, dict) else None
+                )
+                if isinstance(descriptor, dict) and any(
+                    key in descriptor for key in ("FontFile", "FontFile2", "FontFile3")
+                ):
+                    kind = "embedded"
+            if kind == "embedded" and _SUBSET_PREFIX.match(str(font.get("BaseFont", ""))):
+                kind = "subset"
+            if font.get("Subtype") == "Type3":
+                kind = "Type3"
+        self.font_kinds[ref.num] = kind
+        for num in members:
+            if num not in self.category:
+                self.category[num] = "fonts"
+                self.font_members[num] = ref.num
+
+    def walk_image(self, num: int, header: Dict[str, Any], page_size) -> None:
+        if num not in self.image_groups:
+            width = self.scan.resolve(header.get("Width")) or 0
+            height = self.scan.resolve(header.get("Height")) or 0
+            # The placement is in the content stream, which is never decoded;
+            # like the compressor's pre-scan, assume the image spans the page
+            dpi = max(width / (page_size[0] / 72.0), height / (page_size[1] / 72.0))
+            label = f"{_last_filter(self.scan, header)}, {_dpi_bucket(round(dpi))}"
+            self.image_groups[num] = (label, dpi)
+        self.mark([num], "images")
+        # Soft masks and masks belong to the image
+        for key in ("SMask", "Mask"):
+            if isinstance(header.get(key), Ref):
+                mask = header[key].num
+                self.mark(self.closure(header[key]), "images")
+                if mask in self.objects and mask not in self.image_groups:
+                    self.image_groups[mask] = self.image_groups[num]
+
+    # -- duplicates -------------------------------------------------------------
+
+    def duplicate_streams(self) -> Set[int]:
+        """Return the streams that are byte-identical copies of an earlier one."""
+        groups = defaultdict(list)
+        for num, obj in self.objects.items():
+            if obj.is_stream and obj.stream_length > 0 and isinstance(obj.value, dict):
+                header = {k: v for k, v in obj.value.items() if k != "Length"}
+                groups[(repr(sorted(header.items())), obj.stream_length)].append(num)
+        data = self.scan.data
+        duplicates = set()
+        for nums in groups.values():
+            if len(nums) < 2:
+                continue
+            # Only streams whose dictionary and length collide are hashed,
+            # in chunks released as they go, like pdf_raw copies them
+            seen = set()
+            for num in sorted(nums):
+                obj = self.objects[num]
+                digest = hashlib.sha256()
+                end = obj.stream_offset + obj.stream_length
+                for start in range(obj.stream_offset, end, _HASH_CHUNK):
+                    stop = min(start + _HASH_CHUNK, end)
+                    digest.update(data[start:stop])
+                    self.scan._unmap(start, stop)
+                digest = digest.digest()
+                if digest in seen:
+                    duplicates.add(num)
+                seen.add(digest)
+        return duplicates
+
+
+def _suggest(categories: Dict[str, float], file_bytes: int, image_dpis: List[tuple]):
+    """Return (compression level, reason) for a profile."""
+    image_bytes = categories["images"]
+    if not file_bytes or image_bytes < 0.2 * file_bytes:
+        return (
+            "prepress",
+            "images are under 20% of the file; downsampling gains little, "
+            "so keep full quality (or try --lossless)",
+        )
+    # Byte-weighted median resolution of the images
+    image_dpis.sort()
+    half, total = image_bytes / 2, 0.0
+    median_dpi = image_dpis[-1][0] if image_dpis else 0
+    for dpi, size in image_dpis:
+        total += size
+        if total >= half:
+            median_dpi = dpi
+            break
+    for level in ("printer", "ebook"):
+        if median_dpi > PRESET_IMAGE_DPI[level] * 1.5:
+            return (
+                level,
+                f"images are {image_bytes / file_bytes:.0%} of the file at a median "
+                f"{median_dpi:.0f} dpi; {level} downsamples them to "
+                f"{PRESET_IMAGE_DPI[level]} dpi",
+            )
+    return (
+        "screen",
+        f"images are {image_bytes / file_bytes:.0%} of the file but already at "
+        f"{median_dpi:.0f} dpi; only screen ({PRESET_IMAGE_DPI['screen']} dpi) "
+        "reduces them further",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
+
+
+def profile_pdf(path) -> Dict[str, Any]:
+    """
+    Attribute the bytes of a PDF to images, fonts, content and overhead.
+
+    Args:
+        path (str): Path to the PDF file
+
+    Returns:
+        dict: file_bytes, page_count, categories (bytes per category),
+        images and fonts (count and bytes per group), pages (bytes per
+        category for each page) and suggestion (compression_level, reason)
+    """
+    with PdfScan(path) as scan:
+        profiler = _Profiler(scan)
+        objects, sizes = profiler.objects, profiler.sizes
+
+        pages = list(scan.pages())
+        root = scan.trailer.get("Root")
+        # Page tree nodes; closures never cross into them or into other pages
+        for ref, _ in pages:
+            profiler.stop.add(ref.num)
+        root_value = scan.resolve(root)
+        queue = deque([root_value.get("Pages")] if isinstance(root_value, dict) else [])
+        while queue:
+            ref = queue.popleft()
+            if not isinstance(ref, Ref) or ref.num in profiler.stop:
+                continue
+            profiler.stop.add(ref.num)
+            node = scan.resolve(ref)
+            if isinstance(node, dict):
+                queue.extend(scan.resolve(node.get("Kids")) or [])
+
+        page_objects: List[Set[int]] = []
+        page_size = (612.0, 792.0)  # US Letter, when a page has no usable MediaBox
+        seen_forms: Set[int] = set()
+        for ref, page in pages:
+            box = scan.resolve(page.get("MediaBox"))
+            if isinstance(box, list) and len(box) == 4:
+                box = [scan.resolve(v) for v in box]
+                if all(isinstance(v, (int, float)) for v in box):
+                    page_size = (
+                        abs(box[2] - box[0]) or page_size[0],
+                        abs(box[3] - box[1]) or page_size[1],
+                    )
+            profiler.mark(profiler.closure(page.get("Contents")), "content")
+            profiler.walk_resources(page.get("Resources"), page_size, seen_forms)
+            used = profiler.closure(
+                [page.get(key) for key in ("Contents", "Resources", "Annots", "Thumb")]
+            )
+            used.add(ref.num)
+            page_objects.append(used)
+
+        # Metadata: document info, XMP streams anywhere in the file
+        profiler.mark(profiler.closure(scan.trailer.get("Info")), "metadata")
+        if isinstance(scan.trailer.get("Info"), Ref):
+            profiler.mark([scan.trailer["Info"].num], "metadata")
+        for num, obj in objects.items():
+            if isinstance(obj.value, dict) and obj.value.get("Type") == "Metadata":
+                profiler.category[num] = "metadata"
+            if isinstance(obj.value, dict) and obj.value.get("Type") in ("XRef", "ObjStm"):
+                profiler.category[num] = "overhead"
+
+        # Everything else the document reaches is structure ("other")
+        profiler.stop.clear()
+        reachable = profiler.closure([root, scan.trailer.get("Info")])
+        profiler.mark(reachable, "other")
+        profiler.mark(set(objects) - reachable, "unreferenced")
+
+        duplicates = profiler.duplicate_streams()
+
+        def category_of(num: int) -> str:
+            if num in duplicates:
+                return "duplicates"
+            return profiler.category.get(num, "unreferenced")
+
+        categories = {name: 0.0 for name in CATEGORIES}
+        images: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "bytes": 0.0})
+        fonts: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "bytes": 0.0})
+        image_dpis = []
+        for num in objects:
+            size = sizes.get(num, 0)
+            category = category_of(num)
+            categories[category] += size
+            if category == "images" and num in profiler.image_groups:
+                group, dpi = profiler.image_groups[num]
+                images[group]["count"] += 1
+                images[group]["bytes"] += size
+                image_dpis.append((dpi, size))
+            elif category == "fonts":
+                kind = profiler.font_kinds[profiler.font_members[num]]
+                if num == profiler.font_members[num]:
+                    fonts[kind]["count"] += 1
+                fonts[kind]["bytes"] += size
+        categories["overhead"] += scan.size - sum(sizes.values())
+
+        # Shared objects are split evenly between the pages using them
+        users = Counter(num for used in page_objects for num in used)
+        page_reports = []
+        for index, used in enumerate(page_objects, start=1):
+            report = {"page": index, "bytes": 0.0}
+            for num in used:
+                share = sizes.get(num, 0) / users[num]
+                category = category_of(num)
+                report[category] = report.get(category, 0.0) + share
+                report["bytes"] += share
+            page_reports.append(
+                {
+                    key: round(value) if isinstance(value, float) else value
+                    for key, value in report.items()
+                }
+            )
+
+        level, reason = _suggest(categories, scan.size, image_dpis)
+        return {
+            "file_bytes": scan.size,
+            "page_count": len(pages),
+            "categories": {name: round(value) for name, value in categories.items()},
+            "images": {
+                group: {"count": info["count"], "bytes": round(info["bytes"])}
+                for group, info in sorted(images.items(), key=lambda i: -i[1]["bytes"])
+            },
+            "fonts": {
+                kind: {"count": info["count"], "bytes": round(info["bytes"])}
+                for kind, info in sorted(fonts.items(), key=lambda i: -i[1]["bytes"])
+            },
+            "pages": page_reports,
+            "suggestion": {"compression_level": level, "reason": reason},
+        }
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+
+def print_profile(profile: Dict[str, Any], top_pages: Optional[int] = 10) -> None:
+    """Print a profile as human-readable tables."""
+    total = profile["file_bytes"] or 1
+    print(f"File size: {format_size(profile['file_bytes'])}, {profile['page_count']} page(s)")
+    print("\nWhere the bytes go:")
+    for name in CATEGORIES:
+        size = profile["categories"][name]
+        if size:
+            print(f"  {name:<14} {format_size(size):>12} {size / total:>7.1%}")
+    if profile["images"]:
+        print("\nImages by filter and resolution:")
+        for group, info in profile["images"].items():
+            print(f"  {group:<32} {info['count']:>6} {format_size(info['bytes']):>12}")
+    if profile["fonts"]:
+        print("\nFonts:")
+        for kind, info in profile["fonts"].items():
+            print(f"  {kind:<32} {info['count']:>6} {format_size(info['bytes']):>12}")
+
+    pages = sorted(profile["pages"], key=lambda p: -p["bytes"])
+    if top_pages:
+        pages = pages[:top_pages]
+        print(f"\nLargest {len(pages)} page(s):")
+    else:
+        pages = profile["pages"]
+        print("\nPages:")
+    for page in pages:
+        parts = ", ".join(
+            f"{name} {format_size(page[name])}"
+            for name in CATEGORIES
+            if page.get(name)
+        )
+        print(f"  page {page['page']:>5}: {format_size(page['bytes']):>12}  ({parts})")
+
+    suggestion = profile["suggestion"]
+    level = suggestion["compression_level"]
+    print(f"\nSuggested compression level: {level} ({COMPRESSION_LEVELS[level]})")
+    print(f"  {suggestion['reason']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Show where the bytes of a PDF go and suggest a compression level."
+    )
+    parser.add_argument("pdf", help="Input PDF file")
+    parser.add_argument(
+        "--pages",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Show the N largest pages (0 shows every page in order; default: 10)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the profile as JSON")
+    args = parser.parse_args()
+
+    try:
+        profile = profile_pdf(args.pdf)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    if args.json:
+        print(json.dumps(profile, indent=2))
+    else:
+        print_profile(profile, args.pages)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+pdf_scan.py  –  Fast structural scanner for PDF files.
+
+Reads the cross-reference table and the object dictionaries only. Stream
+bodies are never decoded (apart from object streams, which hold dictionaries
+themselves), so scanning a multi-GB scan costs about as much as reading its
+dictionaries. The file is memory-mapped and only the pages holding object
+headers are touched.
+
+The xref offsets are located with pypdf; the objects are parsed by
+pdf_common/pdf_objects.py, which the splitter's raw mode uses as well.
+
+Example
+-------
+    with PdfScan("report.pdf") as scan:
+        for obj in scan.objects():
+            if obj.is_stream and obj.value.get("Subtype") == "Image":
+                print(obj.num, obj.value["Width"], obj.value["Height"], obj.stream_length)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Shared helpers live in ../pdf_common
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "pdf_common")
+)
+
+from pdf_objects import HexString, PdfFile, PdfObject, PdfSyntaxError, Ref  # noqa: E402
+
+# One indirect object found through the xref
+ScannedObject = PdfObject
+
+
+class PdfScan(PdfFile):
+    """
+    Random access to the objects of a PDF without decoding stream bodies.
+
+    Objects that cannot be read are treated as missing, unless *strict* is
+    set: then reading one raises PdfSyntaxError. Use as a context manager, or
+    call close() when done.
+    """
+
+    def __init__(self, path, strict: bool = False):
+        super().__init__(path)
+        self.strict = strict
+        try:
+            reader = self.read_xref()
+            self.trailer = self._convert_trailer(reader.trailer)
+        except Exception:
+            self.close()
+            raise
+        self._cache: Dict[int, ScannedObject] = {}
+
+    def _convert_trailer(self, trailer) -> Dict[str, Any]:
+        # Only references and plain values are needed from the trailer
+        result = {}
+        file_id = trailer.get("/ID")
+        if file_id is not None:
+            result["ID"] = [
+                HexString(getattr(part, "original_bytes", bytes(part)))
+                for part in file_id.get_object()
+            ]
+        for key in ("/Root", "/Info", "/Encrypt", "/Size"):
+            value = trailer.get(key)
+            if value is None:
+                continue
+            ref = getattr(value, "indirect_reference", None)
+            if hasattr(value, "idnum"):
+                result[key[1:]] = Ref(value.idnum, value.generation)
+            elif ref is not None:
+                result[key[1:]] = Ref(ref.idnum, ref.generation)
+            else:
+                result[key[1:]] = value
+        return result
+
+    # -- object access ------------------------------------------------------
+
+    def get(self, num: int) -> Optional[ScannedObject]:
+        """Return object *num*, or None if it is missing or unreadable."""
+        obj = self._cache.get(num)
+        if obj is None:
+            obj = self._load(num)
+            if obj is not None:
+                self._cache[num] = obj
+        return obj
+
+    def _load(self, num: int) -> Optional[ScannedObject]:
+        try:
+            return super().get(num)
+        except PdfSyntaxError:
+            if self.strict:
+                raise
+            return None
+
+    def objects(self) -> Iterator[ScannedObject]:
+        """Yield every readable object (every object, if strict) in object-number order."""
+        # Bypass the cache so a full pass does not hold every object in memory
+        for num in sorted(set(self.offsets) | set(self.compressed)):
+            obj = self._cache.get(num) or self._load(num)
+            if obj is not None:
+                yield obj
+
+    # -- document structure -------------------------------------------------
+
+    def pages(self) -> Iterator[Tuple[Ref, Dict[str, Any]]]:
+        """
+        Yield (reference, page dictionary) for every page in document order.
+
+        Inheritable attributes (Resources, MediaBox, CropBox, Rotate) are
+        copied down from the page tree, so each dictionary is self-contained.
+        """
+        root = self.resolve(self.trailer.get("Root"))
+        if not isinstance(root, dict):
+            return
+        stack = [(root.get("Pages"), {})]
+        visited = set()
+        while stack:
+            ref, inherited = stack.pop()
+            if not isinstance(ref, Ref) or ref.num in visited:
+                continue
+            visited.add(ref.num)
+            node = self.resolve(ref)
+            if not isinstance(node, dict):
+                continue
+            attrs = dict(inherited)
+            for key in ("Resources", "MediaBox", "CropBox", "Rotate"):
+                if key in node:
+                    attrs[key] = node[key]
+            if node.get("Type") == "Pages" or "Kids" in node:
+                kids = self.resolve(node.get("Kids")) or []
+                stack.extend((kid, attrs) for kid in reversed(kids))
+            else:
+                page = dict(attrs)
+                page.update(node)
+                yield ref, page
+
+    def __enter__(self) -> "PdfScan":
+        return self
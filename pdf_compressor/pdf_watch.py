@@ -0,0 +1,234 @@
+"""
+pdf_watch.py  –  Detect files that have finished arriving in a directory.
+
+FolderWatcher reports each matching file in a directory once it is
+completely written: its size and modification time must stay unchanged for
+a debounce interval, so files still being copied or uploaded are never
+picked up half-written.
+
+On Linux, changes are detected with inotify (through ctypes, no extra
+dependency) and the directory is never rescanned. Elsewhere, or when
+inotify is unavailable (e.g. on some network filesystems, where remote
+writes raise no events), the directory is polled instead.
+
+Example
+-------
+    with FolderWatcher("incoming/", debounce=2.0) as watcher:
+        while True:
+            for path in watcher.poll(timeout=1.0):
+                print("ready:", path)
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# inotify event flags (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+_WATCH_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+def _inotify_fd(directory: str) -> Optional[int]:
+    """Return an inotify descriptor watching *directory*, or None if unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        init = libc.inotify_init1
+        add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    # IN_NONBLOCK and IN_CLOEXEC have the values of O_NONBLOCK and O_CLOEXEC
+    fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        return None
+    if add_watch(fd, os.fsencode(directory), _WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class FolderWatcher:
+    """
+    Report files in a directory once they have been completely written.
+
+    Only the top level of the directory is watched, and only names ending in
+    one of *suffixes* (case-insensitive) that do not start with a dot.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        directory,
+        suffixes=(".pdf",),
+        debounce: float = 2.0,
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+    ):
+        self.directory = os.path.abspath(directory)
+        if not os.path.isdir(self.directory):
+            raise NotADirectoryError(f"Not a directory: {self.directory}")
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._fd = _inotify_fd(self.directory) if use_inotify else None
+        self.backend = "inotify" if self._fd is not None else "polling"
+        # path -> (size, mtime) and the time that signature was first seen
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # path -> signature it was reported with
+        self._reported: Dict[str, Tuple[int, int]] = {}
+        self._next_scan = 0.0
+        # Files that were already there (or arrived before the watch started)
+        self._scan()
+
+    def _matches(self, name: str) -> bool:
+        return not name.startswith(".") and name.lower().endswith(self.suffixes)
+
+    def _touch(self, path: str, now: float) -> None:
+        """Record the current signature of *path*, restarting its quiet period if it changed."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None)
+            self._reported.pop(path, None)
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._reported.get(path) == signature:
+            return
+        old = self._pending.get(path)
+        if old is None or old[0] != signature:
+            self._pending[path] = (signature, now)
+
+    def _scan(self) -> None:
+        now = time.monotonic()
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        present = set()
+        for name in names:
+            if self._matches(name):
+                path = os.path.join(self.directory, name)
+                present.add(path)
+                self._touch(path, now)
+        # Forget files that were moved away or deleted
+        for path in list(self._reported):
+            if path not in present:
+                del self._reported[path]
+
+    def _read_events(self, timeout: float) -> None:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        now = time.monotonic()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; fall back to one full rescan
+                self._scan()
+            elif mask & (IN_DELETE_SELF | IN_IGNORED):
+                raise FileNotFoundError(f"Watched directory was removed: {self.directory}")
+            elif name:
+                name = os.fsdecode(name)
+                if self._matches(name):
+                    self._touch(os.path.join(self.directory, name), now)
+
+    def poll(self, timeout: float = 1.0) -> List[str]:
+        """
+        Wait up to *timeout* seconds and return the files that became ready.
+
+        A file is reported again only if it is replaced or modified after it
+        was reported.
+
+        Args:
+            timeout (float): Maximum time to wait for changes, in seconds
+
+        Returns:
+            list: Absolute paths of the files ready for processing
+        """
+        if self._fd is not None:
+            # Wake up in time to release files whose quiet period ends
+            if self._pending:
+                timeout = min(timeout, self.debounce / 2)
+            self._read_events(timeout)
+        else:
+            now = time.monotonic()
+            if now >= self._next_scan:
+                self._scan()
+                self._next_scan = now + self.poll_interval
+            time.sleep(max(0.0, min(timeout, self._next_scan - time.monotonic())))
+
+        now = time.monotonic()
+        ready = []
+        for path, (signature, since) in list(self._pending.items()):
+            if now - since < self.debounce:
+                continue
+            # Re-check: a writer may still be appending without raising events
+            self._touch(path, now)
+            current = self._pending.get(path)
+            if current is not None and current[0] == signature and current[1] == since:
+                del self._pending[path]
+                self._reported[path] = signature
+                ready.append(path)
+        return sorted(ready)
+
+    def forget(self, path: str) -> None:
+        """Stop remembering *path*, e.g. after it was moved out of the directory."""
+        self._pending.pop(path, None)
+        self._reported.pop(path, None)
+
+    def recheck(self, path: str) -> None:
+        """
+        Report *path* again once it has been unchanged for the debounce interval.
+
+        For a file that changed while it was being processed: its changes may
+        already have been seen (and dropped) while it was busy.
+        """
+        self.forget(path)
+        self._touch(path, time.monotonic())
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FolderWatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,64 @@
+"""Tests for benchmark.py."""
+
+import os
+
+from benchmark import compare, generate_corpus, run_benchmark, run_publish_benchmark
+
+
+def test_publish_benchmark_modes(tmp_path):
+    corpus = generate_corpus(str(tmp_path / "corpus"), ["text"])
+    target, staging = tmp_path / "target", tmp_path / "staging"
+    target.mkdir()
+    staging.mkdir()
+
+    results = run_publish_benchmark(corpus, str(target), str(staging), repeat=1)
+
+    assert sorted(results) == [
+        "text/publish/direct",
+        "text/publish/partial",
+        "text/publish/staged",
+    ]
+    size = os.path.getsize(corpus["text"][0])
+    for metrics in results.values():
+        assert metrics["output_bytes"] == size
+        assert metrics["wall_time"] > 0
+    # Nothing is left behind in either directory
+    assert os.listdir(target) == [] and os.listdir(staging) == []
+    assert compare(results, results, 10, 2, 20) == []
+
+
+def test_generated_corpus_is_reproducible(tmp_path):
+    first = generate_corpus(str(tmp_path / "a"), ["text"])
+    second = generate_corpus(str(tmp_path / "b"), ["text"])
+    with open(first["text"][0], "rb") as a, open(second["text"][0], "rb") as b:
+        assert a.read() == b.read()
+    assert first["text"][1] == 50
+
+
+def test_lossless_benchmark_reports_metrics(tmp_path):
+    corpus = generate_corpus(str(tmp_path / "corpus"), ["text"])
+
+    results = run_benchmark(corpus, ["lossless"], ["ebook"], repeat=1, work_dir=str(tmp_path))
+
+    metrics = results["text/lossless/-"]
+    assert metrics["pages"] == 50
+    assert metrics["input_bytes"] == os.path.getsize(corpus["text"][0])
+    assert 0 < metrics["ratio"] <= 1
+    assert metrics["mb_per_s"] > 0
+
+
+def test_compare_flags_regressions():
+    old = {"ratio": 0.5, "mb_per_s": 10.0, "peak_memory": 100 * 1024**2}
+    baseline = {"a": old, "b": old}
+    results = {
+        "a": dict(old, mb_per_s=9.5, ratio=0.51),
+        "b": {"ratio": 0.6, "mb_per_s": 5.0, "peak_memory": 150 * 1024**2},
+        "new": dict(old, mb_per_s=1.0),
+    }
+
+    regressions = compare(results, baseline, 10, 2, 20)
+
+    # Within the limits for "a"; no baseline for "new"
+    assert len(regressions) == 3
+    assert all(message.startswith("b: ") for message in regressions)
+    assert "throughput" in regressions[0] and "-50.0%" in regressions[0]
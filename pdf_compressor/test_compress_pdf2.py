@@ -0,0 +1,859 @@
+"""Tests for compress_pdf2.py, run against a stub `gs`."""
+
+import asyncio
+import io
+import json
+import os
+import stat
+import subprocess
+import threading
+import time
+import zlib
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+import compress_pdf2
+
+# Shrinks the input to a fraction set by -dPDFSETTINGS (ebook: a half) or by
+# -dColorImageResolution, by truncating it. Like the real gs, it prints to
+# stdout unless that is redirected with -sstdout. With -dFirstPage/-dLastPage
+# it writes those pages as a valid PDF instead. Fed jobs on stdin (the warm
+# mode), it enforces -dSAFER's --permit-file-* lists and hangs on inputs named
+# hang*.pdf. Every command line is appended to $STUB_GS_LOG.
+STUB_GS = r'''#!/usr/bin/env python3
+import io, os, re, sys, time
+args = sys.argv[1:]
+if os.environ.get("STUB_GS_LOG"):
+    with open(os.environ["STUB_GS_LOG"], "a") as log:
+        log.write(" ".join(args) + "\n")
+out = [a.split("=", 1)[1] for a in args if a.startswith("-sOutputFile=")][0]
+src = args[-1]
+RATIOS = {"prepress": 1.0, "printer": 0.8, "ebook": 0.5, "screen": 0.3, "default": 0.3}
+
+
+def option(name):
+    values = [a.split("=", 1)[1] for a in args if a.startswith(name + "=")]
+    return values[0] if values else None
+
+
+def compress(data):
+    if option("-dFirstPage"):
+        from pypdf import PdfReader, PdfWriter
+
+        reader, writer = PdfReader(io.BytesIO(data)), PdfWriter()
+        for index in range(int(option("-dFirstPage")) - 1, int(option("-dLastPage"))):
+            writer.add_page(reader.pages[index])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+    ratio = RATIOS[option("-dPDFSETTINGS").lstrip("/")]
+    if option("-dColorImageResolution"):
+        ratio = int(option("-dColorImageResolution")) / 250
+    return data[: int(len(data) * ratio)]
+
+
+if src == "-" and "-dBATCH" not in args:
+    assert "-dSAFER" in args and "-dNOSAFER" not in args
+    readable = [a.split("=", 1)[1] for a in args if a.startswith("--permit-file-read=")]
+    writable = [a.split("=", 1)[1] for a in args if a.startswith("--permit-file-write=")]
+    for line in sys.stdin.buffer:
+        if line.strip() == b"quit":
+            break
+        dst, path = [s.decode() for s in re.findall(rb"\(([^)]*)\)", line)[:2]]
+        if os.path.basename(path).startswith("hang"):
+            time.sleep(3600)
+        if any(path.startswith(d) for d in readable) and any(
+            dst.startswith(d) for d in writable
+        ):
+            with open(path, "rb") as fh:
+                data = compress(fh.read())
+            with open(dst, "wb") as fh:
+                fh.write(data)
+            marker = b"%%[pdf_compressor job ok]%%"
+        else:
+            sys.stdout.buffer.write(b"Error: /invalidfileaccess\n")
+            marker = b"%%[pdf_compressor job failed]%%"
+        sys.stdout.buffer.write(b"\n" + marker + b"\n")
+        sys.stdout.flush()
+    sys.exit(0)
+if "-sstdout=%stderr" not in args:
+    sys.stdout.buffer.write(b"GPL Ghostscript 10.0 (stub)\n")
+data = compress(sys.stdin.buffer.read() if src == "-" else open(src, "rb").read())
+if out == "-":
+    sys.stdout.buffer.write(data)
+else:
+    open(out, "wb").write(data)
+'''
+
+
+def _install(bin_dir, name, script):
+    bin_dir.mkdir(exist_ok=True)
+    path = bin_dir / name
+    path.write_text(script)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+@pytest.fixture
+def stub_gs(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    _install(bin_dir, "gs", STUB_GS)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv("STUB_GS_LOG", str(tmp_path / "gs.log"))
+    return bin_dir
+
+
+def _gs_calls(tmp_path):
+    """Return the argument lists of every stub gs run so far."""
+    try:
+        with open(tmp_path / "gs.log") as fh:
+            return [line.split() for line in fh]
+    except FileNotFoundError:
+        return []
+
+
+def _pdf_bytes(size=4096):
+    return b"%PDF-1.4\n" + b"0" * (size - len(b"%PDF-1.4\n"))
+
+
+def test_compress_stream_keeps_messages_out_of_the_output(stub_gs):
+    source = _pdf_bytes()
+    result = compress_pdf2.compress_stream(source)
+    assert result == source[: len(source) // 2]
+
+
+def test_compress_stream_to_destination(stub_gs):
+    source = _pdf_bytes()
+    destination = io.BytesIO()
+    written = compress_pdf2.compress_stream(io.BytesIO(source), destination)
+    assert written == len(source) // 2
+    assert destination.getvalue().startswith(b"%PDF-1.4\n")
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["a.pdf", "b.pdf", "-o", "-"],
+        ["-", "--lossless"],
+        ["-", "--engine", "native", "--target-size", "1KB"],
+        ["a.pdf", "-o", "-", "--json"],
+    ],
+)
+def test_streaming_rejects_options_it_cannot_honour(stub_gs, tmp_path, monkeypatch, argv):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["compress_pdf2.py"] + argv)
+
+    with pytest.raises(SystemExit) as excinfo:
+        compress_pdf2.main()
+
+    assert excinfo.value.code == 2
+    assert _gs_calls(tmp_path) == []
+
+
+def _write_pdf(path, size=4096):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(_pdf_bytes(size))
+    return path
+
+
+def test_warm_pool_sandboxes_each_job_directory(stub_gs, tmp_path):
+    first = _write_pdf(tmp_path / "a" / "one.pdf")
+    second = _write_pdf(tmp_path / "b" / "two.pdf")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    with compress_pdf2.GhostscriptPool("ebook", size=1) as pool:
+        pool.run(str(first), str(out_dir / "one.pdf"))
+        worker = pool._slots.queue[-1]
+        assert "-dSAFER" in worker.command
+        # A new input directory restarts the worker with it added
+        pool.run(str(second), str(out_dir / "two.pdf"))
+        worker = pool._slots.queue[-1]
+        assert worker.read_dirs == {str(tmp_path / "a"), str(tmp_path / "b")}
+        assert worker.write_dirs == {str(out_dir)}
+
+    assert (out_dir / "one.pdf").stat().st_size == 2048
+    assert (out_dir / "two.pdf").stat().st_size == 2048
+
+
+def test_warm_worker_outside_sandbox_fails(stub_gs, tmp_path):
+    src = _write_pdf(tmp_path / "a" / "one.pdf")
+    worker = compress_pdf2._GhostscriptWorker("ebook", {str(tmp_path / "a")}, set())
+    try:
+        with pytest.raises(subprocess.CalledProcessError, match="exit status"):
+            worker.run(str(src), str(tmp_path / "out.pdf"))
+    finally:
+        worker.close()
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_hung_warm_job_is_killed_and_replaced(stub_gs, tmp_path):
+    hung = _write_pdf(tmp_path / "hang.pdf")
+    fine = _write_pdf(tmp_path / "fine.pdf")
+
+    with compress_pdf2.GhostscriptPool("ebook", size=1, timeout=0.5) as pool:
+        start = time.monotonic()
+        with pytest.raises(subprocess.TimeoutExpired):
+            pool.run(str(hung), str(tmp_path / "hang_out.pdf"))
+        assert time.monotonic() - start < 10
+        assert pool._slots.queue[-1] is None
+
+        pool.run(str(fine), str(tmp_path / "fine_out.pdf"))
+    assert (tmp_path / "fine_out.pdf").stat().st_size == 2048
+
+
+def test_compress_many_async(stub_gs, tmp_path):
+    sources = [_write_pdf(tmp_path / "in" / f"doc{i}.pdf") for i in range(3)]
+    results = asyncio.run(
+        compress_pdf2.compress_many_async([str(tmp_path / "in")], str(tmp_path / "out"))
+    )
+    assert len(results) == len(sources)
+    for result in results:
+        assert os.path.getsize(result) == 2048
+    assert not [name for name in os.listdir(tmp_path / "out") if name.endswith(".partial")]
+
+
+def test_batch_outputs_mirror_input_directories(stub_gs, tmp_path):
+    first = _write_pdf(tmp_path / "in" / "a" / "report.pdf")
+    second = _write_pdf(tmp_path / "in" / "b" / "report.pdf", size=8192)
+    out = tmp_path / "out"
+
+    succeeded, failed = compress_pdf2.compress_batch(
+        [str(first.parent), str(second.parent)], str(out), workers=2
+    )
+
+    assert failed == []
+    assert sorted(succeeded) == [
+        str(out / "a" / "report_compressed.pdf"),
+        str(out / "b" / "report_compressed.pdf"),
+    ]
+    assert (out / "a" / "report_compressed.pdf").stat().st_size == 2048
+    assert (out / "b" / "report_compressed.pdf").stat().st_size == 4096
+
+
+def test_batch_outputs_from_one_directory_stay_flat(tmp_path):
+    pdfs = [str(tmp_path / "in" / name) for name in ("x.pdf", "y.pdf")]
+    outputs = compress_pdf2._batch_output_paths(pdfs, str(tmp_path / "out"))
+    assert outputs == {
+        pdfs[0]: str(tmp_path / "out" / "x_compressed.pdf"),
+        pdfs[1]: str(tmp_path / "out" / "y_compressed.pdf"),
+    }
+
+
+def test_cache_serves_repeated_input_without_gs(stub_gs, tmp_path):
+    src = _write_pdf(tmp_path / "in.pdf")
+    copy = _write_pdf(tmp_path / "copy.pdf")
+    cache = compress_pdf2.ResultCache(tmp_path / "cache")
+
+    first = compress_pdf2.compress_pdf_detailed(
+        str(src), str(tmp_path / "a.pdf"), quiet=True, cache=cache
+    )
+    # Same content under another name: a hit
+    second = compress_pdf2.compress_pdf_detailed(
+        str(copy), str(tmp_path / "b.pdf"), quiet=True, cache=cache
+    )
+    # Other settings: a miss
+    third = compress_pdf2.compress_pdf_detailed(
+        str(src), str(tmp_path / "c.pdf"), "screen", quiet=True, cache=cache
+    )
+
+    assert (first.status, second.status, third.status) == ("compressed", "cached", "compressed")
+    assert len(_gs_calls(tmp_path)) == 2
+    assert (tmp_path / "b.pdf").read_bytes() == (tmp_path / "a.pdf").read_bytes()
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0}
+
+
+
+def test_editing_an_output_in_place_leaves_the_cache_intact(stub_gs, tmp_path):
+    src = _write_pdf(tmp_path / "in.pdf")
+    cache = compress_pdf2.ResultCache(tmp_path / "cache")
+    compress_pdf2.compress_pdf_detailed(
+        str(src), str(tmp_path / "a.pdf"), quiet=True, cache=cache
+    )
+    original = (tmp_path / "a.pdf").read_bytes()
+    assert (tmp_path / "a.pdf").stat().st_nlink == 1
+
+    # An incremental save appends to the file in place
+    with open(tmp_path / "a.pdf", "ab") as fh:
+        fh.write(b"% incremental update\n")
+    result = compress_pdf2.compress_pdf_detailed(
+        str(src), str(tmp_path / "b.pdf"), quiet=True, cache=cache
+    )
+
+    assert result.status == "cached"
+    assert (tmp_path / "b.pdf").read_bytes() == original
+    assert (tmp_path / "b.pdf").stat().st_nlink == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = compress_pdf2.ResultCache(tmp_path / "cache", max_bytes=2500)
+    entries = []
+    for i in range(3):
+        path = tmp_path / f"r{i}.pdf"
+        path.write_bytes(b"%d" % i * 1000)
+        entries.append(path)
+    keys = [cache.key(str(path), ["-dPDFSETTINGS=/ebook"]) for path in entries]
+
+    cache.store(keys[0], str(entries[0]))
+    cache.store(keys[1], str(entries[1]))
+    old = time.time() - 100
+    os.utime(cache._entry(keys[1]), (old, old))
+    # A hit refreshes the first entry, so the second is the oldest
+    os.utime(cache._entry(keys[0]), (old - 100, old - 100))
+    assert cache.fetch(keys[0], str(tmp_path / "hit.pdf"))
+    cache.store(keys[2], str(entries[2]))
+
+    assert cache.stats()["evictions"] == 1
+    assert not cache.fetch(keys[1], str(tmp_path / "miss.pdf"))
+    assert cache.fetch(keys[2], str(tmp_path / "hit2.pdf"))
+
+
+def test_target_size_picks_best_fitting_preset(stub_gs, tmp_path):
+    src = _write_pdf(tmp_path / "in.pdf", size=10000)
+    out = tmp_path / "out.pdf"
+
+    compress_pdf2.compress_to_target(str(src), 4000, str(out), workers=8, quiet=True)
+
+    # ebook (5000 bytes) is too big, screen (3000) is the best that fits
+    assert out.stat().st_size == 3000
+
+
+def test_target_size_keeps_smallest_when_nothing_fits(stub_gs, tmp_path, capsys):
+    src = _write_pdf(tmp_path / "in.pdf", size=10000)
+    out = tmp_path / "out.pdf"
+
+    compress_pdf2.compress_to_target(str(src), 500, str(out), workers=2)
+
+    # 24 dpi is the last fallback: 24 / 250 of the input
+    assert out.stat().st_size == 960
+    assert "no setting reached" in capsys.readouterr().out
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".partial")] == []
+
+
+def test_target_size_keeps_original_that_fits(stub_gs, tmp_path):
+    src = _write_pdf(tmp_path / "in.pdf", size=1000)
+    out = tmp_path / "out.pdf"
+
+    compress_pdf2.compress_to_target(str(src), 4000, str(out), quiet=True)
+
+    assert out.read_bytes() == src.read_bytes()
+    assert _gs_calls(tmp_path) == []
+
+
+def _numbered_pdf(path, count, padding=20000):
+    """Write a PDF whose page i draws "page i", plus an unreferenced stream gs drops."""
+    writer = PdfWriter()
+    for i in range(1, count + 1):
+        page = writer.add_blank_page(200, 200)
+        stream = DecodedStreamObject()
+        stream.set_data(b"BT 10 10 Td (page %d) Tj ET" % i)
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    orphan = DecodedStreamObject()
+    orphan.set_data(os.urandom(padding))
+    writer._add_object(orphan)
+    with open(path, "wb") as fh:
+        writer.write(fh)
+
+
+def test_shard_ranges_cover_every_page():
+    assert compress_pdf2._shard_ranges(7, 3) == [(1, 3), (4, 5), (6, 7)]
+    assert compress_pdf2._shard_ranges(2, 8) == [(1, 1), (2, 2)]
+
+
+def test_sharded_output_keeps_page_order(stub_gs, tmp_path):
+    src, out = tmp_path / "big.pdf", tmp_path / "out.pdf"
+    _numbered_pdf(src, 7)
+
+    compress_pdf2.compress_sharded(str(src), str(out), workers=3, quiet=True)
+
+    ranges = sorted(
+        [arg for arg in call if arg.startswith(("-dFirstPage", "-dLastPage"))]
+        for call in _gs_calls(tmp_path)
+    )
+    assert ranges == [
+        ["-dFirstPage=1", "-dLastPage=3"],
+        ["-dFirstPage=4", "-dLastPage=5"],
+        ["-dFirstPage=6", "-dLastPage=7"],
+    ]
+    assert out.stat().st_size < src.stat().st_size
+    pages = PdfReader(out).pages
+    assert [page.get_contents().get_data() for page in pages] == [
+        b"BT 10 10 Td (page %d) Tj ET" % i for i in range(1, 8)
+    ]
+
+    # No font copies: the stitched file stands without a single-pass check
+    assert len(_gs_calls(tmp_path)) == 3
+
+
+def test_duplicated_font_bytes(tmp_path):
+    from pypdf.generic import DictionaryObject, StreamObject
+
+    path = tmp_path / "fonts.pdf"
+    writer = PdfWriter()
+    writer.add_blank_page(200, 200)
+    for name, size in (("ABCDEF+Serif", 100), ("GHIJKL+Serif", 60), ("Sans", 80)):
+        font_file = StreamObject()
+        font_file._data = os.urandom(size)
+        writer._add_object(
+            DictionaryObject(
+                {
+                    NameObject("/Type"): NameObject("/FontDescriptor"),
+                    NameObject("/FontName"): NameObject("/" + name),
+                    NameObject("/FontFile2"): writer._add_object(font_file),
+                }
+            )
+        )
+    with open(path, "wb") as fh:
+        writer.write(fh)
+
+    # The smaller Serif subset is the extra copy
+    assert compress_pdf2._duplicated_font_bytes(str(path)) == 60
+
+
+@pytest.mark.parametrize("padding", [20000, 0])
+def test_sharded_output_is_no_larger_than_single_pass(stub_gs, tmp_path, monkeypatch, padding):
+    src, out = tmp_path / "big.pdf", tmp_path / "out.pdf"
+    _numbered_pdf(src, 4, padding=padding)
+    monkeypatch.setattr(compress_pdf2, "_duplicated_font_bytes", lambda path: 1000)
+
+    compress_pdf2.compress_sharded(str(src), str(out), workers=2, quiet=True)
+
+    calls = _gs_calls(tmp_path)
+    assert len(calls) == 3
+    # The stub's single pass keeps half the input; the shards drop the padding
+    single = src.stat().st_size // 2
+    if padding:
+        assert len(PdfReader(out).pages) == 4 and out.stat().st_size < single
+    else:
+        assert out.stat().st_size == single
+
+
+def test_manifest_status(tmp_path):
+    src = _write_pdf(tmp_path / "in.pdf")
+    out = _write_pdf(tmp_path / "out.pdf", size=100)
+    with compress_pdf2.Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        assert manifest.status(str(src), "ebook", str(out)) == "new"
+        manifest.record(str(src), "ebook", str(out))
+        assert manifest.status(str(src), "ebook", str(out)) == "current"
+        # The ebook output is in the way of a screen run, which replaces it
+        assert manifest.status(str(src), "screen", str(out)) == "changed"
+        assert manifest.status(str(src), "screen", str(tmp_path / "other.pdf")) == "new"
+
+        # Touched but identical: still current
+        later = src.stat().st_mtime + 10
+        os.utime(src, (later, later))
+        assert manifest.status(str(src), "ebook", str(out)) == "current"
+
+        src.write_bytes(src.read_bytes()[::-1])
+        assert manifest.status(str(src), "ebook", str(out)) == "changed"
+
+
+def test_manifest_batch_skips_done_files(stub_gs, tmp_path):
+    for i in range(3):
+        _write_pdf(tmp_path / "in" / f"doc{i}.pdf")
+    out = tmp_path / "out"
+    manifest_path = str(tmp_path / "manifest.sqlite")
+
+    with compress_pdf2.Manifest(manifest_path) as manifest:
+        done, failed = compress_pdf2.compress_batch(
+            [str(tmp_path / "in")], str(out), manifest=manifest
+        )
+    assert len(done) == 3 and failed == []
+
+    # A re-run only compresses the file that changed
+    _write_pdf(tmp_path / "in" / "doc1.pdf", size=8192)
+    with compress_pdf2.Manifest(manifest_path) as manifest:
+        done, failed = compress_pdf2.compress_batch(
+            [str(tmp_path / "in")], str(out), manifest=manifest
+        )
+    assert done == [str(out / "doc1_compressed.pdf")] and failed == []
+    assert (out / "doc1_compressed.pdf").stat().st_size == 4096
+    assert len(_gs_calls(tmp_path)) == 4
+
+
+
+def test_manifest_settings():
+    assert compress_pdf2.manifest_settings("gs", "ebook") == "ebook"
+    assert compress_pdf2.manifest_settings("native", "ebook") == "native:ebook"
+    assert compress_pdf2.manifest_settings("lossless", "ebook") == "lossless"
+    assert compress_pdf2.manifest_settings("lossless", "screen") == "lossless"
+
+
+def test_manifest_reruns_files_done_with_another_engine(stub_gs, tmp_path):
+    (tmp_path / "in").mkdir()
+    for i in range(2):
+        _numbered_pdf(tmp_path / "in" / f"doc{i}.pdf", 2)
+    manifest_path = str(tmp_path / "manifest.sqlite")
+
+    def run(engine):
+        with compress_pdf2.Manifest(manifest_path) as manifest:
+            done, failed = compress_pdf2.compress_batch(
+                [str(tmp_path / "in")], str(tmp_path / "out"), manifest=manifest, engine=engine
+            )
+        assert failed == []
+        return len(done)
+
+    assert run("gs") == 2
+    assert run("gs") == 0
+    # Done with Ghostscript is not done losslessly; the outputs are replaced
+    assert run("lossless") == 2
+    assert run("lossless") == 0
+    assert run("gs") == 2
+
+
+def test_manifest_needs_batch_mode(tmp_path, monkeypatch):
+    src = _write_pdf(tmp_path / "in.pdf")
+    monkeypatch.setattr(
+        "sys.argv", ["compress_pdf2.py", str(src), "--manifest", str(tmp_path / "m.sqlite")]
+    )
+    with pytest.raises(SystemExit) as excinfo:
+        compress_pdf2.main()
+    assert excinfo.value.code == 2
+
+
+def test_cli_closes_the_manifest(stub_gs, tmp_path, monkeypatch):
+    _write_pdf(tmp_path / "in" / "a.pdf")
+    closed = []
+    close = compress_pdf2.Manifest.close
+    monkeypatch.setattr(
+        compress_pdf2.Manifest, "close", lambda self: closed.append(close(self))
+    )
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "compress_pdf2.py",
+            str(tmp_path / "in"),
+            "-o",
+            str(tmp_path / "out"),
+            "--manifest",
+            str(tmp_path / "m.sqlite"),
+        ],
+    )
+
+    assert compress_pdf2.main() == 0
+    assert len(closed) == 1
+
+
+def test_watch_compresses_arrivals_and_moves_originals(stub_gs, tmp_path):
+    drop, out = tmp_path / "drop", tmp_path / "out"
+    drop.mkdir()
+    stop = threading.Event()
+    counts = []
+    thread = threading.Thread(
+        target=lambda: counts.append(
+            compress_pdf2.compress_watch(
+                str(drop),
+                str(out),
+                workers=2,
+                debounce=0.2,
+                poll_interval=0.05,
+                stop_event=stop,
+            )
+        )
+    )
+    thread.start()
+    try:
+        _write_pdf(drop / "scan.pdf")
+        deadline = time.monotonic() + 10
+        while not (drop / "processed" / "scan.pdf").exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join(10)
+
+    assert counts == [(1, 0)]
+    assert (out / "scan_compressed.pdf").stat().st_size == 2048
+    assert not (drop / "scan.pdf").exists()
+
+
+
+def test_watch_redoes_a_file_rewritten_while_in_flight(stub_gs, tmp_path, monkeypatch):
+    drop, out = tmp_path / "drop", tmp_path / "out"
+    drop.mkdir()
+    compress = compress_pdf2.compress_pdf_detailed
+    calls = []
+
+    def rewritten_during_first_run(input_path, *args, **kwargs):
+        result = compress(input_path, *args, **kwargs)
+        calls.append(input_path)
+        if len(calls) == 1:
+            _write_pdf(drop / "scan.pdf", size=8192)
+        return result
+
+    monkeypatch.setattr(compress_pdf2, "compress_pdf_detailed", rewritten_during_first_run)
+    _write_pdf(drop / "scan.pdf")
+    stop = threading.Event()
+    counts = []
+    thread = threading.Thread(
+        target=lambda: counts.append(
+            compress_pdf2.compress_watch(
+                str(drop), str(out), debounce=0.2, poll_interval=0.05, stop_event=stop
+            )
+        )
+    )
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not (drop / "processed" / "scan.pdf").exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join(10)
+
+    assert counts == [(1, 0)] and len(calls) == 2
+    # The output is that of the new contents
+    assert (drop / "processed" / "scan.pdf").stat().st_size == 8192
+    assert (out / "scan_compressed.pdf").stat().st_size == 4096
+
+
+def _image_pdf(path, width, height, pixels, extra=b""):
+    """Write a one-page US Letter PDF showing an unfiltered RGB image."""
+    objects = [
+        b"<</Type /Catalog /Pages 2 0 R>>",
+        b"<</Type /Pages /Kids [3 0 R] /Count 1>>",
+        b"<</Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources <</XObject <</Im0 4 0 R>>>> /Contents 5 0 R>>",
+        b"<</Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+        b"/BitsPerComponent 8 /Length %d>>\nstream\n" % (width, height, len(pixels))
+        + pixels
+        + b"\nendstream",
+        b"<</Length %d>>\nstream\n%s\nendstream" % (len(extra), extra),
+    ]
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<</Size %d /Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    path.write_bytes(bytes(data))
+    return path
+
+
+def test_prescan_skips_files_with_little_to_gain(stub_gs, tmp_path):
+    # A tiny low-resolution image: no downsampling, little to deflate
+    src = _image_pdf(tmp_path / "small.pdf", 8, 8, bytes(8 * 8 * 3))
+    out = tmp_path / "out.pdf"
+    estimate = compress_pdf2.estimate_savings(str(src))
+    assert estimate["image_count"] == 1 and estimate["max_image_dpi"] == 1
+    assert estimate["expected_saving"] < estimate["file_bytes"] / 2
+
+    result = compress_pdf2.compress_pdf_detailed(
+        str(src), str(out), quiet=True, prescan=True, min_gain=0.5
+    )
+
+    assert result.status == "skipped"
+    assert out.read_bytes() == src.read_bytes()
+    assert _gs_calls(tmp_path) == []
+
+
+def test_prescan_runs_gs_for_high_resolution_images(stub_gs, tmp_path):
+    # 2400 pixels across 8.5 inches: about 280 dpi, downsampled to 150 by ebook
+    src = _image_pdf(tmp_path / "scan.pdf", 2400, 2400, bytes(2400 * 2400 * 3))
+    out = tmp_path / "out.pdf"
+    estimate = compress_pdf2.estimate_savings(str(src), "ebook")
+    assert estimate["max_image_dpi"] > 150 * 1.5
+    assert estimate["expected_saving"] > estimate["file_bytes"] / 2
+
+    result = compress_pdf2.compress_pdf_detailed(str(src), str(out), quiet=True, prescan=True)
+
+    assert result.status == "compressed"
+    assert len(_gs_calls(tmp_path)) == 1
+
+
+def test_larger_result_keeps_the_original(stub_gs, tmp_path):
+    src = _write_pdf(tmp_path / "in.pdf")
+    out = tmp_path / "out.pdf"
+    # The stub's prepress output is as large as the input
+    result = compress_pdf2.compress_pdf_detailed(str(src), str(out), "prepress", quiet=True)
+    assert result.status == "kept_original"
+    assert out.read_bytes() == src.read_bytes()
+
+
+def test_schedule_order():
+    pdfs = ["b.pdf", "a.pdf", "c.pdf"]
+    sizes = {"a.pdf": 300, "b.pdf": 100, "c.pdf": 200}
+    assert compress_pdf2._schedule_order(pdfs, sizes, "lpt") == ["a.pdf", "c.pdf", "b.pdf"]
+    assert compress_pdf2._schedule_order(pdfs, sizes, "sjf") == ["b.pdf", "c.pdf", "a.pdf"]
+    assert compress_pdf2._schedule_order(pdfs, sizes, "fifo") == pdfs
+
+
+def test_batch_starts_largest_file_first(stub_gs, tmp_path):
+    for name, size in (("small.pdf", 4096), ("large.pdf", 16384), ("medium.pdf", 8192)):
+        _write_pdf(tmp_path / "in" / name, size=size)
+
+    compress_pdf2.compress_batch([str(tmp_path / "in")], str(tmp_path / "out"), workers=1)
+
+    started = [os.path.basename(call[-1]) for call in _gs_calls(tmp_path)]
+    assert started == ["large.pdf", "medium.pdf", "small.pdf"]
+
+
+def test_memory_budget_limits_bytes_in_flight(stub_gs, tmp_path, monkeypatch):
+    sizes = {"a.pdf": 8192, "b.pdf": 8192, "c.pdf": 4096, "d.pdf": 4096}
+    for name, size in sizes.items():
+        _write_pdf(tmp_path / "in" / name, size=size)
+    lock = threading.Lock()
+    in_flight, peaks = [], []
+    compress_job = compress_pdf2._compress_job
+
+    def tracked_job(input_path, *args, **kwargs):
+        with lock:
+            in_flight.append(os.path.basename(input_path))
+            peaks.append(sum(sizes[name] for name in in_flight))
+        try:
+            time.sleep(0.05)
+            return compress_job(input_path, *args, **kwargs)
+        finally:
+            with lock:
+                in_flight.remove(os.path.basename(input_path))
+
+    monkeypatch.setattr(compress_pdf2, "_compress_job", tracked_job)
+    succeeded, failed = compress_pdf2.compress_batch(
+        [str(tmp_path / "in")], str(tmp_path / "out"), workers=4, memory_budget=12288
+    )
+
+    assert failed == [] and len(succeeded) == 4
+    assert max(peaks) <= 12288
+    # A file larger than the budget still runs, on its own
+    succeeded, failed = compress_pdf2.compress_batch(
+        [str(tmp_path / "in")], str(tmp_path / "again"), workers=4, memory_budget=1024
+    )
+    assert failed == [] and len(succeeded) == 4
+    assert max(peaks[4:]) == 8192
+
+
+def _images_pdf(path, images, side=72):
+    """
+    Write a PDF with one *side* x *side* point page per image.
+
+    *images* holds (pixels, size, flate) tuples: RGB pixel data for a square
+    image, stored Flate-encoded if *flate* is set, unfiltered otherwise.
+    """
+    from pypdf.generic import DictionaryObject, NumberObject, StreamObject
+
+    writer = PdfWriter()
+    for pixels, size, flate in images:
+        page = writer.add_blank_page(side, side)
+        image = StreamObject()
+        image._data = zlib.compress(pixels) if flate else pixels
+        image.update(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(size),
+                NameObject("/Height"): NumberObject(size),
+                NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+            }
+        )
+        if flate:
+            image[NameObject("/Filter")] = NameObject("/FlateDecode")
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/XObject"): DictionaryObject(
+                    {NameObject("/Im0"): writer._add_object(image)}
+                )
+            }
+        )
+    with open(path, "wb") as fh:
+        writer.write(fh)
+    return path
+
+
+def _gradient(size):
+    return bytes((x * 255 // size) for y in range(size) for x in range(size) for _ in range(3))
+
+
+def _page_images(path):
+    return [page["/Resources"]["/XObject"]["/Im0"] for page in PdfReader(path).pages]
+
+
+def test_dedupe_merges_differently_encoded_copies(tmp_path):
+    pixels = _gradient(32)
+    src = _images_pdf(
+        tmp_path / "dup.pdf",
+        [(pixels, 32, True), (pixels, 32, False), (bytes(reversed(pixels)), 32, True)],
+    )
+    writer = PdfWriter(clone_from=PdfReader(src))
+
+    assert compress_pdf2.dedupe_images(writer) == 1
+
+    refs = [page["/Resources"]["/XObject"].raw_get("/Im0").idnum for page in writer.pages]
+    assert refs[0] == refs[1] != refs[2]
+    # The Flate-encoded copy is the smaller one and is kept
+    assert writer.pages[1]["/Resources"]["/XObject"]["/Im0"]["/Filter"] == "/FlateDecode"
+
+
+def test_native_engine_downsamples_oversized_images(tmp_path):
+    # 400 pixels across one inch; ebook targets 150 dpi
+    src = _images_pdf(
+        tmp_path / "scan.pdf", [(_gradient(400), 400, True), (_gradient(64), 64, True)]
+    )
+    out = tmp_path / "out.pdf"
+
+    replaced, merged = compress_pdf2.compress_native(str(src), str(out), "ebook", workers=1)
+
+    assert (replaced, merged) == (1, 0)
+    large, small = _page_images(out)
+    assert (large["/Width"], large["/Height"]) == (150, 150)
+    assert large["/Filter"] == "/DCTDecode"
+    # Already below the target resolution: copied as it was
+    assert (small["/Width"], small["/Filter"]) == (64, "/FlateDecode")
+    assert out.stat().st_size < src.stat().st_size
+
+
+def test_result_to_dict_adds_reduction():
+    result = compress_pdf2.CompressionResult(
+        "in.pdf", "out.pdf", "ebook", "gs", "compressed", 4096, 1024, 0.1234567891,
+        None, None, None,
+    )
+    assert result.to_dict() == {
+        "input_path": "in.pdf",
+        "output_path": "out.pdf",
+        "compression_level": "ebook",
+        "engine": "gs",
+        "status": "compressed",
+        "input_bytes": 4096,
+        "output_bytes": 1024,
+        "wall_time": 0.123457,
+        "cpu_user": None,
+        "cpu_system": None,
+        "peak_rss": None,
+        "reduction": 0.75,
+    }
+
+
+def test_batch_json_lines_reports_each_file(stub_gs, tmp_path, capsys):
+    _write_pdf(tmp_path / "in" / "a.pdf")
+    _write_pdf(tmp_path / "in" / "b.pdf")
+    # Without --force the existing output makes b.pdf fail
+    _write_pdf(tmp_path / "out" / "b_compressed.pdf")
+
+    compress_pdf2.compress_batch(
+        [str(tmp_path / "in")], str(tmp_path / "out"), workers=1, json_lines=True
+    )
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    by_name = {os.path.basename(line["input_path"]): line for line in lines}
+    assert len(lines) == 2
+    assert by_name["a.pdf"]["status"] == "compressed"
+    assert by_name["a.pdf"]["output_bytes"] == 2048
+    assert "exists" in by_name["b.pdf"]["error"]
+
+
+def test_cli_json_prints_one_object(stub_gs, tmp_path, capsys, monkeypatch):
+    src = _write_pdf(tmp_path / "in.pdf")
+    out = tmp_path / "out.pdf"
+    monkeypatch.setattr("sys.argv", ["compress_pdf2.py", str(src), "-o", str(out), "--json"])
+
+    assert compress_pdf2.main() == 0
+
+    result = json.loads(capsys.readouterr().out)
+    assert result["output_path"] == str(out)
+    assert result["reduction"] == 0.5
@@ -0,0 +1,92 @@
+"""Tests for pdf_lease.py."""
+
+import os
+import time
+
+import pytest
+
+from pdf_lease import LeaseDirectory
+
+
+@pytest.fixture
+def leases(tmp_path):
+    with LeaseDirectory(tmp_path / "queue", lease_seconds=60, owner="a") as leases:
+        yield leases
+
+
+def _expire(leases, key):
+    """Backdate a lease so it looks abandoned."""
+    lease_path = os.path.join(leases.directory, f"{key}.lease")
+    old = time.time() - 2 * leases.lease_seconds
+    os.utime(lease_path, (old, old))
+
+
+def test_claim_is_exclusive(leases):
+    with LeaseDirectory(leases.directory, lease_seconds=60, owner="b") as other:
+        assert leases.claim("job")
+        assert not other.claim("job")
+        leases.complete("job", {"output": "out.pdf"})
+        assert other.is_finished("job")
+        assert not other.claim("job")
+
+
+def test_expired_lease_is_stolen_with_new_token(leases):
+    with LeaseDirectory(leases.directory, lease_seconds=60, owner="b") as other:
+        assert leases.claim("job")
+        _expire(leases, "job")
+
+        assert other.claim("job")
+        with open(os.path.join(leases.directory, "job.lease")) as fh:
+            assert fh.read().startswith("b:")
+        # No leftover temporary leases
+        assert sorted(os.listdir(leases.directory)) == ["job.attempts", "job.lease"]
+
+
+def test_stolen_lease_is_not_renewed_or_released(leases):
+    with LeaseDirectory(leases.directory, lease_seconds=60, owner="b") as other:
+        assert leases.claim("job")
+        _expire(leases, "job")
+        assert other.claim("job")
+        lease_path = os.path.join(leases.directory, "job.lease")
+        mtime = os.stat(lease_path).st_mtime - 30
+        os.utime(lease_path, (mtime, mtime))
+
+        token = leases._held["job"]
+        assert not leases._renew("job", token)
+        assert os.stat(lease_path).st_mtime == mtime
+
+        leases.release("job")
+        assert os.path.exists(lease_path)
+        assert other.holds("job")
+
+
+def test_renewal_keeps_own_lease_fresh(leases):
+    assert leases.claim("job")
+    _expire(leases, "job")
+    assert leases._renew("job", leases._held["job"])
+    lease_path = os.path.join(leases.directory, "job.lease")
+    assert time.time() - os.stat(lease_path).st_mtime < 5
+
+
+def test_failed_job_is_retried_until_max_attempts(tmp_path):
+    with LeaseDirectory(tmp_path / "queue", lease_seconds=60, max_attempts=2) as leases:
+        assert leases.claim("job")
+        assert not leases.fail("job", {"error": "boom"})
+        assert not leases.is_finished("job")
+        assert leases.attempts("job") == 1
+
+        assert leases.claim("job")
+        assert leases.fail("job", {"error": "boom"})
+        assert leases.is_finished("job")
+        assert not leases.claim("job")
+
+
+def test_crashed_attempts_count(tmp_path):
+    with LeaseDirectory(tmp_path / "queue", lease_seconds=60, max_attempts=1) as leases:
+        assert leases.claim("job")
+        # The holder crashes: the lease is never released or renewed
+        leases._held.clear()
+        _expire(leases, "job")
+
+        assert not leases.claim("job")
+        assert leases.is_finished("job")
@@ -0,0 +1,163 @@
+"""Tests for pdf_lossless.py."""
+
+import zlib
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+    TextStringObject,
+)
+
+from pdf_lossless import optimize_lossless
+from pdf_objects import PdfSyntaxError
+
+
+def _identical_pages(path, count=3, content=b""):
+    """Write a PDF whose pages are all alike, each with its own content stream."""
+    writer = PdfWriter()
+    for _ in range(count):
+        page = writer.add_blank_page(612, 792)
+        if content:
+            stream = DecodedStreamObject()
+            stream.set_data(content)
+            page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as fh:
+        writer.write(fh)
+
+
+def _page_refs(path):
+    reader = PdfReader(path)
+    return [page.indirect_reference.idnum for page in reader.pages]
+
+
+def test_identical_blank_pages_stay_separate(tmp_path):
+    src, out = tmp_path / "blank.pdf", tmp_path / "out.pdf"
+    _identical_pages(src)
+
+    optimize_lossless(src, out)
+
+    refs = _page_refs(out)
+    assert len(refs) == 3
+    assert len(set(refs)) == 3
+
+
+def test_identical_content_streams_are_shared(tmp_path):
+    src, out = tmp_path / "same.pdf", tmp_path / "out.pdf"
+    _identical_pages(src, content=b"0 0 m 612 792 l S\n" * 20)
+
+    stats = optimize_lossless(src, out)
+
+    # The three content streams merge, the three pages do not
+    assert stats["merged"] == 2
+    reader = PdfReader(out)
+    assert len(set(_page_refs(out))) == 3
+    contents = {page.get("/Contents").idnum for page in reader.pages}
+    assert len(contents) == 1
+
+
+def test_identical_form_fields_stay_separate(tmp_path):
+    src, out = tmp_path / "form.pdf", tmp_path / "out.pdf"
+    writer = PdfWriter()
+    writer.add_blank_page(612, 792)
+    fields = ArrayObject()
+    for _ in range(2):
+        field = DictionaryObject(
+            {
+                NameObject("/FT"): NameObject("/Tx"),
+                NameObject("/T"): TextStringObject("name"),
+            }
+        )
+        fields.append(writer._add_object(field))
+    writer._root_object[NameObject("/AcroForm")] = DictionaryObject(
+        {NameObject("/Fields"): fields}
+    )
+    with open(src, "wb") as fh:
+        writer.write(fh)
+
+    optimize_lossless(src, out)
+
+    form = PdfReader(out).trailer["/Root"]["/AcroForm"]
+    assert len({ref.idnum for ref in form["/Fields"]}) == 2
+
+
+def test_identical_untyped_annotations_stay_separate(tmp_path):
+    src, out = tmp_path / "links.pdf", tmp_path / "out.pdf"
+    writer = PdfWriter()
+    for _ in range(3):
+        page = writer.add_blank_page(612, 792)
+        # No /Type: it is optional on annotations
+        link = DictionaryObject(
+            {
+                NameObject("/Subtype"): NameObject("/Link"),
+                NameObject("/Rect"): ArrayObject([NumberObject(v) for v in (0, 0, 10, 10)]),
+            }
+        )
+        page[NameObject("/Annots")] = ArrayObject([writer._add_object(link)])
+    with open(src, "wb") as fh:
+        writer.write(fh)
+
+    optimize_lossless(src, out)
+
+    annots = [page["/Annots"][0].idnum for page in PdfReader(out).pages]
+    assert len(set(annots)) == 3
+
+
+def _objstm_with_decodeparms(path):
+    """Catalog and page tree stored in an object stream that has /DecodeParms."""
+    members = [
+        b"<</Type /Catalog /Pages 2 0 R>>",
+        b"<</Type /Pages /Kids [3 0 R] /Count 1>>",
+    ]
+    index, body = [], b""
+    for num, text in zip((1, 2), members):
+        index.append(b"%d %d" % (num, len(body)))
+        body += text + b"\n"
+    head = b" ".join(index) + b"\n"
+    stream = zlib.compress(head + body)
+    data = bytearray(b"%PDF-1.5\n")
+    offsets = {}
+    offsets[3] = len(data)
+    data += b"3 0 obj\n<</Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]>>\nendobj\n"
+    offsets[4] = len(data)
+    data += (
+        b"4 0 obj\n<</Type /ObjStm /N 2 /First %d /Filter /FlateDecode "
+        b"/DecodeParms <</Predictor 1>> /Length %d>>\nstream\n" % (len(head), len(stream))
+    )
+    data += stream + b"\nendstream\nendobj\n"
+    offsets[5] = len(data)
+    rows = [b"\x00\x00\x00\x00\xff\xff"]
+    rows += [b"\x02\x00\x00\x00\x04" + bytes([i]) for i in range(2)]
+    rows += [b"\x01" + offsets[num].to_bytes(4, "big") + b"\x00" for num in (3, 4, 5)]
+    xref = b"".join(rows)
+    data += (
+        b"5 0 obj\n<</Type /XRef /Size 6 /W [1 4 1] /Root 1 0 R /Length %d>>\nstream\n"
+        % len(xref)
+    )
+    data += xref + b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % offsets[5]
+    path.write_bytes(bytes(data))
+
+
+def test_unreadable_object_stream_fails(tmp_path):
+    src, out = tmp_path / "objstm.pdf", tmp_path / "out.pdf"
+    _objstm_with_decodeparms(src)
+    assert len(PdfReader(src).pages) == 1
+
+    with pytest.raises(PdfSyntaxError, match="unsupported filter"):
+        optimize_lossless(src, out)
+
+
+def test_malformed_object_fails(tmp_path):
+    src, out = tmp_path / "bad.pdf", tmp_path / "out.pdf"
+    _identical_pages(src, count=1)
+    data = src.read_bytes()
+    assert data.count(b"/Resources") == 1
+    # A dictionary key that is not a name
+    src.write_bytes(data.replace(b"/Resources", b"(Resource)"))
+
+    with pytest.raises(PdfSyntaxError):
+        optimize_lossless(src, out)
@@ -0,0 +1,118 @@
+"""Tests for pdf_profile.py."""
+
+import zlib
+
+from pypdf import PdfWriter
+from pypdf.generic import DictionaryObject, NameObject, NumberObject, StreamObject
+
+import pdf_profile
+from pdf_profile import CATEGORIES, profile_pdf
+
+
+def _image(writer, pixels, size):
+    image = StreamObject()
+    image._data = zlib.compress(pixels)
+    image.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(size),
+            NameObject("/Height"): NumberObject(size),
+            NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+        }
+    )
+    return writer._add_object(image)
+
+
+def _write_pdf(path, pages=2, image_size=400):
+    """
+    One inch square pages sharing a Helvetica font, each with its own
+    byte-identical copy of an image when *image_size* is set.
+    """
+    writer = PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    pixels = bytes(range(256)) * (image_size * image_size * 3 // 256)
+    for _ in range(pages):
+        page = writer.add_blank_page(72, 72)
+        resources = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        if image_size:
+            resources[NameObject("/XObject")] = DictionaryObject(
+                {NameObject("/Im0"): _image(writer, pixels, image_size)}
+            )
+        page[NameObject("/Resources")] = resources
+    with open(path, "wb") as fh:
+        writer.write(fh)
+    return path
+
+
+def test_every_byte_is_attributed(tmp_path):
+    path = _write_pdf(tmp_path / "doc.pdf")
+
+    profile = profile_pdf(path)
+
+    assert profile["page_count"] == 2
+    assert set(profile["categories"]) == set(CATEGORIES)
+    assert sum(profile["categories"].values()) == path.stat().st_size
+    assert sum(page["bytes"] for page in profile["pages"]) <= path.stat().st_size
+
+
+def test_images_duplicates_and_shared_fonts(tmp_path):
+    profile = profile_pdf(_write_pdf(tmp_path / "doc.pdf"))
+
+    # The second copy of the image counts as a duplicate, not as an image
+    assert profile["images"] == {
+        "FlateDecode, <= 600 dpi": {"count": 1, "bytes": profile["categories"]["images"]}
+    }
+    assert profile["categories"]["duplicates"] == profile["categories"]["images"]
+    assert profile["fonts"]["not embedded"]["count"] == 1
+    # The font is split evenly between the two pages using it
+    first, second = profile["pages"]
+    assert first["fonts"] == second["fonts"] > 0
+
+
+def test_suggestion_follows_image_resolution(tmp_path):
+    profile = profile_pdf(_write_pdf(tmp_path / "scan.pdf"))
+    assert profile["suggestion"]["compression_level"] == "ebook"
+
+    profile = profile_pdf(_write_pdf(tmp_path / "text.pdf", image_size=0))
+    assert profile["images"] == {}
+    assert profile["suggestion"]["compression_level"] == "prepress"
+
+
+def test_equal_length_streams_are_compared_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_profile, "_HASH_CHUNK", 7)
+    writer = PdfWriter()
+    first = bytes(range(256)) * 12
+    # Differs in the first byte only; deflates to the same length
+    other = b"\x01" + first[1:]
+    for pixels in (first, first, other):
+        page = writer.add_blank_page(72, 72)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/XObject"): DictionaryObject(
+                    {NameObject("/Im0"): _image(writer, pixels, 32)}
+                )
+            }
+        )
+    path = tmp_path / "doc.pdf"
+    with open(path, "wb") as fh:
+        writer.write(fh)
+    assert len(zlib.compress(first)) == len(zlib.compress(other))
+
+    profile = profile_pdf(path)
+
+    # Only the second copy of the first image is a duplicate
+    assert profile["images"]["FlateDecode, <= 75 dpi"]["count"] == 2
+    assert 0 < profile["categories"]["duplicates"] < profile["categories"]["images"]
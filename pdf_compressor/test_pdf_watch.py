@@ -0,0 +1,97 @@
+"""Tests for pdf_watch.py."""
+
+import os
+import sys
+import time
+
+import pytest
+
+from pdf_watch import FolderWatcher
+
+BACKENDS = [pytest.param(False, id="polling")]
+if sys.platform.startswith("linux"):
+    BACKENDS.append(pytest.param(True, id="inotify"))
+
+
+def _poll_until(watcher, seconds):
+    """Collect everything the watcher reports within *seconds*."""
+    ready = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        ready += watcher.poll(timeout=0.05)
+    return ready
+
+
+@pytest.mark.parametrize("use_inotify", BACKENDS)
+def test_reports_each_finished_file_once(tmp_path, use_inotify):
+    (tmp_path / "before.pdf").write_bytes(b"%PDF")
+    with FolderWatcher(
+        tmp_path, debounce=0.2, poll_interval=0.05, use_inotify=use_inotify
+    ) as watcher:
+        (tmp_path / "new.PDF").write_bytes(b"%PDF")
+        (tmp_path / ".hidden.pdf").write_bytes(b"%PDF")
+        (tmp_path / "notes.txt").write_bytes(b"text")
+
+        assert _poll_until(watcher, 0.6) == [
+            str(tmp_path / "before.pdf"),
+            str(tmp_path / "new.PDF"),
+        ]
+        assert _poll_until(watcher, 0.4) == []
+
+
+@pytest.mark.parametrize("use_inotify", BACKENDS)
+def test_growing_file_waits_for_quiet_period(tmp_path, use_inotify):
+    path = tmp_path / "upload.pdf"
+    with FolderWatcher(
+        tmp_path, debounce=0.3, poll_interval=0.05, use_inotify=use_inotify
+    ) as watcher:
+        with open(path, "wb") as fh:
+            for _ in range(6):
+                fh.write(b"x" * 1024)
+                fh.flush()
+                assert watcher.poll(timeout=0.1) == []
+        assert _poll_until(watcher, 0.8) == [str(path)]
+
+
+@pytest.mark.parametrize("use_inotify", BACKENDS)
+def test_modified_file_is_reported_again(tmp_path, use_inotify):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1")
+    with FolderWatcher(
+        tmp_path, debounce=0.1, poll_interval=0.05, use_inotify=use_inotify
+    ) as watcher:
+        assert _poll_until(watcher, 0.4) == [str(path)]
+        path.write_bytes(b"%PDF-1.7")
+        assert _poll_until(watcher, 0.4) == [str(path)]
+
+
+
+@pytest.mark.parametrize("use_inotify", BACKENDS)
+def test_rechecked_file_is_reported_again(tmp_path, use_inotify):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1")
+    with FolderWatcher(
+        tmp_path, debounce=0.1, poll_interval=0.05, use_inotify=use_inotify
+    ) as watcher:
+        assert _poll_until(watcher, 0.4) == [str(path)]
+        # Changed while busy: the change is reported and dropped by the caller
+        path.write_bytes(b"%PDF-1.7")
+        assert _poll_until(watcher, 0.4) == [str(path)]
+
+        watcher.recheck(str(path))
+        assert watcher.poll(timeout=0.01) == []
+        assert _poll_until(watcher, 0.4) == [str(path)]
+
+
+def test_missing_directory_raises(tmp_path):
+    with pytest.raises(NotADirectoryError):
+        FolderWatcher(tmp_path / "missing")
+
+
+def test_backend_reported(tmp_path):
+    with FolderWatcher(tmp_path, use_inotify=False) as watcher:
+        assert watcher.backend == "polling"
+    if sys.platform.startswith("linux"):
+        with FolderWatcher(tmp_path) as watcher:
+            assert watcher.backend == "inotify"
+            assert os.path.isdir(watcher.directory)
@@ -11,6 +11,8 @@ $ python merge_to_pdf.py /path/to/input_dir merged.pdf
 
 • If `merged.pdf` already exists it will be overwritten.
 • Only the top-level of `input_dir` is scanned (no recursion).
+• Pass `--linearize` to write a linearized (fast web view) PDF; this needs
+  the `qpdf` command-line tool.
 
 Dependencies
 ------------
@@ -19,6 +21,7 @@ pip install Pillow PyPDF2
 
 import argparse
 import io
+import os
 import sys
 from pathlib import Path
 from tempfile import NamedTemporaryFile
@@ -26,6 +29,13 @@ from tempfile import NamedTemporaryFile
 from PIL import Image
 from PyPDF2 import PdfMerger, PdfReader
 
+# Shared helpers live in ../pdf_common
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "pdf_common")
+)
+
+from pdf_linearize import linearize_pdf, require_qpdf  # noqa: E402
+
 
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff"}
 
@@ -58,7 +68,7 @@ def add_file_to_merger(f: Path, merger: PdfMerger) -> None:
         print(f"Skipped unsupported file: {f}", file=sys.stderr)
 
 
-def merge_directory(input_dir: Path, output_pdf: Path) -> None:
+def merge_directory(input_dir: Path, output_pdf: Path, linearize: bool = False) -> None:
     """Walk directory, merge supported files, and write output_pdf."""
     files = sorted(
         [p for p in input_dir.iterdir() if p.is_file()], key=lambda p: p.name.lower()
@@ -66,6 +76,9 @@ def merge_directory(input_dir: Path, output_pdf: Path) -> None:
 
     if not files:
         raise SystemExit(f"No supported files found in {input_dir}")
+    if linearize:
+        # Before the merged file is written, not after
+        require_qpdf("--linearize")
 
     merger = PdfMerger()
 
@@ -74,6 +87,8 @@ def merge_directory(input_dir: Path, output_pdf: Path) -> None:
 
     merger.write(str(output_pdf))
     merger.close()
+    if linearize:
+        linearize_pdf(output_pdf)
     print(f"✔ Merged {len(files)} items into {output_pdf}")
 
 
@@ -93,6 +108,11 @@ def parse_args() -> argparse.Namespace:
         default=Path("merged.pdf"),
         help="Path for the merged PDF (default: ./merged.pdf)",
     )
+    parser.add_argument(
+        "--linearize",
+        action="store_true",
+        help="Linearize the merged PDF for fast web view (requires qpdf)",
+    )
     return parser.parse_args()
 
 
@@ -103,7 +123,7 @@ def main() -> None:
         raise SystemExit(f"{args.input_dir} is not a directory or does not exist.")
 
     try:
-        merge_directory(args.input_dir, args.output_pdf)
+        merge_directory(args.input_dir, args.output_pdf, args.linearize)
     except Exception as exc:
         raise SystemExit(f"Failed to merge: {exc}") from exc
 
@@ -0,0 +1,153 @@
+"""
+pdf_prune.py  –  Drop the resources a page does not use.
+
+Generators often put every font, image and graphics state of a document in
+one /Resources dictionary shared by all pages (usually inherited from the
+page tree). Copied as is, every page extracted on its own then carries the
+whole set. Pruning keeps only the entries whose names the page's content
+stream mentions.
+
+The scan is deliberately conservative: it collects every name token in the
+content, whichever operator it belongs to (Do, Tf, gs, sh, cs/CS, scn/SCN,
+BDC, inline images), and keeps any resource of that name in any category.
+Names in strings or inline image data may keep a few resources too many,
+but a resource the page draws with is never dropped. Form XObjects and
+Type3 fonts without their own /Resources draw with the page's, so their
+content is scanned as well.
+
+pdf_raw prunes with content_names() while copying pages raw; this module
+does the same for pages read with pypdf.
+
+Example
+-------
+    reader = PdfReader("report.pdf")
+    writer = PdfWriter()
+    page = reader.pages[0]
+    prune_page(page)
+    writer.add_page(page)
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from typing import Set
+
+from pypdf import PageObject
+from pypdf.generic import DictionaryObject, NameObject
+
+# Resource dictionaries whose entries the content refers to by name
+RESOURCE_CATEGORIES = (
+    "Font",
+    "XObject",
+    "ExtGState",
+    "ColorSpace",
+    "Pattern",
+    "Shading",
+    "Properties",
+)
+
+_NAME_TOKEN = re.compile(rb"/([^\x00\t\n\x0c\r ()<>\[\]{}/%]*)")
+_NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+
+
+def content_names(data: bytes) -> Set[str]:
+    """Return every name used in the content stream *data*, without the slash."""
+    return {
+        _NAME_ESCAPE.sub(lambda m: bytes([int(m.group(1), 16)]), raw).decode("latin-1")
+        if b"#" in raw
+        else raw.decode("latin-1")
+        for raw in set(_NAME_TOKEN.findall(data))
+    }
+
+
+def _used_names(resources: DictionaryObject, data: bytes) -> Set[str]:
+    """Names used by *data* and by the forms and Type3 fonts drawing with *resources*."""
+    names = content_names(data)
+    xobjects = resources.get("/XObject")
+    xobjects = xobjects.get_object() if xobjects is not None else {}
+    fonts = resources.get("/Font")
+    fonts = fonts.get_object() if fonts is not None else {}
+    # Each name is looked at once: only names not seen before are queued
+    pending = set(names)
+    while pending:
+        name = "/" + pending.pop()
+        streams = []
+        if name in xobjects:
+            xobject = xobjects[name].get_object()
+            if xobject.get("/Subtype") == "/Form" and "/Resources" not in xobject:
+                streams.append(xobject)
+        if name in fonts:
+            font = fonts[name].get_object()
+            if font.get("/Subtype") == "/Type3" and "/Resources" not in font:
+                streams.extend(proc.get_object() for proc in font["/CharProcs"].values())
+        for stream in streams:
+            found = content_names(stream.get_data())
+            pending |= found - names
+            names |= found
+    return names
+
+
+class _WarningCounter(logging.Handler):
+    """
+    Count the warnings pypdf logs in this thread, e.g. while recovering a
+    broken stream.
+
+    The "pypdf" logger is global, so warnings logged by other threads reading
+    other files at the same time are ignored. pypdf does not yield while
+    decoding, so coroutines sharing the thread cannot interleave either.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.thread = threading.get_ident()
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread == self.thread:
+            self.count += 1
+
+
+def prune_page(page: PageObject) -> None:
+    """
+    Replace the /Resources of a pypdf *page* with the entries its content uses.
+
+    The page is changed in place, before it is added to a writer, so the
+    writer never copies the unused resources. If the content cannot be
+    decoded, the resources are left as they are.
+
+    Args:
+        page (PageObject): A page of a PdfReader
+    """
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else None
+    if not isinstance(resources, DictionaryObject):
+        return
+    # pypdf decodes a corrupt stream as far as it can, logging a warning
+    # instead of raising; names in the lost part would be pruned
+    warnings = _WarningCounter()
+    logger = logging.getLogger("pypdf")
+    logger.addHandler(warnings)
+    try:
+        contents = page.get_contents()
+        names = _used_names(resources, contents.get_data() if contents is not None else b"")
+    except Exception:
+        # Unsupported filter or broken stream: keep everything
+        return
+    finally:
+        logger.removeHandler(warnings)
+    if warnings.count:
+        return
+    pruned = DictionaryObject()
+    for key, value in resources.items():
+        entries = value.get_object()
+        if key[1:] in RESOURCE_CATEGORIES and isinstance(entries, DictionaryObject):
+            value = DictionaryObject(
+                (name, entry)
+                for name, entry in entries.items()
+                # Non-ASCII names may be decoded differently here and there
+                if name[1:] in names or not name.isascii()
+            )
+        pruned[NameObject(key)] = value
+    page[NameObject("/Resources")] = pruned
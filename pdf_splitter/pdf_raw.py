@@ -0,0 +1,536 @@
+"""
+pdf_raw.py  –  Zero-decode page extraction.
+
+Copies selected pages into a new PDF without decoding or re-encoding any
+stream: each page's object graph is walked through the source's xref, the
+dictionaries are parsed and written back with renumbered references, and
+stream bodies (images, fonts, content) are copied as the raw, still-encoded
+bytes of the source file. The cost of an extraction depends on the bytes
+copied rather than on parse work.
+
+The file is memory-mapped and objects are read lazily through the xref;
+the parts of the mapping that were read are released again right away, and
+stream bodies are copied in chunks, so memory use stays flat however large
+the file is. Objects are read and written with pdf_common/pdf_objects.py,
+which the compressor's scanner uses as well. Encrypted files are not
+supported (their streams would need re-encrypting); RawPdf raises
+RawPdfError for them so callers can fall back to pypdf.
+
+With prune=True, the writer drops the resources a page does not use (see
+pdf_prune); that decodes the page's content streams, but still no images
+or fonts.
+
+Example
+-------
+    with RawPdf("report.pdf") as source:
+        writer = RawPageWriter(source)
+        writer.add_page(source.pages[0])
+        with open("page1.pdf", "wb") as fh:
+            writer.write(fh)
+"""
+
+from __future__ import annotations
+
+import array
+import base64
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pdf_prune import RESOURCE_CATEGORIES, content_names
+
+# Shared helpers live in ../pdf_common
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "pdf_common")
+)
+
+from pdf_objects import (  # noqa: E402
+    PdfFile,
+    PdfObject,
+    PdfSyntaxError,
+    Ref,
+    parse_object,
+    serialize,
+)
+
+# Page attributes a page may inherit from its ancestors in the page tree
+INHERITABLE = ("Resources", "MediaBox", "CropBox", "Rotate")
+
+# Stream bodies are copied in chunks of this size, so a huge image never
+# has to fit in memory
+_COPY_CHUNK = 1024 * 1024
+
+# Format of the page-index sidecar files written by RawPdf.save_index()
+INDEX_VERSION = 1
+# Bytes hashed at each end of the source to validate a sidecar
+_INDEX_HASH_BYTES = 64 * 1024
+
+# Raised for anything that cannot be copied raw, unreadable objects included
+RawPdfError = PdfSyntaxError
+
+
+# ---------------------------------------------------------------------------
+# Object model
+# ---------------------------------------------------------------------------
+
+
+class RawPage(NamedTuple):
+    """A leaf of the page tree and the nodes its inheritable attributes come from."""
+
+    ref: Ref
+    inherited: Dict[str, int]  # attribute -> object number of the page tree node
+
+
+class _OffsetTable(Mapping):
+    """Object number -> xref entry, backed by a packed array (-1 = absent)."""
+
+    def __init__(self, table: array.array, width: int):
+        self._table = table
+        self._width = width
+
+    def __getitem__(self, num: int):
+        if num < 0 or num * self._width >= len(self._table):
+            raise KeyError(num)
+        entry = self._table[num * self._width : (num + 1) * self._width]
+        if entry[0] < 0:
+            raise KeyError(num)
+        return entry[0] if self._width == 1 else tuple(entry)
+
+    def __contains__(self, num) -> bool:
+        index = num * self._width
+        return 0 <= index < len(self._table) and self._table[index] >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        for index in range(0, len(self._table), self._width):
+            if self._table[index] >= 0:
+                yield index // self._width
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _PageTable(Sequence):
+    """The page list of a page index, unpacked one RawPage at a time."""
+
+    def __init__(self, table: array.array, inherited: List[Dict[str, int]]):
+        self._table = table
+        self._inherited = inherited
+
+    def __getitem__(self, index: int) -> RawPage:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        num, gen, inherited = self._table[3 * index : 3 * index + 3]
+        return RawPage(Ref(num, gen), self._inherited[inherited])
+
+    def __len__(self) -> int:
+        return len(self._table) // 3
+
+    def numbers(self) -> set:
+        return set(self._table[0::3])
+
+
+# ---------------------------------------------------------------------------
+# Source
+# ---------------------------------------------------------------------------
+
+
+class RawPdf(PdfFile):
+    """
+    Random access to the raw objects and pages of a PDF.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path, index_path=None):
+        """
+        Args:
+            path: Path to the PDF file
+            index_path (optional): Page-index sidecar to load the xref and page
+                tree from; it is (re)written if missing or out of date
+        """
+        super().__init__(path)
+        try:
+            # Inheritable attributes of page tree nodes, which can have huge /Kids
+            self._node_attrs: Dict[int, Dict[str, Any]] = {}
+            self.signature = {
+                "size": self.stat.st_size,
+                "mtime_ns": self.stat.st_mtime_ns,
+                "quick_hash": self._quick_hash(),
+            }
+            self.index_loaded = index_path is not None and self._load_index(index_path)
+            self.index_saved = False
+            if not self.index_loaded:
+                self._read_xref()
+                self.pages, self.tree_nodes = self._walk_page_tree()
+                if index_path is not None:
+                    self.index_saved = self.save_index(index_path)
+        except Exception:
+            self.close()
+            raise
+        if isinstance(self.pages, _PageTable):
+            self.page_nums = self.pages.numbers()
+        else:
+            self.page_nums = {page.ref.num for page in self.pages}
+
+    def _read_xref(self) -> None:
+        reader = self.read_xref()
+        if reader.is_encrypted:
+            raise RawPdfError("encrypted PDFs cannot be copied raw")
+        root = reader.trailer.raw_get("/Root")
+        if not hasattr(root, "idnum"):
+            raise RawPdfError("the document catalog is not an indirect object")
+        self.root = Ref(root.idnum, root.generation)
+
+    # -- page-index sidecar -------------------------------------------------
+
+    def _quick_hash(self) -> str:
+        """Hash the head and tail of the file, where edits and appended updates show."""
+        tail = max(0, self.size - _INDEX_HASH_BYTES)
+        digest = hashlib.sha256()
+        digest.update(self.data[:_INDEX_HASH_BYTES])
+        digest.update(self.data[tail:])
+        self._unmap(0, _INDEX_HASH_BYTES)
+        self._unmap(tail, self.size)
+        return digest.hexdigest()
+
+    def save_index(self, index_path) -> bool:
+        """
+        Write the xref, the page list and the page tree attributes to a sidecar.
+
+        Opening the file again with the sidecar skips parsing the xref and
+        walking the page tree. The large tables are stored as packed base64
+        arrays so that loading one takes milliseconds even for huge files.
+
+        Returns:
+            bool: False if the sidecar could not be written (e.g. read-only directory)
+        """
+        offsets = array.array("q", [-1]) * (max(self.offsets, default=0) + 1)
+        for num, offset in self.offsets.items():
+            offsets[num] = offset
+        compressed = array.array("q", [-1, -1]) * (max(self.compressed, default=0) + 1)
+        for num, (stm, index) in self.compressed.items():
+            compressed[2 * num : 2 * num + 2] = array.array("q", (stm, index))
+        # Pages usually share a handful of inherited-attribute sets
+        inherited: List[Dict[str, int]] = []
+        inherited_ids: Dict[Tuple, int] = {}
+        pages = array.array("q")
+        for page in self.pages:
+            key = tuple(sorted(page.inherited.items()))
+            if key not in inherited_ids:
+                inherited_ids[key] = len(inherited)
+                inherited.append(page.inherited)
+            pages.extend((page.ref.num, page.ref.gen, inherited_ids[key]))
+        node_attrs = {
+            str(num): {
+                key: serialize(value, lambda ref: ref.num).decode("latin-1")
+                for key, value in self._node_attrs[num].items()
+            }
+            for num in sorted(self.tree_nodes)
+            if num in self._node_attrs
+        }
+        index = {
+            "version": INDEX_VERSION,
+            "source": self.signature,
+            "pdf_version": self.version,
+            "root": list(self.root),
+            "byteorder": sys.byteorder,
+            "offsets": base64.b64encode(offsets.tobytes()).decode(),
+            "compressed": base64.b64encode(compressed.tobytes()).decode(),
+            "pages": base64.b64encode(pages.tobytes()).decode(),
+            "inherited": inherited,
+            "tree_nodes": sorted(self.tree_nodes),
+            "node_attrs": node_attrs,
+        }
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as fh:
+                json.dump(index, fh, separators=(",", ":"))
+            os.replace(tmp_path, index_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
+
+    def _load_index(self, index_path) -> bool:
+        """Load a sidecar written by save_index(); return False if it is missing or stale."""
+        try:
+            with open(index_path) as fh:
+                index = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if index.get("version") != INDEX_VERSION or index.get("source") != self.signature:
+            return False
+
+        def unpack(key: str) -> array.array:
+            table = array.array("q", base64.b64decode(index[key]))
+            if index["byteorder"] != sys.byteorder:
+                table.byteswap()
+            return table
+
+        # Tables are unpacked lazily: a split usually needs a few pages only
+        self.offsets = _OffsetTable(unpack("offsets"), 1)
+        self.compressed = _OffsetTable(unpack("compressed"), 2)
+        self.version = index["pdf_version"]
+        self.root = Ref(*index["root"])
+        self.pages = _PageTable(unpack("pages"), index["inherited"])
+        self.tree_nodes = set(index["tree_nodes"])
+        self._node_attrs = {
+            int(num): {
+                key: parse_object(value.encode("latin-1"), 0)[0]
+                for key, value in attrs.items()
+            }
+            for num, attrs in index["node_attrs"].items()
+        }
+        return True
+
+    # -- document structure -------------------------------------------------
+
+    def _walk_page_tree(self) -> Tuple[List[RawPage], set]:
+        """Return the pages in document order and the object numbers of the tree nodes."""
+        catalog = self.resolve(self.root)
+        if not isinstance(catalog, dict) or not isinstance(catalog.get("Pages"), Ref):
+            raise RawPdfError("the document has no page tree")
+        pages: List[RawPage] = []
+        nodes = set()
+        stack = [(catalog["Pages"], {})]
+        while stack:
+            ref, inherited = stack.pop()
+            if not isinstance(ref, Ref) or ref.num in nodes or ref.num == self.root.num:
+                continue
+            node = self.resolve(ref)
+            if not isinstance(node, dict):
+                continue
+            if node.get("Type") == "Pages" or "Kids" in node:
+                nodes.add(ref.num)
+                self._node_attrs[ref.num] = {
+                    key: node[key] for key in INHERITABLE if key in node
+                }
+                attrs = dict(inherited)
+                attrs.update((key, ref.num) for key in INHERITABLE if key in node)
+                kids = self.resolve(node.get("Kids")) or []
+                stack.extend((kid, attrs) for kid in reversed(kids))
+            else:
+                missing = {key: num for key, num in inherited.items() if key not in node}
+                pages.append(RawPage(ref, missing))
+        return pages, nodes
+
+    def page_dict(self, page: RawPage) -> Dict[str, Any]:
+        """Return the page's dictionary with its inherited attributes copied in."""
+        value = dict(self.resolve(page.ref))
+        for key, node_num in page.inherited.items():
+            attrs = self._node_attrs.get(node_num)
+            if attrs is None:
+                node = self.resolve(Ref(node_num, 0))
+                attrs = self._node_attrs[node_num] = {
+                    key: node[key] for key in INHERITABLE if key in node
+                }
+            value[key] = attrs[key]
+        return value
+
+    def copy_stream(self, obj: PdfObject, fh) -> None:
+        """Write the raw stream body of *obj* to the binary file object *fh*."""
+        end = obj.stream_offset + obj.stream_length
+        for start in range(obj.stream_offset, end, _COPY_CHUNK):
+            stop = min(start + _COPY_CHUNK, end)
+            fh.write(self.data[start:stop])
+            self._unmap(start, stop)
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+
+
+# Stands for the new page tree in the /Parent of copied pages
+_NEW_PAGE_TREE = Ref(0, -1)
+
+
+class RawPageWriter:
+    """
+    Collect pages of a RawPdf and write them as a new PDF.
+
+    Mirrors the part of pypdf's PdfWriter used by the splitter (add_page()
+    and write()), so the two are interchangeable there.
+
+    Everything reachable from the selected pages is copied, except the
+    document catalog, the page tree and pages that were not selected:
+    references to those (e.g. link destinations) are written as null. With
+    *prune*, the /Resources of pages, form XObjects and tiling patterns are
+    cut to the entries their content uses.
+    """
+
+    def __init__(self, source: RawPdf, prune: bool = False):
+        self.source = source
+        self.prune = prune
+        self._pages: List[RawPage] = []
+
+    def add_page(self, page: RawPage) -> None:
+        self._pages.append(page)
+
+    def write(self, fh) -> None:
+        """Write the new PDF to the binary file object *fh*."""
+        source = self.source
+        selected = {page.ref.num for page in self._pages}
+
+        def excluded(num: int) -> bool:
+            return num not in selected and (
+                num in source.page_nums or num in source.tree_nodes or num == source.root.num
+            )
+        # 1 is the catalog, 2 the page tree; copied objects follow in the
+        # order they are first reached
+        numbers: Dict[int, int] = {}
+        order: List[int] = []
+
+        def renumber(ref: Ref) -> Optional[int]:
+            if ref is _NEW_PAGE_TREE:
+                return 2
+            if excluded(ref.num):
+                return None
+            new = numbers.get(ref.num)
+            if new is None:
+                if ref.num not in source.offsets and ref.num not in source.compressed:
+                    return None
+                new = numbers[ref.num] = len(numbers) + 3
+                order.append(ref.num)
+            return new
+
+        kids = [renumber(page.ref) for page in self._pages]
+        pages_by_num = {page.ref.num: page for page in self._pages}
+        offsets: List[int] = []
+        start = fh.tell()
+        fh.write(b"%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n" % source.version.encode())
+
+        def begin(num: int) -> None:
+            offsets.append(fh.tell() - start)
+            fh.write(b"%d 0 obj\n" % num)
+
+        begin(1)
+        fh.write(b"<</Type /Catalog /Pages 2 0 R>>\nendobj\n")
+        begin(2)
+        fh.write(
+            b"<</Type /Pages /Kids ["
+            + b" ".join(b"%d 0 R" % kid for kid in kids)
+            + b"] /Count %d>>\nendobj\n" % len(kids)
+        )
+        # Objects referenced while writing are appended to *order*
+        index = 0
+        while index < len(order):
+            num = order[index]
+            index += 1
+            if num in pages_by_num:
+                value = source.page_dict(pages_by_num[num])
+                value["Parent"] = _NEW_PAGE_TREE
+                if self.prune:
+                    value = self._pruned(value, self._contents(value))
+                obj = PdfObject(num, value, -1, -1, 0)
+            else:
+                obj = source.get(num)
+                if (
+                    self.prune
+                    and obj is not None
+                    and obj.is_stream
+                    and "Resources" in obj.value
+                    and (obj.value.get("Subtype") == "Form" or obj.value.get("PatternType") == 1)
+                ):
+                    obj = obj._replace(value=self._pruned(obj.value, [obj]))
+            begin(numbers[num])
+            if obj is None:
+                fh.write(b"null\nendobj\n")
+                continue
+            value = obj.value
+            if obj.is_stream:
+                value = dict(value, Length=obj.stream_length)
+            fh.write(serialize(value, renumber))
+            if obj.is_stream:
+                fh.write(b"\nstream\n")
+                source.copy_stream(obj, fh)
+                fh.write(b"\nendstream")
+            fh.write(b"\nendobj\n")
+
+        xref = fh.tell() - start
+        fh.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        fh.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        fh.write(
+            b"trailer\n<</Size %d /Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(offsets) + 1, xref)
+        )
+
+    # -- pruning ------------------------------------------------------------
+
+    def _contents(self, page: Dict[str, Any]) -> List[PdfObject]:
+        """Return the content streams of *page*, in order."""
+        contents = page.get("Contents")
+        if isinstance(contents, Ref):
+            obj = self.source.get(contents.num)
+            if obj is not None and obj.is_stream:
+                return [obj]
+            contents = obj.value if obj is not None else None
+        if not isinstance(contents, list):
+            return []
+        streams = []
+        for ref in contents:
+            obj = self.source.get(ref.num) if isinstance(ref, Ref) else None
+            if obj is not None and obj.is_stream:
+                streams.append(obj)
+        return streams
+
+    def _pruned(self, value: Dict[str, Any], contents: List[PdfObject]) -> Dict[str, Any]:
+        """
+        Return *value* with its /Resources cut to the names *contents* use.
+
+        Form XObjects and Type3 fonts without /Resources of their own draw
+        with these resources, so their content counts too. If any content
+        cannot be decoded, *value* is returned unchanged.
+        """
+        source = self.source
+        resources = source.resolve(value.get("Resources"))
+        if not isinstance(resources, dict):
+            return value
+        try:
+            names = content_names(b"\n".join(source.stream_data(obj) for obj in contents))
+            xobjects = source.resolve(resources.get("XObject"))
+            fonts = source.resolve(resources.get("Font"))
+            # Each name is looked at once: only names not seen before are queued
+            pending = set(names)
+            while pending:
+                name = pending.pop()
+                streams: List[PdfObject] = []
+                ref = xobjects.get(name) if isinstance(xobjects, dict) else None
+                xobject = source.get(ref.num) if isinstance(ref, Ref) else None
+                if (
+                    xobject is not None
+                    and xobject.is_stream
+                    and xobject.value.get("Subtype") == "Form"
+                    and "Resources" not in xobject.value
+                ):
+                    streams.append(xobject)
+                font = source.resolve(fonts.get(name)) if isinstance(fonts, dict) else None
+                if (
+                    isinstance(font, dict)
+                    and font.get("Subtype") == "Type3"
+                    and "Resources" not in font
+                ):
+                    procs = source.resolve(font.get("CharProcs"))
+                    for proc in procs.values() if isinstance(procs, dict) else ():
+                        obj = source.get(proc.num) if isinstance(proc, Ref) else None
+                        if obj is not None and obj.is_stream:
+                            streams.append(obj)
+                for obj in streams:
+                    found = content_names(source.stream_data(obj))
+                    pending |= found - names
+                    names |= found
+        except RawPdfError:
+            return value
+        pruned = {}
+        for key, item in resources.items():
+            entries = source.resolve(item)
+            if key in RESOURCE_CATEGORIES and isinstance(entries, dict):
+                item = {name: entry for name, entry in entries.items() if name in names}
+            pruned[key] = item
+        return dict(value, Resources=pruned)
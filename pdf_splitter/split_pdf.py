@@ -12,15 +12,44 @@ python split_pdf.py report.pdf out_dir/ --ranges 1-3,5,7-9
 
 # 3. Overwrite output files if they exist
 python split_pdf.py report.pdf out_dir/ --overwrite
+
+# 4. Linearize each output for fast web view (requires qpdf)
+python split_pdf.py report.pdf out_dir/ --linearize
+
+# 5. Split a very long document with 8 worker processes
+python split_pdf.py statements.pdf out_dir/ --workers 8
+
+# 6. Copy page objects raw, without decoding or re-encoding any stream
+python split_pdf.py scans.pdf out_dir/ --raw
+
+# 7. Keep a page index next to a big source (scans.pdf.index.json), so later
+#    splits of it skip parsing the xref and the page tree (implies --raw)
+python split_pdf.py scans.pdf out_dir/ --ranges 100-120 --index
+
+# 8. Keep only the fonts, images etc. each output's pages actually use
+python split_pdf.py catalog.pdf out_dir/ --prune
 """
 
 from __future__ import annotations
 import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
 from pypdf import PdfReader, PdfWriter
 
+from pdf_prune import prune_page
+from pdf_raw import RawPageWriter, RawPdf, RawPdfError
+
+# Shared helpers live in ../pdf_common
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "pdf_common")
+)
+
+from pdf_linearize import linearize_pdf, require_qpdf  # noqa: E402
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -45,51 +74,249 @@ def parse_ranges(ranges_str: str) -> List[Tuple[int, int]]:
     return result
 
 
-def add_pages(writer: PdfWriter, reader: PdfReader, start: int, end: int) -> None:
-    """Add pages [start‑1, end‑1] (1‑based inclusive) to *writer*."""
+def add_pages(
+    writer: Union[PdfWriter, RawPageWriter],
+    reader: Union[PdfReader, RawPdf],
+    start: int,
+    end: int,
+    prune: bool = False,
+) -> None:
+    """
+    Add pages [start‑1, end‑1] (1‑based inclusive) to *writer*.
+
+    With *prune*, the unused resources of pypdf pages are dropped first; a
+    RawPageWriter does that itself when created with prune=True.
+    """
     for i in range(start - 1, end):
         if i >= len(reader.pages) or i < 0:
             raise IndexError(f"Page {i + 1} is out of bounds")
-        writer.add_page(reader.pages[i])
+        page = reader.pages[i]
+        if prune and isinstance(writer, PdfWriter):
+            prune_page(page)
+        writer.add_page(page)
 
 
-def write_pdf(writer: PdfWriter, path: Path, overwrite: bool) -> None:
+def write_pdf(
+    writer: Union[PdfWriter, RawPageWriter],
+    path: Path,
+    overwrite: bool,
+    linearize: bool = False,
+) -> None:
     if path.exists() and not overwrite:
         raise FileExistsError(f"{path} already exists (use --overwrite to replace)")
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("wb") as fh:
-        writer.write(fh)
+        try:
+            writer.write(fh)
+        except Exception:
+            # Leave no truncated file behind: the raw writer can fail half-way,
+            # and the pages are then written again with pypdf
+            fh.close()
+            path.unlink()
+            raise
+    if linearize:
+        linearize_pdf(path)
 
 
 # ---------------------------------------------------------------------------
 # Main logic
 # ---------------------------------------------------------------------------
 
+# An output file: (path, first page, last page), pages 1-based inclusive
+Job = Tuple[Path, int, int]
+
+
+def plan_outputs(
+    src: Path, dest_dir: Path, ranges: List[Tuple[int, int]] | None, page_count: int
+) -> List[Job]:
+    """List the output files of a split, in order."""
+    if ranges is None:
+        # One file per page
+        return [
+            (dest_dir / f"{src.stem}_p{page_no}.pdf", page_no, page_no)
+            for page_no in range(1, page_count + 1)
+        ]
+    # One file per range
+    jobs = []
+    for start, end in ranges:
+        if start < 1 or end > page_count:
+            raise IndexError(f"Page {start if start < 1 else end} is out of bounds")
+        label = f"{start}" if start == end else f"{start}-{end}"
+        jobs.append((dest_dir / f"{src.stem}_{label}.pdf", start, end))
+    return jobs
+
+
+def slice_jobs(jobs: List[Job], slices: int) -> List[List[Job]]:
+    """Cut *jobs* into at most *slices* contiguous runs with similar page counts."""
+    total = sum(end - start + 1 for _, start, end in jobs)
+    result: List[List[Job]] = [[]]
+    done = 0
+    for job in jobs:
+        # Start the next slice once this one has its share of the pages
+        if result[-1] and done >= total * len(result) / slices:
+            result.append([])
+        result[-1].append(job)
+        done += job[2] - job[1] + 1
+    return result
+
+
+def default_index_path(src: Path) -> Path:
+    """Return where the page-index sidecar of *src* is kept by default."""
+    return src.with_name(f"{src.name}.index.json")
+
+
+def open_source(
+    src: Path, raw: bool = False, index_path: Path | None = None
+) -> Union[PdfReader, RawPdf]:
+    """
+    Open *src* for raw copying if asked and possible, else with pypdf.
+
+    Either way objects are read lazily through the xref; pypdf is handed an
+    open file rather than a path, which would make it read the whole file
+    into memory. With *index_path*, the raw reader loads the xref and page
+    tree from that sidecar, or writes it for next time. Close the result
+    with close_source().
+    """
+    if raw:
+        try:
+            return RawPdf(src, index_path)
+        except RawPdfError as e:
+            print(f"⚠️  {src.name}: {e}; using pypdf instead")
+    fh = open(src, "rb")
+    try:
+        return PdfReader(fh)
+    except Exception:
+        fh.close()
+        raise
+
+
+def release_source(reader: Union[PdfReader, RawPdf]) -> None:
+    """Drop what *reader* cached for the last output, keeping memory flat."""
+    if isinstance(reader, RawPdf):
+        reader.release()
+    else:
+        reader.resolved_objects.clear()
+
+
+def close_source(reader: Union[PdfReader, RawPdf]) -> None:
+    """Close a reader returned by open_source()."""
+    if isinstance(reader, RawPdf):
+        reader.close()
+    else:
+        reader.stream.close()
+
+
+def write_outputs(
+    reader: Union[PdfReader, RawPdf],
+    jobs: List[Job],
+    overwrite: bool,
+    linearize: bool,
+    prune: bool = False,
+) -> int:
+    """Write each job's pages from *reader* to its own file; return the count."""
+    fallback = None
+    for out_path, start, end in jobs:
+        source = reader
+        if isinstance(reader, RawPdf):
+            try:
+                writer = RawPageWriter(reader, prune)
+                add_pages(writer, reader, start, end)
+                write_pdf(writer, out_path, overwrite, linearize)
+                continue
+            except RawPdfError as e:
+                # Something on these pages cannot be copied raw
+                print(f"⚠️  {out_path.name}: {e}; using pypdf instead")
+                if fallback is None:
+                    fallback = open_source(Path(reader.path))
+                source = fallback
+            finally:
+                release_source(reader)
+        writer = PdfWriter()
+        add_pages(writer, source, start, end, prune)
+        write_pdf(writer, out_path, overwrite, linearize)
+        release_source(source)
+    if fallback is not None:
+        close_source(fallback)
+    return len(jobs)
+
+
+def _write_outputs_worker(
+    src: Path,
+    jobs: List[Job],
+    overwrite: bool,
+    linearize: bool,
+    raw: bool,
+    index_path: Path | None,
+    prune: bool,
+) -> int:
+    # Runs in a worker process, which parses the source with its own reader
+    reader = open_source(src, raw, index_path)
+    try:
+        return write_outputs(reader, jobs, overwrite, linearize, prune)
+    finally:
+        close_source(reader)
+
 
 def split_pdf(
     src: Path,
     dest_dir: Path,
     ranges: List[Tuple[int, int]] | None,
     overwrite: bool = False,
+    linearize: bool = False,
+    workers: int = 1,
+    raw: bool = False,
+    index_path: Path | None = None,
+    prune: bool = False,
 ) -> None:
-    reader = PdfReader(str(src))
-    dest_dir.mkdir(parents=True, exist_ok=True)
+    """
+    Write one PDF per page of *src*, or one per range in *ranges*.
 
-    if ranges is None:
-        # One file per page
-        for page_no, page in enumerate(reader.pages, start=1):
-            writer = PdfWriter()
-            writer.add_page(page)
-            out_path = dest_dir / f"{src.stem}_p{page_no}.pdf"
-            write_pdf(writer, out_path, overwrite)
-    else:
-        # One file per range
-        for idx, (start, end) in enumerate(ranges, start=1):
-            writer = PdfWriter()
-            add_pages(writer, reader, start, end)
-            label = f"{start}" if start == end else f"{start}-{end}"
-            out_path = dest_dir / f"{src.stem}_{label}.pdf"
-            write_pdf(writer, out_path, overwrite)
+    With *workers* > 1 the outputs are cut into contiguous slices, each
+    written by its own process with its own PdfReader; the output names are
+    the same as in serial mode.
+
+    With *raw*, pages are copied by pdf_raw without decoding or re-encoding
+    any stream. Encrypted sources, and outputs with objects that cannot be
+    copied raw, fall back to pypdf. *index_path* names a page-index sidecar
+    for the raw reader (see RawPdf.save_index()); the worker processes load
+    it instead of parsing the source again.
+
+    With *prune*, each output keeps only the resources (fonts, images,
+    graphics states, ...) its pages' content uses, instead of everything in
+    a /Resources dictionary shared across the document (see pdf_prune).
+    """
+    if linearize:
+        # Before any output is written, not after the first one
+        require_qpdf("--linearize")
+    reader = open_source(src, raw, index_path)
+    raw = isinstance(reader, RawPdf)
+    if raw and index_path is not None and not (reader.index_loaded or reader.index_saved):
+        print(f"⚠️  Could not write the page index {index_path}")
+    try:
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        jobs = plan_outputs(src, dest_dir, ranges, len(reader.pages))
+        workers = max(1, min(workers, len(jobs)))
+        if workers == 1:
+            write_outputs(reader, jobs, overwrite, linearize, prune)
+            return
+    finally:
+        close_source(reader)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _write_outputs_worker,
+                src,
+                part,
+                overwrite,
+                linearize,
+                raw,
+                index_path,
+                prune,
+            )
+            for part in slice_jobs(jobs, workers)
+        ]
+        for future in futures:
+            future.result()
 
 
 def cli() -> None:
@@ -108,10 +335,54 @@ def cli() -> None:
         action="store_true",
         help="Replace existing files in the output directory",
     )
+    parser.add_argument(
+        "--linearize",
+        action="store_true",
+        help="Linearize each output for fast web view (requires qpdf)",
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Copy page objects and streams raw instead of re-serializing them "
+        "with pypdf (much faster for image-heavy files)",
+    )
+    parser.add_argument(
+        "--index",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="Load the xref and page tree from a page-index sidecar, writing it "
+        "if missing or stale (default PATH: <pdf>.index.json); implies --raw",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Drop the fonts, images and other resources a page's content does "
+        "not use (shrinks outputs of documents sharing one resource set)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes writing outputs in parallel (default: 1)",
+    )
     args = parser.parse_args()
 
     ranges = parse_ranges(args.ranges) if args.ranges else None
-    split_pdf(args.pdf, args.out_dir, ranges, overwrite=args.overwrite)
+    split_pdf(
+        args.pdf,
+        args.out_dir,
+        ranges,
+        overwrite=args.overwrite,
+        linearize=args.linearize,
+        workers=args.workers,
+        raw=args.raw or args.index is not None,
+        index_path=None
+        if args.index is None
+        else Path(args.index) if args.index else default_index_path(args.pdf),
+        prune=args.prune,
+    )
     print("✅ Done.")
 
 
@@ -0,0 +1,105 @@
+"""Tests for pdf_prune.py and pruned splits."""
+
+import logging
+import threading
+
+import pytest
+from pypdf import PdfReader
+
+from pdf_prune import content_names, prune_page
+from split_pdf import split_pdf
+from test_pdf_raw import _stream, _write_objects
+
+
+def test_content_names():
+    data = b"q /GS1 gs /Im#20A Do BT /F2 9 Tf [(a/b)] TJ ET /P <</MCID 0>> BDC EMC Q"
+    assert content_names(data) >= {"GS1", "Im A", "F2", "P", "MCID"}
+    assert "F1" not in content_names(data)
+
+
+# Three pages share one /Resources: page 1 uses font F1, page 2 font F2
+# and page 3 the form X1, which draws with F3 through the page's resources
+SHARED = [
+    b"<</Type /Catalog /Pages 2 0 R>>",
+    b"<</Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 3 /MediaBox [0 0 200 200] "
+    b"/Resources 6 0 R>>",
+    b"<</Type /Page /Parent 2 0 R /Contents 10 0 R>>",
+    b"<</Type /Page /Parent 2 0 R /Contents 11 0 R>>",
+    b"<</Type /Page /Parent 2 0 R /Contents 12 0 R>>",
+    b"<</Font <</F1 7 0 R /F2 8 0 R /F3 9 0 R>> /XObject <</X1 13 0 R>> "
+    b"/ProcSet [/PDF /Text]>>",
+    b"<</Type /Font /Subtype /Type1 /BaseFont /Helvetica>>",
+    b"<</Type /Font /Subtype /Type1 /BaseFont /Courier>>",
+    b"<</Type /Font /Subtype /Type1 /BaseFont /Times-Roman>>",
+    _stream(b"<<>>", b"BT /F1 12 Tf (one) Tj ET"),
+    _stream(b"<<>>", b"BT /F2 12 Tf (two) Tj ET"),
+    _stream(b"<<>>", b"/X1 Do"),
+    _stream(
+        b"<</Type /XObject /Subtype /Form /BBox [0 0 200 200]>>",
+        b"BT /F3 12 Tf (three) Tj ET",
+    ),
+]
+
+
+def _used_fonts(path):
+    resources = PdfReader(path).pages[0]["/Resources"]
+    return sorted(resources["/Font"].keys())
+
+
+@pytest.mark.parametrize("raw", [False, True], ids=["pypdf", "raw"])
+def test_split_keeps_only_used_resources(tmp_path, raw):
+    src = tmp_path / "shared.pdf"
+    _write_objects(src, SHARED)
+
+    split_pdf(src, tmp_path / "out", None, raw=raw, prune=True)
+    split_pdf(src, tmp_path / "full", None, raw=raw)
+
+    out = tmp_path / "out"
+    assert _used_fonts(out / "shared_p1.pdf") == ["/F1"]
+    assert _used_fonts(out / "shared_p2.pdf") == ["/F2"]
+    # The form draws with the page's resources, so its font stays
+    assert _used_fonts(out / "shared_p3.pdf") == ["/F3"]
+    assert b"Courier" not in (out / "shared_p1.pdf").read_bytes()
+    assert _used_fonts(tmp_path / "full" / "shared_p1.pdf") == ["/F1", "/F2", "/F3"]
+    resources = PdfReader(out / "shared_p1.pdf").pages[0]["/Resources"]
+    assert "/XObject" in resources and len(resources["/XObject"]) == 0
+    assert resources["/ProcSet"] == ["/PDF", "/Text"]
+
+
+@pytest.mark.parametrize("raw", [False, True], ids=["pypdf", "raw"])
+def test_undecodable_content_keeps_resources(tmp_path, raw):
+    src = tmp_path / "shared.pdf"
+    broken = [*SHARED]
+    broken[9] = _stream(b"<</Filter /FlateDecode>>", b"not deflated")
+    _write_objects(src, broken)
+
+    split_pdf(src, tmp_path / "out", [(1, 1)], raw=raw, prune=True)
+
+    assert _used_fonts(tmp_path / "out" / "shared_1.pdf") == ["/F1", "/F2", "/F3"]
+
+
+def test_prune_page_in_place(tmp_path):
+    src = tmp_path / "shared.pdf"
+    _write_objects(src, SHARED)
+    page = PdfReader(src).pages[1]
+    prune_page(page)
+    assert sorted(page["/Resources"]["/Font"].keys()) == ["/F2"]
+
+
+def test_warnings_from_other_threads_do_not_stop_pruning(tmp_path, monkeypatch):
+    src = tmp_path / "shared.pdf"
+    _write_objects(src, SHARED)
+    page = PdfReader(src).pages[1]
+    get_contents = page.get_contents
+
+    def contents_while_another_thread_warns():
+        other = threading.Thread(
+            target=logging.getLogger("pypdf").warning, args=("elsewhere",)
+        )
+        other.start()
+        other.join()
+        return get_contents()
+
+    monkeypatch.setattr(page, "get_contents", contents_while_another_thread_warns)
+    prune_page(page)
+    assert sorted(page["/Resources"]["/Font"].keys()) == ["/F2"]
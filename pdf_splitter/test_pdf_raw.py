@@ -0,0 +1,171 @@
+"""Tests for pdf_raw.py."""
+
+import zlib
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NullObject
+
+import pdf_raw
+from pdf_raw import RawPageWriter, RawPdf
+from split_pdf import split_pdf
+
+
+def _write_objects(path, objects, root=1):
+    """Write a PDF made of *objects* (bodies for objects 1, 2, ...) with a classic xref."""
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<</Size %d /Root %d 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        root,
+        xref,
+    )
+    path.write_bytes(bytes(data))
+
+
+def _stream(dictionary, data):
+    return dictionary[:-2] + b" /Length %d>>\nstream\n" % len(data) + data + b"\nendstream"
+
+
+# Two pages under an intermediate node that supplies their MediaBox and
+# Resources; page 2 links to page 1
+CONTENT = zlib.compress(b"BT /F1 12 Tf 10 10 Td (deflated) Tj ET")
+INHERITING = [
+    b"<</Type /Catalog /Pages 2 0 R>>",
+    b"<</Type /Pages /Kids [3 0 R] /Count 2 /Rotate 90>>",
+    b"<</Type /Pages /Parent 2 0 R /Kids [4 0 R 5 0 R] /Count 2 "
+    b"/MediaBox [0 0 300 400] /Resources <</Font <</F1 6 0 R>>>>>>",
+    b"<</Type /Page /Parent 3 0 R /Contents 7 0 R>>",
+    b"<</Type /Page /Parent 3 0 R /Contents 7 0 R /Annots [8 0 R]>>",
+    b"<</Type /Font /Subtype /Type1 /BaseFont /Helvetica>>",
+    _stream(b"<</Filter /FlateDecode>>", CONTENT),
+    b"<</Type /Annot /Subtype /Link /Rect [0 0 10 10] /Dest [4 0 R /Fit]>>",
+]
+
+
+def test_pages_and_inherited_attributes(tmp_path):
+    src = tmp_path / "tree.pdf"
+    _write_objects(src, INHERITING)
+    with RawPdf(src) as pdf:
+        assert [page.ref.num for page in pdf.pages] == [4, 5]
+        page = pdf.page_dict(pdf.pages[1])
+        assert page["MediaBox"] == [0, 0, 300, 400]
+        assert page["Rotate"] == 90
+        assert "Font" in pdf.resolve(page["Resources"])
+
+
+def test_streams_are_copied_without_decoding(tmp_path):
+    src, out = tmp_path / "tree.pdf", tmp_path / "out.pdf"
+    _write_objects(src, INHERITING)
+    with RawPdf(src) as pdf:
+        writer = RawPageWriter(pdf)
+        writer.add_page(pdf.pages[1])
+        with open(out, "wb") as fh:
+            writer.write(fh)
+
+    assert CONTENT in out.read_bytes()
+    reader = PdfReader(out)
+    assert len(reader.pages) == 1
+    page = reader.pages[0]
+    assert [float(v) for v in page.mediabox] == [0, 0, 300, 400]
+    assert page.rotation == 90
+    assert page.get_contents().get_data() == zlib.decompress(CONTENT)
+    # The link points at a page that is not in this output
+    link = page["/Annots"][0].get_object()
+    assert isinstance(link["/Dest"][0], NullObject)
+
+
+def test_large_streams_are_copied_in_chunks(tmp_path, monkeypatch):
+    src = tmp_path / "big.pdf"
+    body = bytes(range(256)) * 64
+    objects = list(INHERITING)
+    objects[6] = _stream(b"<<>>", body)
+    _write_objects(src, objects)
+    monkeypatch.setattr(pdf_raw, "_COPY_CHUNK", 1000)
+
+    with RawPdf(src) as pdf:
+        # Each output reads the released parts of the mapping again
+        for name in ("first.pdf", "second.pdf"):
+            writer = RawPageWriter(pdf)
+            writer.add_page(pdf.pages[0])
+            with open(tmp_path / name, "wb") as fh:
+                writer.write(fh)
+            pdf.release()
+
+    for name in ("first.pdf", "second.pdf"):
+        assert PdfReader(tmp_path / name).pages[0].get_contents().get_data() == body
+
+
+def test_encrypted_source_falls_back_to_pypdf(tmp_path, capsys):
+    src = tmp_path / "locked.pdf"
+    writer = PdfWriter()
+    writer.add_blank_page(100, 100)
+    writer.add_blank_page(100, 100)
+    writer.encrypt("", "owner")
+    with open(src, "wb") as fh:
+        writer.write(fh)
+
+    split_pdf(src, tmp_path / "out", None, raw=True)
+
+    assert "using pypdf instead" in capsys.readouterr().out
+    assert len(list((tmp_path / "out").iterdir())) == 2
+
+
+def test_missing_page_tree_is_rejected(tmp_path):
+    src = tmp_path / "bad.pdf"
+    _write_objects(src, [b"<</Type /Catalog>>"])
+    with pytest.raises(ValueError, match="no page tree"):
+        RawPdf(src)
+
+
+def test_index_is_saved_then_loaded(tmp_path):
+    src, index = tmp_path / "tree.pdf", tmp_path / "tree.pdf.index.json"
+    _write_objects(src, INHERITING)
+
+    with RawPdf(src, index) as pdf:
+        assert (pdf.index_loaded, pdf.index_saved) == (False, True)
+        expected = [pdf.page_dict(page) for page in pdf.pages]
+
+    with RawPdf(src, index) as pdf:
+        assert pdf.index_loaded
+        assert [page.ref.num for page in pdf.pages] == [4, 5]
+        assert [pdf.page_dict(page) for page in pdf.pages] == expected
+        assert pdf.get(7).stream_length == len(CONTENT)
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    src, index = tmp_path / "tree.pdf", tmp_path / "tree.pdf.index.json"
+    _write_objects(src, INHERITING)
+    RawPdf(src, index).close()
+
+    # Page 2 removed from the tree: the same size, different content
+    changed = [*INHERITING]
+    changed[2] = changed[2].replace(
+        b"/Kids [4 0 R 5 0 R] /Count 2", b"/Kids [4 0 R]       /Count 1"
+    )
+    changed[1] = changed[1].replace(b"/Count 2", b"/Count 1")
+    _write_objects(src, changed)
+
+    with RawPdf(src, index) as pdf:
+        assert (pdf.index_loaded, pdf.index_saved) == (False, True)
+        assert [page.ref.num for page in pdf.pages] == [4]
+
+
+def test_split_with_index(tmp_path):
+    src = tmp_path / "tree.pdf"
+    _write_objects(src, INHERITING)
+    index = tmp_path / "tree.pdf.index.json"
+
+    split_pdf(src, tmp_path / "first", None, raw=True, index_path=index)
+    assert index.exists()
+    split_pdf(src, tmp_path / "second", [(2, 2)], workers=2, raw=True, index_path=index)
+
+    assert (tmp_path / "second" / "tree_2.pdf").read_bytes() == (
+        tmp_path / "first" / "tree_p2.pdf"
+    ).read_bytes()
@@ -0,0 +1,113 @@
+"""Tests for split_pdf.py."""
+
+from pathlib import Path
+
+import pytest
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+from split_pdf import close_source, open_source, parse_ranges, slice_jobs, split_pdf
+
+
+def _numbered_pages(path: Path, count: int) -> None:
+    """Write a PDF whose page i draws the text "page i" (1-based)."""
+    writer = PdfWriter()
+    for i in range(1, count + 1):
+        page = writer.add_blank_page(200, 200)
+        stream = DecodedStreamObject()
+        stream.set_data(b"BT 10 10 Td (page %d) Tj ET" % i)
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as fh:
+        writer.write(fh)
+
+
+def _content(path: Path, index: int = 0) -> bytes:
+    return PdfReader(path).pages[index].get_contents().get_data()
+
+
+def test_raw_falls_back_to_pypdf_for_unreadable_objects(tmp_path):
+    src = tmp_path / "doc.pdf"
+    _numbered_pages(src, 2)
+    data = src.read_bytes()
+    # The xref still points at object 5 (page 1's content); pypdf tolerates
+    # the mismatch, the raw reader does not
+    assert data.count(b"\n5 0 obj") == 1
+    src.write_bytes(data.replace(b"\n5 0 obj", b"\n9 0 obj"))
+
+    split_pdf(src, tmp_path / "out", None, raw=True)
+
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["doc_p1.pdf", "doc_p2.pdf"]
+    assert b"(page 1)" in _content(tmp_path / "out" / "doc_p1.pdf")
+    assert b"(page 2)" in _content(tmp_path / "out" / "doc_p2.pdf")
+
+
+def test_linearize_without_qpdf_writes_nothing(tmp_path, monkeypatch):
+    src = tmp_path / "doc.pdf"
+    _numbered_pages(src, 2)
+    monkeypatch.setenv("PATH", str(tmp_path / "bin"))
+
+    with pytest.raises(RuntimeError, match="requires qpdf"):
+        split_pdf(src, tmp_path / "out", None, linearize=True)
+
+    assert not (tmp_path / "out").exists()
+
+
+def test_parse_ranges():
+    assert parse_ranges("1-3,5, 7-9") == [(1, 3), (5, 5), (7, 9)]
+    with pytest.raises(ValueError):
+        parse_ranges("3-1")
+
+
+def test_slice_jobs_are_contiguous_and_balanced():
+    jobs = [(Path(f"p{i}.pdf"), i, i) for i in range(1, 11)]
+    slices = slice_jobs(jobs, 3)
+    assert [job for part in slices for job in part] == jobs
+    assert [len(part) for part in slices] == [4, 3, 3]
+    assert slice_jobs(jobs[:2], 8) == [[jobs[0]], [jobs[1]]]
+
+
+@pytest.mark.parametrize("raw", [False, True], ids=["pypdf", "raw"])
+def test_parallel_split_matches_serial(tmp_path, raw):
+    src = tmp_path / "doc.pdf"
+    _numbered_pages(src, 9)
+
+    split_pdf(src, tmp_path / "serial", [(1, 2), (3, 3), (4, 9)], raw=raw)
+    split_pdf(src, tmp_path / "parallel", [(1, 2), (3, 3), (4, 9)], workers=3, raw=raw)
+
+    names = ["doc_1-2.pdf", "doc_3.pdf", "doc_4-9.pdf"]
+    for out_dir in ("serial", "parallel"):
+        assert sorted(p.name for p in (tmp_path / out_dir).iterdir()) == names
+    for name in names:
+        serial = PdfReader(tmp_path / "serial" / name)
+        parallel = PdfReader(tmp_path / "parallel" / name)
+        assert [p.get_contents().get_data() for p in serial.pages] == [
+            p.get_contents().get_data() for p in parallel.pages
+        ]
+    assert b"(page 9)" in _content(tmp_path / "parallel" / "doc_4-9.pdf", 5)
+
+
+def test_existing_output_is_not_overwritten(tmp_path):
+    src = tmp_path / "doc.pdf"
+    _numbered_pages(src, 1)
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "doc_p1.pdf").write_bytes(b"keep")
+
+    with pytest.raises(FileExistsError):
+        split_pdf(src, tmp_path / "out", None)
+    assert (tmp_path / "out" / "doc_p1.pdf").read_bytes() == b"keep"
+
+    split_pdf(src, tmp_path / "out", None, overwrite=True)
+    assert b"(page 1)" in _content(tmp_path / "out" / "doc_p1.pdf")
+
+
+def test_pypdf_source_reads_from_an_open_file(tmp_path):
+    src = tmp_path / "doc.pdf"
+    _numbered_pages(src, 2)
+
+    reader = open_source(src)
+    # Handed a path, pypdf would hold the whole file in a BytesIO
+    assert not reader.stream.closed and hasattr(reader.stream, "fileno")
+    assert reader.pages[1].get_contents().get_data() == b"BT 10 10 Td (page 2) Tj ET"
+    close_source(reader)
+    assert reader.stream.closed